@@ -1,6 +1,6 @@
 {
     'name': 'Tec Catalog Brain',
-    'version': '2.0',
+    'version': '2.1',
     'category': 'Inventory/Products',
     'summary': 'The Intelligence Hub: AI Content & Smart Category Mapping.',
     'description': """
@@ -22,6 +22,10 @@
         'views/product_template_views.xml',
         'views/product_public_category_view.xml',
         'views/category_mapping_view.xml',
+        'views/enrichment_cache_view.xml',
+        'views/enrichment_miss_view.xml',
+        'views/enrichment_queue_view.xml',
+        'views/ai_batch_job_view.xml',
     ],
     'installable': True,
     'application': True,
@@ -0,0 +1,9 @@
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    """ Specs moved to tec.product.spec: drop the spec tables stored in the enriched descriptions. """
+    if not version:
+        return
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['product.template']._cleanup_legacy_spec_html()
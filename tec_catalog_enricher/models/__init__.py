@@ -3,3 +3,8 @@ from . import product_template
 from . import enrichment_engines
 from . import product_public_category
 from . import category_mapping
+from . import enrichment_cache
+from . import enrichment_miss
+from . import enrichment_queue
+from . import icecat_index
+from . import ai_batch_job
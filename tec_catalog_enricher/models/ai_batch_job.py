@@ -0,0 +1,195 @@
+from odoo import api, fields, models
+from odoo.exceptions import UserError
+from .enrichment_engines import ai_engine, http_client
+import json
+import logging
+
+_logger = logging.getLogger(__name__)
+SUITE_LOG_PREFIX = "[Tec Suite] Brain Hub: "
+
+MAX_BATCH_REQUESTS = 50000  # Provider limit per input file
+MAX_BATCH_RETRIES = 2       # Failed requests are resubmitted in a new batch up to this many times
+MAX_ERROR_LINES = 500       # Per-product errors kept on the job
+OPEN_STATES = ('submitted', 'in_progress')
+PROVIDER_STATES = {
+    'validating': 'submitted',
+    'in_progress': 'in_progress',
+    'finalizing': 'in_progress',
+    'completed': 'completed',
+    'failed': 'failed',
+    'expired': 'failed',
+    'cancelling': 'in_progress',
+    'cancelled': 'cancelled',
+}
+
+
+class AiBatchJob(models.Model):
+    """
+    Deferred AI copy generation through the OpenAI-compatible Batch API.
+    The prompts of the selection are serialized to one JSONL file and submitted at once
+    (batch pricing tier, no per-request rate limits). A cron polls the provider and, once
+    the output file is ready, applies every answer through the regular marketing flow.
+    Requests that failed (error file, or no answer at all) are logged per product and
+    resubmitted in a follow-up batch, up to MAX_BATCH_RETRIES times.
+    """
+    _name = 'tec.ai.batch.job'
+    _description = 'AI Batch Job'
+    _order = 'id desc'
+
+    name = fields.Char(string="Nombre", required=True, readonly=True)
+    state = fields.Selection([
+        ('submitted', 'Enviado'),
+        ('in_progress', 'En Proceso'),
+        ('completed', 'Completado'),
+        ('applied', 'Aplicado'),
+        ('failed', 'Error'),
+        ('cancelled', 'Cancelado'),
+    ], string="Estado", default='submitted', required=True, readonly=True, index=True)
+    product_ids = fields.Many2many('product.template', string="Productos", readonly=True)
+    request_count = fields.Integer(string="Solicitudes", readonly=True)
+    applied_count = fields.Integer(string="Aplicados", readonly=True)
+    failed_count = fields.Integer(string="Fallidos", readonly=True)
+    remote_batch_id = fields.Char(string="Batch ID", readonly=True)
+    output_file_id = fields.Char(string="Archivo de Resultados", readonly=True)
+    error_file_id = fields.Char(string="Archivo de Errores", readonly=True)
+    base_url = fields.Char(string="Endpoint", readonly=True)
+    submitted_at = fields.Datetime(string="Enviado", readonly=True)
+    completed_at = fields.Datetime(string="Finalizado", readonly=True)
+    error = fields.Text(string="Detalle", readonly=True)
+    attempt = fields.Integer(string="Reintento", readonly=True, help="0 = primer envío.")
+    retry_job_id = fields.Many2one('tec.ai.batch.job', string="Reenviado en", readonly=True)
+    memo_keys = fields.Text(string="Claves de Memo", readonly=True, help="JSON {product_id: hash del prompt enviado}.")
+
+    @api.model
+    def _is_enabled(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+        return bool(ICP.get_param('tec_catalog_enricher.ai_deferred_mode')) \
+            and ICP.get_param('tec_catalog_enricher.ai_provider', 'gemini') == 'openai'
+
+    @api.model
+    def _submit(self, products, attempt=0):
+        """ Builds and submits one batch per MAX_BATCH_REQUESTS products. Returns the created jobs. """
+        ICP = self.env['ir.config_parameter'].sudo()
+        if not ICP.get_param('tec_catalog_enricher.openai_api_key'):
+            raise UserError("Falta la API Key de OpenAI para el modo diferido.")
+
+        # A product already waiting in an open batch is not sent twice
+        busy = self.search([('state', 'in', OPEN_STATES)]).product_ids
+        products = products - busy
+        jobs = self.browse()
+        if not products:
+            return jobs
+
+        http_client.configure(self.env)
+        for index in range(0, len(products), MAX_BATCH_REQUESTS):
+            chunk = products[index:index + MAX_BATCH_REQUESTS]
+            name = f"Marketing IA {fields.Datetime.to_string(fields.Datetime.now())} ({len(chunk)})"
+            jsonl, memo_keys = ai_engine.build_batch_jsonl(chunk)
+            batch = ai_engine.submit_batch(ICP, jsonl, name=f"tec_marketing_{index}.jsonl")
+            jobs |= self.create({
+                'name': name,
+                'product_ids': [(6, 0, chunk.ids)],
+                'request_count': len(chunk),
+                'remote_batch_id': batch['id'],
+                'state': PROVIDER_STATES.get(batch.get('status'), 'submitted'),
+                'base_url': ai_engine._openai_base_url(ICP),
+                'submitted_at': fields.Datetime.now(),
+                'memo_keys': json.dumps(memo_keys),
+                'attempt': attempt,
+            })
+            _logger.info(f"{SUITE_LOG_PREFIX}AI batch {batch['id']} submitted with {len(chunk)} products.")
+        return jobs
+
+    def _poll(self):
+        """ Refreshes the provider status of open jobs and applies the finished ones. """
+        ICP = self.env['ir.config_parameter'].sudo()
+        http_client.configure(self.env)
+        for job in self.filtered(lambda j: j.state in OPEN_STATES):
+            try:
+                batch = ai_engine.get_batch(ICP, job.remote_batch_id)
+            except Exception as e:
+                _logger.warning(f"{SUITE_LOG_PREFIX}AI batch {job.remote_batch_id} status unavailable: {e}")
+                continue
+            vals = {
+                'state': PROVIDER_STATES.get(batch.get('status'), job.state),
+                'output_file_id': batch.get('output_file_id'),
+                'error_file_id': batch.get('error_file_id'),
+            }
+            if vals['state'] not in OPEN_STATES:
+                vals['completed_at'] = fields.Datetime.now()
+            if batch.get('errors'):
+                vals['error'] = str(batch['errors'])[:2000]
+            job.write(vals)
+            self.env.cr.commit()
+            if job.state in ('completed', 'failed'):
+                job._apply_results()
+
+    def _apply_results(self):
+        """
+        Bulk application of a finished batch: one savepoint + commit per product for the
+        output file; the error file (and requests with no answer) are recorded per product
+        and resubmitted.
+        """
+        self.ensure_one()
+        ICP = self.env['ir.config_parameter'].sudo()
+        memo_keys = json.loads(self.memo_keys) if self.memo_keys else {}
+        results, errors = {}, {}
+        if self.output_file_id:
+            results, errors = ai_engine.download_batch_results(ICP, self.output_file_id, memo_keys)
+        if self.error_file_id:
+            _results, file_errors = ai_engine.download_batch_results(ICP, self.error_file_id)
+            errors.update(file_errors)
+
+        Product = self.env['product.template']
+        attr_index = ai_engine.AttributeIndex(self.env)
+        applied = 0
+        for product in self.product_ids.filtered(lambda p: p.id in results):
+            if Product._generate_marketing_for(product, ICP, results[product.id], attr_index):
+                applied += 1
+            self.env.cr.commit()
+
+        failed = self.product_ids.filtered(lambda p: p.id not in results)
+        batch_error = self.error or "El proveedor no devolvió resultado para la solicitud."
+        for product in failed:
+            errors.setdefault(product.id, batch_error[:250])
+            Product._log_enrichment(product, 'error', 'IA (Lote)', errors[product.id])
+        error_lines = [f"{pid}: {errors[pid]}" for pid in failed.ids[:MAX_ERROR_LINES]]
+
+        self.write({
+            'state': 'applied' if results else 'failed',
+            'applied_count': applied,
+            'failed_count': len(failed) + (len(results) - applied),
+            'error': "\n".join(error_lines) or self.error or False,
+        })
+        self.env.cr.commit()
+        _logger.info(f"{SUITE_LOG_PREFIX}AI batch {self.remote_batch_id} applied: {applied}/{self.request_count} products, {len(failed)} failed.")
+        if failed:
+            self._resubmit(failed)
+
+    def _resubmit(self, products):
+        """ Puts the failed requests back in a new batch (bounded by MAX_BATCH_RETRIES). """
+        self.ensure_one()
+        if self.attempt >= MAX_BATCH_RETRIES:
+            _logger.warning(f"{SUITE_LOG_PREFIX}AI batch {self.remote_batch_id}: {len(products)} products still failing after {MAX_BATCH_RETRIES} retries.")
+            return
+        try:
+            jobs = self._submit(products, attempt=self.attempt + 1)
+        except Exception as e:
+            _logger.warning(f"{SUITE_LOG_PREFIX}AI batch {self.remote_batch_id}: resubmission of {len(products)} products failed: {e}")
+            return
+        if jobs:
+            self.retry_job_id = jobs[0]
+            self.env.cr.commit()
+
+    @api.model
+    def _cron_poll_batch_jobs(self):
+        self.search([('state', 'in', OPEN_STATES)])._poll()
+
+    def action_check_status(self):
+        self._poll()
+
+    def action_cancel(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+        for job in self.filtered(lambda j: j.state in OPEN_STATES):
+            ai_engine.cancel_batch(ICP, job.remote_batch_id)
+            job.write({'state': 'cancelled', 'completed_at': fields.Datetime.now()})
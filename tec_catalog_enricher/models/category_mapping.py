@@ -1,11 +1,25 @@
 from odoo import fields, models, api
 from google import genai
 from google.genai import types
+from .enrichment_engines import category_matcher
+import json
 import logging
 
 _logger = logging.getLogger(__name__)
 SUITE_LOG_PREFIX = "[Tec Suite] Brain Hub: "
 
+DEFAULT_LOCAL_THRESHOLD = 0.7
+MAX_AI_CANDIDATES = 5
+AI_BATCH_SIZE = 100
+AI_MAPPING_PROMPT = """Actúa como experto en e-commerce (MercadoLibre Argentina).
+Para cada categoría de proveedor elige la categoría destino más adecuada SOLO entre las opciones listadas debajo de ella.
+Formato: "* [id_mapeo] nombre del proveedor" seguido de "  - id_categoria: ruta".
+
+{categories}
+
+Devuelve ÚNICAMENTE JSON: {"mappings": [{"id": <id_mapeo>, "category_id": <id_categoria o null>, "confidence": <0.0 a 1.0>}]}
+Usa category_id null si ninguna opción corresponde. La confianza debe reflejar tu certeza real."""
+
 class CategoryMapping(models.Model):
     _name = 'tec.catalog.category.mapping'
     _description = 'Supplier to MELI Category Mapping'
@@ -14,6 +28,10 @@ class CategoryMapping(models.Model):
     supplier_category_name = fields.Char(string='Supplier Category', required=True, index=True)
     public_category_id = fields.Many2one('product.public.category', string='MELI/Public Category')
     confidence = fields.Float(string='AI Confidence', readonly=True)
+    match_method = fields.Selection([
+        ('local', 'Local (Trigramas)'),
+        ('ai', 'AI (Gemini)'),
+    ], string='Match Method', readonly=True)
     
     _sql_constraints = [
         ('uniq_supplier_cat', 'unique(supplier_category_name)', 'Supplier category must be unique!')
@@ -33,73 +51,104 @@ class CategoryMapping(models.Model):
 
     @api.model
     def action_generate_ai_mappings(self):
-        """ Bulk Process unmapped categories using Gemini """
-        # 1. Get Setup
+        """
+        Two-tier mapping of the unmapped supplier (Air) categories:
+        1. Local trigram/token matcher against product.public.category, accepted above the threshold.
+        2. The rest goes to Gemini in batched prompts (local top candidates as options),
+           recording the confidence the model reports.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        air_root = self.env['product.category'].search([('name', '=', 'Dropship/Air')], limit=1)
+        if not air_root:
+            return
+
+        supplier_names = set(self.env['product.category'].search([
+            ('parent_id', 'child_of', air_root.id), ('id', '!=', air_root.id),
+        ]).mapped('name'))
+
+        # One query for every existing mapping, bulk create for the new names
+        existing = {m.supplier_category_name: m for m in self.search([('supplier_category_name', 'in', list(supplier_names))])}
+        missing = supplier_names - set(existing)
+        if missing:
+            for mapping in self.create([{'supplier_category_name': name} for name in sorted(missing)]):
+                existing[mapping.supplier_category_name] = mapping
+        pending = self.browse([m.id for m in existing.values() if not m.public_category_id])
+        if not pending:
+            return
+
+        public_cats = self.env['product.public.category'].search_read([], ['name', 'display_name'])
+        matcher = category_matcher.CategoryMatcher([(c['id'], c['name'], c['display_name']) for c in public_cats])
+        threshold = self._get_local_threshold()
+
+        # Tier 1: local matcher
+        ai_candidates = {}
+        local_count = 0
+        for mapping in pending:
+            matches = matcher.match(mapping.supplier_category_name, limit=MAX_AI_CANDIDATES)
+            if matches and matches[0][0] >= threshold:
+                score, category_id, _path = matches[0]
+                mapping.write({'public_category_id': category_id, 'confidence': round(score, 2), 'match_method': 'local'})
+                local_count += 1
+            else:
+                ai_candidates[mapping] = matches
+        _logger.info(f"{SUITE_LOG_PREFIX}Category mapping: {local_count} matched locally, {len(ai_candidates)} left for AI.")
+
+        # Tier 2: batched LLM for low-confidence names
+        if ai_candidates and ICP.get_param('tec_catalog_enricher.meli_enable_ai'):
+            self._map_with_ai(ai_candidates, public_cats)
+
+    @api.model
+    def _get_local_threshold(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+        try:
+            return float(ICP.get_param('tec_catalog_enricher.category_match_threshold', DEFAULT_LOCAL_THRESHOLD))
+        except (TypeError, ValueError):
+            return DEFAULT_LOCAL_THRESHOLD
+
+    @api.model
+    def _map_with_ai(self, ai_candidates, public_cats):
+        """ ai_candidates: {mapping: [(score, category id, path)]}. One Gemini request per AI_BATCH_SIZE names. """
         ICP = self.env['ir.config_parameter'].sudo()
         api_key = ICP.get_param('tec_catalog_enricher.gemini_api_key')
         if not api_key:
             _logger.warning(f"{SUITE_LOG_PREFIX}No Gemini API Key found in settings.")
             return
-
-        # 2. Get unmapped mappings (or new ones from products?)
-        # Strategy: We need a list of ALL supplier categories currently in use.
-        # Let's verify against products.
-        products = self.env['product.template'].search([('categ_id', '!=', False)])
-        # This uses internal category. 
-        # But we want "Rubro" from supplier.
-        # Air Backend creates categories like "Notebooks".
-        # So we can search product.category where parent is "Dropship/Air"!
-        
-        air_root = self.env['product.category'].search([('name', '=', 'Dropship/Air')], limit=1)
-        if not air_root:
-            return
-            
-        supplier_cats = self.env['product.category'].search([('parent_id', 'child_of', air_root.id)])
-        
-        # 3. Get MELI Categories for Context (Roots or all?)
-        # Passing ALL is too big. 
-        # We'll ask Gemini to "Hallucinate" the best path or provide a candidate?
-        # Better: We assume we have fetched MELI categories into product.public.category.
-        # We can pass a list of Root MELI Categories to guide it?
-        
-        target_cats = self.env['product.public.category'].search([('parent_id', '=', False)])
-        target_names = [c.name for c in target_cats]
-        
+        model_name = ICP.get_param('tec_catalog_enricher.gemini_model') or 'gemini-2.0-flash'
         client = genai.Client(api_key=api_key)
-        
-        for cat in supplier_cats:
-            # Check if mapped
-            existing = self.search([('supplier_category_name', '=', cat.name)], limit=1)
-            if existing and existing.public_category_id:
-                continue
-            
-            if not existing:
-                existing = self.create({'supplier_category_name': cat.name})
-            
-            # AI Call
-            prompt = f"""
-            Act as an E-commerce Expert. Map the supplier category '{cat.name}' to the best matching MercadoLibre Argentina Category.
-            Available Top-Level Categories: {', '.join(target_names)}.
-            
-            Return ONLY the exact Name of the target category. If it's a subcategory, format as 'Parent > Child'.
-            """
-            
+
+        # Names without any local candidate get the top-level categories as options
+        roots = [(0.0, c['id'], c['display_name']) for c in public_cats if ' / ' not in c['display_name']][:MAX_AI_CANDIDATES * 4]
+        valid_ids = {c['id'] for c in public_cats}
+
+        mappings = list(ai_candidates)
+        for index in range(0, len(mappings), AI_BATCH_SIZE):
+            chunk = mappings[index:index + AI_BATCH_SIZE]
+            blocks = []
+            for mapping in chunk:
+                options = ai_candidates[mapping] or roots
+                lines = "\n".join(f"  - {category_id}: {path}" for _score, category_id, path in options)
+                blocks.append(f"* [{mapping.id}] {mapping.supplier_category_name}\n{lines}")
+            prompt = AI_MAPPING_PROMPT.replace('{categories}', "\n".join(blocks))
+
             try:
                 response = client.models.generate_content(
-                    model='gemini-2.0-flash', 
-                    contents=prompt
+                    model=model_name,
+                    contents=prompt,
+                    config=types.GenerateContentConfig(response_mime_type='application/json'),
                 )
-                predicted_name = response.text.strip()
-                _logger.info(f"{SUITE_LOG_PREFIX}AI Prediction for {cat.name} -> {predicted_name}")
-                
-                # Try to find this category in DB
-                # Split by > and find leaf?
-                leaf_name = predicted_name.split('>')[-1].strip()
-                public_cat = self.env['product.public.category'].search([('name', 'ilike', leaf_name)], limit=1)
-                
-                if public_cat:
-                    existing.public_category_id = public_cat.id
-                    existing.confidence = 0.9 # Fake confidence
+                answers = json.loads(response.text).get('mappings', [])
             except Exception as e:
                 _logger.error(f"Gemini Error: {e}")
+                continue
 
+            by_id = {m.id: m for m in chunk}
+            for answer in answers if isinstance(answers, list) else []:
+                try:
+                    mapping = by_id.get(int(answer.get('id')))
+                    category_id = int(answer.get('category_id') or 0)
+                    confidence = max(0.0, min(1.0, float(answer.get('confidence') or 0.0)))
+                except (AttributeError, TypeError, ValueError):
+                    continue
+                if mapping and category_id in valid_ids:
+                    mapping.write({'public_category_id': category_id, 'confidence': confidence, 'match_method': 'ai'})
+                    _logger.info(f"{SUITE_LOG_PREFIX}AI Prediction for {mapping.supplier_category_name} -> {category_id} ({confidence:.2f})")
@@ -0,0 +1,109 @@
+from odoo import api, fields, models
+from datetime import timedelta
+import base64
+import logging
+import zlib
+
+_logger = logging.getLogger(__name__)
+SUITE_LOG_PREFIX = "[Tec Suite] Brain Hub: "
+
+DEFAULT_TTL_DAYS = 30
+
+
+class EnrichmentCache(models.Model):
+    """
+    Raw API responses (Icecat, PSREF, Best Buy, POD) stored compressed.
+    Engines read a plain snapshot in prepare() and parse from it when fresh, so
+    re-enrichment (force, retries after a crash, parser fixes) costs no network or quota.
+    """
+    _name = 'tec.enrichment.cache'
+    _description = 'Enrichment Raw Response Cache'
+    _order = 'fetched_at desc'
+
+    engine = fields.Char(string="Motor", required=True, index=True)
+    brand = fields.Char(string="Marca")
+    ref = fields.Char(string="MPN / EAN", required=True, index=True)
+    lang = fields.Char(string="Idioma")
+    payload = fields.Binary(string="Respuesta (zlib)", attachment=False)
+    payload_size = fields.Integer(string="Tamaño Original (bytes)")
+    etag = fields.Char(string="ETag")
+    fetched_at = fields.Datetime(string="Descargado", default=fields.Datetime.now)
+    expires_at = fields.Datetime(string="Vence", index=True)
+
+    _sql_constraints = [
+        ('uniq_cache_key', 'unique(engine, brand, ref, lang)', 'Cache key (engine, brand, ref, lang) must be unique!')
+    ]
+
+    @api.model
+    def _normalize_key(self, engine, brand, ref, lang):
+        return engine, (brand or '').strip().lower(), (ref or '').strip().upper(), lang or ''
+
+    @api.model
+    def _get_ttl_days(self):
+        """ Raw-response TTL; 0 when the cache is disabled in the settings. """
+        ICP = self.env['ir.config_parameter'].sudo()
+        if ICP.get_param('tec_catalog_enricher.cache_disabled'):
+            return 0
+        try:
+            return int(ICP.get_param('tec_catalog_enricher.cache_ttl_days', DEFAULT_TTL_DAYS))
+        except (TypeError, ValueError):
+            return DEFAULT_TTL_DAYS
+
+    @api.model
+    def _lookup(self, engine, brand, ref, lang='', ttl_days=None):
+        """
+        Main thread. Returns a plain snapshot {'payload': bytes, 'etag', 'fresh'} that
+        can be handed to worker threads, or False if nothing is cached (or TTL is 0).
+        ttl_days: overrides the raw-response setting (entries with their own policy, e.g. the AI memo).
+        """
+        if (self._get_ttl_days() if ttl_days is None else ttl_days) <= 0:
+            return False
+        engine, brand, ref, lang = self._normalize_key(engine, brand, ref, lang)
+        entry = self.sudo().search([
+            ('engine', '=', engine), ('brand', '=', brand), ('ref', '=', ref), ('lang', '=', lang),
+        ], limit=1)
+        if not entry or not entry.payload:
+            return False
+        try:
+            payload = zlib.decompress(base64.b64decode(entry.payload))
+        except (zlib.error, ValueError) as e:
+            _logger.warning(f"{SUITE_LOG_PREFIX}Corrupted cache entry {engine}/{ref}: {e}")
+            return False
+        return {
+            'payload': payload,
+            'etag': entry.etag or False,
+            'fresh': bool(entry.expires_at and entry.expires_at > fields.Datetime.now()),
+        }
+
+    @api.model
+    def _store(self, engine, brand, ref, lang, cache_entry, ttl_days=None):
+        """ Main thread. Upserts the raw response returned by an engine's fetch(). """
+        if ttl_days is None:
+            ttl_days = self._get_ttl_days()
+        if ttl_days <= 0 or not cache_entry or not cache_entry.get('payload'):
+            return False
+        engine, brand, ref, lang = self._normalize_key(engine, brand, ref, lang)
+        payload = cache_entry['payload']
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        now = fields.Datetime.now()
+        vals = {
+            'payload': base64.b64encode(zlib.compress(payload)),
+            'payload_size': len(payload),
+            'etag': cache_entry.get('etag') or False,
+            'fetched_at': now,
+            'expires_at': now + timedelta(days=ttl_days),
+        }
+        entry = self.sudo().search([
+            ('engine', '=', engine), ('brand', '=', brand), ('ref', '=', ref), ('lang', '=', lang),
+        ], limit=1)
+        if entry:
+            entry.write(vals)
+        else:
+            vals.update({'engine': engine, 'brand': brand, 'ref': ref, 'lang': lang})
+            entry = self.sudo().create(vals)
+        return entry
+
+    def action_expire(self):
+        """ Forces the next enrichment to revalidate against the API (ETag permitting). """
+        self.write({'expires_at': fields.Datetime.now()})
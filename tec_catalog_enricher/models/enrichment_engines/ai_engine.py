@@ -1,6 +1,8 @@
-import requests
+import hashlib
 import logging
-from odoo import _
+from odoo import _, Command
+
+from . import http_client
 
 _logger = logging.getLogger(__name__)
 
@@ -23,7 +25,10 @@ ATTRIBUTE_BLACKLIST = {
     'precio', 'price', 'cost', 'costo',
 }
 
-def enrich_marketing(product):
+# Spec rows sent as context (keeps prompts bounded on very detailed Icecat sheets)
+MAX_CONTEXT_SPECS = 60
+
+def enrich_marketing(product, attr_index=None):
     """
     Generates Marketing Content using either Gemini AI or OpenAI (configurable).
     Provider is selected via 'tec_catalog_enricher.ai_provider' system parameter.
@@ -32,30 +37,40 @@ def enrich_marketing(product):
     provider = ICP.get_param('tec_catalog_enricher.ai_provider', 'gemini')
 
     if provider == 'openai':
-        return _enrich_with_openai(product, ICP)
+        return _enrich_with_openai(product, ICP, attr_index)
     else:
-        return _enrich_with_gemini(product, ICP)
+        return _enrich_with_gemini(product, ICP, attr_index)
 
 
-def _build_context(product, ICP):
-    """Builds the text context string from product fields, based on enabled inputs."""
+def _build_context(product, ICP, supplier_only=False):
+    """
+    Builds the text context string from product fields, based on enabled inputs.
+    The name is the supplier one (x_original_name) once the AI has renamed the product.
+    supplier_only: leaves out the attribute lines, which the AI itself writes (memo key).
+    """
     input_data = []
 
     if ICP.get_param('tec_catalog_enricher.ai_input_brand') and product.product_brand_id:
         input_data.append(f"Marca: {product.product_brand_id.name}")
 
     if ICP.get_param('tec_catalog_enricher.ai_input_name'):
-        input_data.append(f"Nombre Original: {product.name}")
+        input_data.append(f"Nombre Original: {product.x_original_name or product.name}")
 
     if ICP.get_param('tec_catalog_enricher.ai_input_description_air') and product.air_description_raw:
         input_data.append(f"Descripción Air: {product.air_description_raw}")
 
     if ICP.get_param('tec_catalog_enricher.ai_input_description_enrich'):
-        specs = "\n".join([
+        spec_lines = [
             f"- {line.attribute_id.name}: {', '.join(line.value_ids.mapped('name'))}"
-            for line in product.attribute_line_ids
+            for line in ([] if supplier_only else product.attribute_line_ids)
             if line.attribute_id.name.lower() not in ATTRIBUTE_BLACKLIST
-        ])
+        ]
+        # Structured specs from Lenovo / Icecat / Best Buy (tec.product.spec)
+        spec_lines += [
+            f"- {spec.name}: {spec.value.replace(chr(10), ', ')}"
+            for spec in product.tec_spec_ids[:MAX_CONTEXT_SPECS]
+        ]
+        specs = "\n".join(spec_lines)
         if specs:
             input_data.append(f"Especificaciones Técnicas:\n{specs}")
 
@@ -65,8 +80,130 @@ def _build_context(product, ICP):
     return "\n".join(input_data)
 
 
-def _apply_ai_response(product, data):
-    """Applies parsed JSON response from any AI provider to the product."""
+class AttributeIndex:
+    """
+    In-memory index of no_variant attributes and their values, keyed by normalized name.
+    Built once per batch / mass action: applying the attributes of a product costs a
+    handful of queries (missing values created in bulk, one write for all its lines)
+    instead of three searches per attribute.
+    Must be reset() when a savepoint that created records is rolled back.
+    """
+
+    def __init__(self, env):
+        self.env = env
+        self.reset()
+
+    def reset(self):
+        self._attributes = None  # {normalized name: (id, create_variant)}
+        self._values = {}        # {attribute id: {normalized value: id}}
+
+    @staticmethod
+    def normalize(name):
+        return str(name).strip().lower()
+
+    def _load_attributes(self):
+        if self._attributes is None:
+            self._attributes = {}
+            rows = self.env['product.attribute'].search_read([], ['name', 'create_variant'], order='id')
+            for row in rows:
+                # Same lookup semantics as the former "=ilike" search: first match wins
+                self._attributes.setdefault(self.normalize(row['name']), (row['id'], row['create_variant']))
+        return self._attributes
+
+    def get_attributes(self, names):
+        """ {normalized name: attribute id} for no_variant attributes, creating the missing ones in bulk. """
+        attributes = self._load_attributes()
+        missing = {}
+        for name in names:
+            key = self.normalize(name)
+            if key not in attributes and key not in missing:
+                missing[key] = str(name).strip()
+        if missing:
+            created = self.env['product.attribute'].create([{
+                'name': name,
+                'create_variant': 'no_variant',
+                'display_type': 'select',
+            } for name in missing.values()])
+            for key, attribute in zip(missing, created):
+                attributes[key] = (attribute.id, 'no_variant')
+
+        result = {}
+        for name in names:
+            attribute_id, create_variant = attributes[self.normalize(name)]
+            if create_variant != 'no_variant':
+                _logger.info(f"Skipping attribute {name} - generates variants.")
+                continue
+            result[self.normalize(name)] = attribute_id
+        return result
+
+    def get_values(self, pairs):
+        """ pairs: [(attribute id, value name)] -> {(attribute id, normalized value): value id}. """
+        to_load = {attribute_id for attribute_id, _name in pairs} - set(self._values)
+        if to_load:
+            for attribute_id in to_load:
+                self._values[attribute_id] = {}
+            rows = self.env['product.attribute.value'].search_read(
+                [('attribute_id', 'in', list(to_load))], ['name', 'attribute_id'], order='id')
+            for row in rows:
+                self._values[row['attribute_id'][0]].setdefault(self.normalize(row['name']), row['id'])
+
+        missing = {}
+        for attribute_id, name in pairs:
+            key = (attribute_id, self.normalize(name))
+            if key[1] not in self._values[attribute_id] and key not in missing:
+                missing[key] = str(name).strip()
+        if missing:
+            created = self.env['product.attribute.value'].create([
+                {'name': name, 'attribute_id': attribute_id} for (attribute_id, _key), name in missing.items()
+            ])
+            for (attribute_id, key), value in zip(missing, created):
+                self._values[attribute_id][key] = value.id
+
+        return {(attribute_id, self.normalize(name)): self._values[attribute_id][self.normalize(name)] for attribute_id, name in pairs}
+
+    def apply(self, product, attributes_data):
+        """ Links the AI attributes to the product with a single write on attribute_line_ids. """
+        items = []
+        for attr_name, attr_val in attributes_data.items():
+            if not attr_name or not attr_val:
+                continue
+            attr_name_clean = str(attr_name).strip()
+            # Skip any "Marca", "Brand" etc. - they belong to product_brand_id
+            if attr_name_clean.lower() in ATTRIBUTE_BLACKLIST:
+                _logger.debug(f"Skipping blacklisted attribute '{attr_name_clean}'")
+                continue
+            items.append((attr_name_clean, str(attr_val).strip()))
+        if not items:
+            return
+
+        attribute_ids = self.get_attributes([name for name, _val in items])
+        pairs = [(attribute_ids[self.normalize(name)], val) for name, val in items if self.normalize(name) in attribute_ids]
+        value_ids = self.get_values(pairs)
+
+        lines = {line.attribute_id.id: line for line in product.attribute_line_ids}
+        new_lines = {}
+        commands = []
+        for attribute_id, val in pairs:
+            value_id = value_ids[(attribute_id, self.normalize(val))]
+            line = lines.get(attribute_id)
+            if line:
+                if value_id not in line.value_ids.ids:
+                    commands.append(Command.update(line.id, {'value_ids': [Command.link(value_id)]}))
+            elif attribute_id not in new_lines:
+                new_lines[attribute_id] = value_id
+        commands += [
+            Command.create({'attribute_id': attribute_id, 'value_ids': [Command.set([value_id])]})
+            for attribute_id, value_id in new_lines.items()
+        ]
+        if commands:
+            product.write({'attribute_line_ids': commands})
+
+
+def _apply_ai_response(product, data, attr_index=None):
+    """
+    Applies parsed JSON response from any AI provider to the product.
+    attr_index: AttributeIndex shared by a batch (a fresh one is built otherwise).
+    """
     # Backup original name only if not already backed up
     if not product.x_original_name:
         product.x_original_name = product.name
@@ -90,68 +227,16 @@ def _apply_ai_response(product, data):
         product.tec_technical_description = technical_html
 
     # Process Dynamic Attributes (Faceted Search) - skipping blacklisted keys
-    try:
-        with product.env.cr.savepoint():
-            attributes_data = data.get('attributes', {})
-            if attributes_data and isinstance(attributes_data, dict):
-                Attribute = product.env['product.attribute']
-                AttributeValue = product.env['product.attribute.value']
-                AttributeLine = product.env['product.template.attribute.line']
-
-                for attr_name, attr_val in attributes_data.items():
-                    if not attr_name or not attr_val:
-                        continue
-
-                    attr_name_clean = str(attr_name).strip()
-
-                    # Skip any "Marca", "Brand" etc. - they belong to product_brand_id
-                    if attr_name_clean.lower() in ATTRIBUTE_BLACKLIST:
-                        _logger.debug(f"Skipping blacklisted attribute '{attr_name_clean}'")
-                        continue
-
-                    # Find or create attribute (no_variant = no matrix explosion)
-                    attribute = Attribute.search([('name', '=ilike', attr_name_clean)], limit=1)
-                    if not attribute:
-                        attribute = Attribute.create({
-                            'name': attr_name_clean,
-                            'create_variant': 'no_variant',
-                            'display_type': 'select',
-                        })
-                    else:
-                        if attribute.create_variant != 'no_variant':
-                            _logger.info(f"Skipping attribute {attr_name_clean} - generates variants.")
-                            continue
-
-                    # Find or create value
-                    val_name = str(attr_val).strip()
-                    value = AttributeValue.search([
-                        ('name', '=ilike', val_name),
-                        ('attribute_id', '=', attribute.id)
-                    ], limit=1)
-
-                    if not value:
-                        value = AttributeValue.create({
-                            'name': val_name,
-                            'attribute_id': attribute.id
-                        })
-
-                    # Link value to product
-                    existing_line = AttributeLine.search([
-                        ('product_tmpl_id', '=', product.id),
-                        ('attribute_id', '=', attribute.id)
-                    ], limit=1)
-
-                    if existing_line:
-                        if value.id not in existing_line.value_ids.ids:
-                            existing_line.write({'value_ids': [(4, value.id)]})
-                    else:
-                        AttributeLine.create({
-                            'product_tmpl_id': product.id,
-                            'attribute_id': attribute.id,
-                            'value_ids': [(6, 0, [value.id])]
-                        })
-    except Exception as attr_e:
-        _logger.error(f"Failed to process dynamic attributes for {product.name}: {attr_e}")
+    attributes_data = data.get('attributes', {})
+    if attributes_data and isinstance(attributes_data, dict):
+        attr_index = attr_index or AttributeIndex(product.env)
+        try:
+            with product.env.cr.savepoint():
+                attr_index.apply(product, attributes_data)
+        except Exception as attr_e:
+            # Rolled back: records created in the savepoint are gone from the index too
+            attr_index.reset()
+            _logger.error(f"Failed to process dynamic attributes for {product.name}: {attr_e}")
 
     return True
 
@@ -168,79 +253,363 @@ def _parse_ai_content(raw_text):
     return json.loads(content.strip())
 
 
-def _enrich_with_gemini(product, ICP):
-    """Generates Marketing Content using Google Gemini AI."""
-    if genai is None:
-        _logger.warning("google.generativeai not installed. Run: pip install google-generativeai")
-        return False
+def _render_prompt(ICP, inputs):
+    """
+    Master prompt with the inputs injected. Plain replace instead of str.format():
+    the prompt contains a literal JSON example whose braces break format().
+    """
+    custom_prompt = ICP.get_param('tec_catalog_enricher.ai_custom_prompt') or '{inputs}'
+    return custom_prompt.replace('{inputs}', inputs)
+
+
+# One configured client per (api_key, model) for the whole process: a batch (or a mass
+# action) no longer calls genai.configure() and builds a GenerativeModel per product.
+_gemini_models = {}
+
+def _get_gemini_model(api_key, model_name):
+    key = (api_key, model_name)
+    if key not in _gemini_models:
+        genai.configure(api_key=api_key)
+        _gemini_models.clear()  # genai.configure is global: only one key can be live
+        _gemini_models[key] = genai.GenerativeModel(model_name)
+    return _gemini_models[key]
+
 
+def _call_gemini(ICP, contents):
+    """ Raw text answer from Gemini (JSON mime type requested). """
     api_key = ICP.get_param('tec_catalog_enricher.gemini_api_key')
     model_name = ICP.get_param('tec_catalog_enricher.gemini_model') or 'gemini-2.0-flash'
+    model = _get_gemini_model(api_key, model_name)
+    response = model.generate_content(contents, generation_config={'response_mime_type': 'application/json'})
+    return response.text
 
-    if not api_key:
+
+def _openai_base_url(ICP):
+    """ OpenAI or any compatible server (Azure proxy, vLLM, local stand-in for tests). """
+    return (ICP.get_param('tec_catalog_enricher.openai_base_url') or 'https://api.openai.com/v1').rstrip('/')
+
+
+def _openai_headers(ICP):
+    return {'Authorization': f"Bearer {ICP.get_param('tec_catalog_enricher.openai_api_key')}"}
+
+
+def _openai_payload(ICP, prompt):
+    """ Chat Completions body, shared by the live call and the Batch API requests. """
+    return {
+        'model': ICP.get_param('tec_catalog_enricher.openai_model') or 'gpt-4.1-nano',
+        'messages': [
+            {'role': 'system', 'content': 'You are a product enrichment assistant. Always reply with valid JSON only.'},
+            {'role': 'user', 'content': prompt},
+        ],
+        'response_format': {'type': 'json_object'},
+        'temperature': 0.4,
+    }
+
+
+def _call_openai(ICP, prompt, timeout=30):
+    """ Raw text answer from the Chat Completions API (JSON object mode). """
+    resp = http_client.post(
+        f"{_openai_base_url(ICP)}/chat/completions",
+        headers=_openai_headers(ICP), json=_openai_payload(ICP, prompt), timeout=timeout,
+    )
+    resp.raise_for_status()
+    return resp.json()['choices'][0]['message']['content']
+
+
+def _check_provider(ICP, provider):
+    if provider == 'openai':
+        if not ICP.get_param('tec_catalog_enricher.openai_api_key'):
+            _logger.warning("OpenAI API Key missing.")
+            return False
+        return True
+    if genai is None:
+        _logger.warning("google.generativeai not installed. Run: pip install google-generativeai")
+        return False
+    if not ICP.get_param('tec_catalog_enricher.gemini_api_key'):
         _logger.warning("Gemini API Key missing.")
         return False
+    return True
 
-    custom_prompt = ICP.get_param('tec_catalog_enricher.ai_custom_prompt')
-    use_image = ICP.get_param('tec_catalog_enricher.ai_input_thumbnail')
-    context_str = _build_context(product, ICP)
-    final_prompt = custom_prompt.format(inputs=context_str)
 
+def _image_part(product):
+    return {"mime_type": "image/png", "data": product.image_1920}
+
+
+# ---------------------------------------------------------------------------------
+# Response memo: identical (provider, model, prompt, image) -> stored parsed answer
+# ---------------------------------------------------------------------------------
+MEMO_ENGINE = 'ai_memo'
+DEFAULT_MEMO_TTL_DAYS = 90
+
+
+def _model_name(ICP, provider):
+    if provider == 'openai':
+        return ICP.get_param('tec_catalog_enricher.openai_model') or 'gpt-4.1-nano'
+    return ICP.get_param('tec_catalog_enricher.gemini_model') or 'gemini-2.0-flash'
+
+
+def _memo_ttl_days(ICP):
+    """ Own policy, independent from the raw HTTP cache: 0 when the memo is disabled. """
+    if ICP.get_param('tec_catalog_enricher.ai_memo_disabled'):
+        return 0
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(model_name)
+        return int(ICP.get_param('tec_catalog_enricher.ai_memo_ttl_days') or DEFAULT_MEMO_TTL_DAYS)
+    except (TypeError, ValueError):
+        return DEFAULT_MEMO_TTL_DAYS
+
+
+def _memo_key(ICP, provider, product):
+    """
+    SHA-256 of everything that shapes the answer, taken from the supplier inputs as they
+    were before any AI run (original name, no AI-written attributes): applying an answer
+    doesn't change the key, so a forced re-run hits the memo. The thumbnail counts only
+    when it is actually sent.
+    """
+    prompt = _render_prompt(ICP, _build_context(product, ICP, supplier_only=True))
+    digest = hashlib.sha256()
+    for part in (provider, _model_name(ICP, provider), prompt):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    if provider == 'gemini' and product.image_1920 and ICP.get_param('tec_catalog_enricher.ai_input_thumbnail'):
+        digest.update(product.image_1920)
+    return digest.hexdigest()
+
+
+def _memo_get(env, key):
+    ICP = env['ir.config_parameter'].sudo()
+    snapshot = env['tec.enrichment.cache']._lookup(MEMO_ENGINE, '', key, ttl_days=_memo_ttl_days(ICP))
+    if not snapshot or not snapshot['fresh']:
+        return None
+    try:
+        return json.loads(snapshot['payload'])
+    except ValueError:
+        return None
+
+
+def _memo_put(env, key, data):
+    ICP = env['ir.config_parameter'].sudo()
+    env['tec.enrichment.cache']._store(
+        MEMO_ENGINE, '', key, '', {'payload': json.dumps(data, ensure_ascii=False)}, ttl_days=_memo_ttl_days(ICP),
+    )
+
+
+def _single_prompt(product, ICP):
+    return _render_prompt(ICP, _build_context(product, ICP))
+
+
+def get_memoized(products):
+    """ {product_id: stored answer} for the products whose current input was already answered. """
+    ICP = products.env['ir.config_parameter'].sudo()
+    provider = ICP.get_param('tec_catalog_enricher.ai_provider', 'gemini')
+    results = {}
+    for product in products:
+        data = _memo_get(products.env, _memo_key(ICP, provider, product))
+        if data is not None:
+            results[product.id] = data
+    return results
+
+
+def _enrich_with_gemini(product, ICP, attr_index=None):
+    """Generates Marketing Content using Google Gemini AI."""
+    use_image = ICP.get_param('tec_catalog_enricher.ai_input_thumbnail')
+    final_prompt = _single_prompt(product, ICP)
+    memo_key = _memo_key(ICP, 'gemini', product)
+    data = _memo_get(product.env, memo_key)
+    if data is not None:
+        return _apply_ai_response(product, data, attr_index)
+
+    if not _check_provider(ICP, 'gemini'):
+        return False
 
+    try:
         contents = [final_prompt]
         if use_image and product.image_1920:
-            import base64
-            contents.append({
-                "mime_type": "image/png",
-                "data": product.image_1920
-            })
+            contents.append(_image_part(product))
 
-        response = model.generate_content(contents)
-        data = _parse_ai_content(response.text)
-        return _apply_ai_response(product, data)
+        data = _parse_ai_content(_call_gemini(ICP, contents))
+        _memo_put(product.env, memo_key, data)
+        return _apply_ai_response(product, data, attr_index)
 
     except Exception as e:
         _logger.error(f"Gemini Enrichment Failed for '{product.name}': {e}")
         return False
 
 
-def _enrich_with_openai(product, ICP):
+def _enrich_with_openai(product, ICP, attr_index=None):
     """Generates Marketing Content using OpenAI (GPT-4.1 Nano / GPT-4o-mini / o4-mini)."""
-    api_key = ICP.get_param('tec_catalog_enricher.openai_api_key')
-    model_name = ICP.get_param('tec_catalog_enricher.openai_model') or 'gpt-4.1-nano'
+    final_prompt = _single_prompt(product, ICP)
+    memo_key = _memo_key(ICP, 'openai', product)
+    data = _memo_get(product.env, memo_key)
+    if data is not None:
+        return _apply_ai_response(product, data, attr_index)
 
-    if not api_key:
-        _logger.warning("OpenAI API Key missing.")
+    if not _check_provider(ICP, 'openai'):
         return False
 
-    custom_prompt = ICP.get_param('tec_catalog_enricher.ai_custom_prompt')
-    context_str = _build_context(product, ICP)
-    final_prompt = custom_prompt.format(inputs=context_str)
-
     try:
-        import requests as req
-        headers = {
-            'Authorization': f'Bearer {api_key}',
-            'Content-Type': 'application/json',
-        }
-        payload = {
-            'model': model_name,
-            'messages': [
-                {'role': 'system', 'content': 'You are a product enrichment assistant. Always reply with valid JSON only.'},
-                {'role': 'user', 'content': final_prompt},
-            ],
-            'response_format': {'type': 'json_object'},
-            'temperature': 0.4,
-        }
-        resp = req.post('https://api.openai.com/v1/chat/completions', headers=headers, json=payload, timeout=30)
-        resp.raise_for_status()
-        raw = resp.json()['choices'][0]['message']['content']
-        data = _parse_ai_content(raw)
-        return _apply_ai_response(product, data)
+        data = _parse_ai_content(_call_openai(ICP, final_prompt))
+        _memo_put(product.env, memo_key, data)
+        return _apply_ai_response(product, data, attr_index)
 
     except Exception as e:
         _logger.error(f"OpenAI Enrichment Failed for '{product.name}': {e}")
         return False
+
+
+# ---------------------------------------------------------------------------------
+# Batched mode: N products per request, matched back by product_id
+# ---------------------------------------------------------------------------------
+BATCH_INSTRUCTIONS = """
+
+MODO LOTE: a continuación recibirás {count} productos, cada uno precedido por "### PRODUCT_ID: <id>".
+Aplica las instrucciones anteriores a CADA producto por separado, sin mezclar datos entre productos.
+Devuelve ÚNICAMENTE un objeto JSON con esta forma:
+{{"products": [{{"product_id": <id>, "seo_name": "...", "marketing_description": "...", "technical_html": "...", "attributes": {{}}}}]}}
+Incluye exactamente un elemento por producto recibido, con el mismo product_id.
+"""
+
+
+def generate_marketing_batch(products):
+    """
+    Generates copy for several products in ONE request (shared client, shared instructions).
+    Only builds prompts and calls the provider: nothing is written.
+    Returns {product_id: parsed data}; products missing from the answer are simply absent.
+    """
+    ICP = products.env['ir.config_parameter'].sudo()
+    provider = ICP.get_param('tec_catalog_enricher.ai_provider', 'gemini')
+    memo_keys = {product.id: _memo_key(ICP, provider, product) for product in products}
+    results = {}
+    for product in products:
+        data = _memo_get(products.env, memo_keys[product.id])
+        if data is not None:
+            results[product.id] = data
+    products = products.filtered(lambda p: p.id not in results)
+    if not products or not _check_provider(ICP, provider):
+        return results
+
+    header = _render_prompt(ICP, "Ver la lista de productos a continuación.")
+    header += BATCH_INSTRUCTIONS.format(count=len(products))
+    blocks = [(product, f"\n### PRODUCT_ID: {product.id}\n{_build_context(product, ICP)}\n") for product in products]
+
+    try:
+        if provider == 'openai':
+            prompt = header + "".join(block for _product, block in blocks)
+            raw = _call_openai(ICP, prompt, timeout=min(30 * len(products), 180))
+        else:
+            use_image = ICP.get_param('tec_catalog_enricher.ai_input_thumbnail')
+            contents = [header]
+            for product, block in blocks:
+                contents.append(block)
+                if use_image and product.image_1920:
+                    contents.append(_image_part(product))
+            raw = _call_gemini(ICP, contents)
+        data = _parse_ai_content(raw)
+    except Exception as e:
+        _logger.error(f"AI batch of {len(products)} products failed: {e}")
+        return results
+
+    items = data.get('products', []) if isinstance(data, dict) else data
+    valid_ids = set(products.ids)
+    answered = 0
+    for item in items if isinstance(items, list) else []:
+        try:
+            product_id = int(item.get('product_id'))
+        except (AttributeError, TypeError, ValueError):
+            continue
+        if product_id in valid_ids:
+            results[product_id] = item
+            _memo_put(products.env, memo_keys[product_id], item)
+            answered += 1
+    if answered < len(products):
+        _logger.warning(f"AI batch answered {answered}/{len(products)} products; the rest will be retried one by one.")
+    return results
+
+
+# ---------------------------------------------------------------------------------
+# Deferred mode: OpenAI-compatible Batch API (JSONL upload, polled by tec.ai.batch.job)
+# ---------------------------------------------------------------------------------
+BATCH_CUSTOM_ID_PREFIX = 'product-'
+
+
+def build_batch_jsonl(products):
+    """
+    One Chat Completions request per product, keyed by custom_id.
+    Returns (UTF-8 bytes, {product_id: memo key}) so the answers can be memoized on arrival.
+    """
+    ICP = products.env['ir.config_parameter'].sudo()
+    lines = []
+    memo_keys = {}
+    for product in products:
+        prompt = _single_prompt(product, ICP)
+        memo_keys[product.id] = _memo_key(ICP, 'openai', product)
+        lines.append(json.dumps({
+            'custom_id': f"{BATCH_CUSTOM_ID_PREFIX}{product.id}",
+            'method': 'POST',
+            'url': '/v1/chat/completions',
+            'body': _openai_payload(ICP, prompt),
+        }, ensure_ascii=False))
+    return "\n".join(lines).encode('utf-8'), memo_keys
+
+
+def submit_batch(ICP, jsonl, name='batch.jsonl'):
+    """ Uploads the JSONL file and opens the batch. Returns the provider batch object (dict). """
+    base_url = _openai_base_url(ICP)
+    headers = _openai_headers(ICP)
+    resp = http_client.post(
+        f"{base_url}/files", headers=headers, timeout=120,
+        data={'purpose': 'batch'}, files={'file': (name, jsonl, 'application/jsonl')},
+    )
+    resp.raise_for_status()
+    file_id = resp.json()['id']
+
+    resp = http_client.post(f"{base_url}/batches", headers=headers, timeout=60, json={
+        'input_file_id': file_id,
+        'endpoint': '/v1/chat/completions',
+        'completion_window': '24h',
+    })
+    resp.raise_for_status()
+    return resp.json()
+
+
+def get_batch(ICP, batch_id):
+    resp = http_client.get(f"{_openai_base_url(ICP)}/batches/{batch_id}", headers=_openai_headers(ICP), timeout=30)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def cancel_batch(ICP, batch_id):
+    resp = http_client.post(f"{_openai_base_url(ICP)}/batches/{batch_id}/cancel", headers=_openai_headers(ICP), timeout=30)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def download_batch_results(ICP, file_id, memo_keys=None):
+    """
+    Reads the output JSONL of a finished batch (answers memoized under memo_keys).
+    Returns ({product_id: parsed data}, {product_id: error message}).
+    """
+    resp = http_client.get(f"{_openai_base_url(ICP)}/files/{file_id}/content", headers=_openai_headers(ICP), timeout=300)
+    resp.raise_for_status()
+
+    results, errors = {}, {}
+    for line in resp.content.decode('utf-8').splitlines():
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            product_id = int(item['custom_id'][len(BATCH_CUSTOM_ID_PREFIX):])
+        except (ValueError, KeyError, TypeError):
+            continue
+        response = item.get('response') or {}
+        if item.get('error') or response.get('status_code') != 200:
+            errors[product_id] = str(item.get('error') or response.get('body'))[:250]
+            continue
+        try:
+            content = response['body']['choices'][0]['message']['content']
+            results[product_id] = _parse_ai_content(content)
+        except Exception as e:
+            errors[product_id] = f"Invalid answer: {e}"[:250]
+            continue
+        if memo_keys and memo_keys.get(str(product_id)):
+            _memo_put(ICP.env, memo_keys[str(product_id)], results[product_id])
+    return results, errors
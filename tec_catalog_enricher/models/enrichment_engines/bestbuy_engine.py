@@ -1,16 +1,26 @@
-import requests
-import base64
+import json
 import logging
 
+from . import http_client
+
 _logger = logging.getLogger(__name__)
+# A veces BestBuy bloquea scrapers sin User-Agent
+IMAGE_HEADERS = {'User-Agent': 'Mozilla/5.0 Odoo/19.0'}
 
 def enrich_product(product, mpn):
     """
     Motor de Enriquecimiento: Best Buy Developer API.
     Busca productos tecnológicos en el catálogo de EE.UU por Manufacturer Part Number (MPN).
     Requiere una API Key obtenida en developer.bestbuy.com.
+    Entrada secuencial: prepare (ORM) -> fetch (red) -> apply (ORM).
     """
-    ICP = product.env['ir.config_parameter'].sudo()
+    job = prepare(product, mpn)
+    data = fetch(job) if job else False
+    return apply(product, data) if data else False
+
+def prepare(product, mpn, ICP=None):
+    """ Hilo principal: lee configuración y marca. Devuelve un dict plano (sin records) o False. """
+    ICP = ICP or product.env['ir.config_parameter'].sudo()
     
     use_bestbuy = ICP.get_param('tec_catalog_enricher.use_bestbuy', 'False') == 'True'
     if not use_bestbuy:
@@ -25,6 +35,16 @@ def enrich_product(product, mpn):
         return False
 
     brand_name = product.product_brand_id.name
+    return {
+        'mpn': mpn, 'brand': brand_name, 'api_key': api_key,
+        'cache': product.env['tec.enrichment.cache']._lookup('bestbuy', brand_name, mpn),
+    }
+
+def fetch(job):
+    """ Seguro para workers: sólo red y parsing, nunca toca el ORM. """
+    mpn = job['mpn']
+    brand_name = job['brand']
+    api_key = job['api_key']
     # Buscar por Manufacturer y Model Number. A veces Best Buy usa manufacturer="HP" en lugar de HEWLETT PACKARD.
     # Por eso el Brand Normalization previo nos ayuda.
     
@@ -36,13 +56,15 @@ def enrich_product(product, mpn):
     
     try:
         _logger.info(f"BestBuy Sync for {mpn} ({brand_name})...")
-        response = requests.get(url, timeout=15)
+        # La respuesta cruda se cachea: un re-enriquecimiento no consume cuota de la API
+        status, content, cache_entry = http_client.cached_get(url, cache=job.get('cache'), timeout=15)
         
-        if response.status_code != 200:
-            _logger.warning(f"BestBuy API Error {response.status_code}: {response.text[:200]}")
+        http_client.check_status(status, 'api.bestbuy.com')
+        if status != 200:
+            _logger.warning(f"BestBuy API Error {status}: {content[:200]}")
             return False
             
-        data = response.json()
+        data = json.loads(content)
         if data.get('total', 0) == 0:
             _logger.info(f"BestBuy: Product {mpn} not found.")
             return False
@@ -50,7 +72,10 @@ def enrich_product(product, mpn):
         # Tomar el primer resultado
         p_data = data['products'][0]
         
-        vals = {}
+        result = {
+            'section_html': '', 'specs': [], 'main_image': False, 'gallery': [],
+            'cache_key': ('bestbuy', brand_name, mpn, ''), 'cache_entry': cache_entry,
+        }
         
         # --- 1. Descripción Larga ---
         long_desc = p_data.get('longDescription', '')
@@ -62,106 +87,80 @@ def enrich_product(product, mpn):
             lis = "".join([f"<li>{f.get('feature', '')}</li>" for f in features if f.get('feature')])
             features_html = f"<ul>{lis}</ul>"
             
-        # --- 3. Detalles de Especificaciones (Technical Sheet) ---
-        details = p_data.get('details', [])
-        specs_rows = []
-        for det in details:
-            name = det.get('name', '')
-            val = det.get('value', '')
-            if name and val:
-                specs_rows.append(f'''
-                    <tr style="border-bottom: 1px solid #eee;">
-                        <td style="padding: 6px 10px; font-weight: bold; width: 40%; color: #333; background-color: #fcfcfc;">{name}</td>
-                        <td style="padding: 6px 10px; color: #666;">{val}</td>
-                    </tr>
-                ''')
-                
-        specs_html = ""
-        if specs_rows:
-            specs_html = f'''
-            <div class="tec-bestbuy-specs" style="margin-top: 15px; font-family: sans-serif; border: 1px solid #e0e0e0; border-radius: 4px; overflow: hidden;">
-                <div style="background-color: #0046be; color: white; padding: 8px 12px; font-size: 1em; font-weight: bold; border-bottom: 1px solid #003696;">
-                    🎯 Especificaciones Técnicas
-                </div>
-                <table style="width: 100%; border-collapse: collapse; font-size: 12px;">
-                    <tbody>
-                        {''.join(specs_rows)}
-                    </tbody>
-                </table>
-            </div>
-            '''
+        # --- 3. Detalles de Especificaciones (filas estructuradas -> tec.product.spec) ---
+        result['specs'] = [
+            ('', det.get('name', ''), det.get('value', ''))
+            for det in p_data.get('details', [])
+            if det.get('name') and det.get('value')
+        ]
 
-        # Consolidar todo en la variable de Odoo
-        bestbuy_section = ""
-        if long_desc or features_html or specs_html:
-             bestbuy_section = f"""
+        # Texto descriptivo (se agrega una sola vez a la descripción)
+        if long_desc or features_html:
+             result['section_html'] = f"""
                 <div class="tec-bestbuy-enrichment" style="margin-top: 30px; border-top: 2px dashed #0046be; padding-top: 20px;">
                     <div style="color: #666; font-size: 0.9em; margin-bottom: 15px;">
                          <i>Fuente: Información proveída por Best Buy® Data API</i>
                     </div>
                     {f'<p class="bestbuy-long-desc">{long_desc}</p>' if long_desc else ''}
                     {features_html}
-                    {specs_html}
                 </div>
              """
-             current_desc = product.tec_enriched_description or ''
-             vals['tec_enriched_description'] = f"{current_desc}{bestbuy_section}"
              
         # --- 4. Imágenes ---
-        gallery_images_data = []
         seen_urls = set()
         
         main_img_url = p_data.get('image')
-        if main_img_url and main_img_url not in seen_urls:
+        if main_img_url:
             seen_urls.add(main_img_url)
-            img_bin = _download_image(main_img_url)
-            if img_bin:
-                if not product.image_1920:
-                    vals['image_1920'] = img_bin
-                else:
-                    gallery_images_data.append(('BestBuy Main View', img_bin))
                     
         # Galería alternativa
+        alt_urls = []
         alt_views = p_data.get('alternateViews', [])
         for i, view in enumerate(alt_views):
             if i > 5: break # Max 5 extra images
             alt_img_url = view.get('image')
             if alt_img_url and alt_img_url not in seen_urls:
                 seen_urls.add(alt_img_url)
-                img_bin = _download_image(alt_img_url)
-                if img_bin:
-                    gallery_images_data.append((f'BestBuy View {i+1}', img_bin))
-                    
-        # Guardado en Odoo
-        if vals:
-            product.write(vals)
-            
-        if gallery_images_data:
-            existing_count = len(product.tec_product_image_ids)
-            for i, (name, data) in enumerate(gallery_images_data):
-                product.env['tec.product.image'].create({
-                    'product_tmpl_id': product.id,
-                    'name': name,
-                    'sequence': 60 + existing_count + i,
-                    'image_1920': data
-                })
-        
-        return True
+                alt_urls.append((i, alt_img_url))
+
+        # Descarga en paralelo sobre el pool compartido
+        urls = ([main_img_url] if main_img_url else []) + [url for _i, url in alt_urls]
+        images = http_client.download_images(urls, headers=IMAGE_HEADERS)
+        if main_img_url:
+            result['main_image'] = images.pop(0)
+        result['gallery'] = [
+            (f'BestBuy View {i+1}', img_bin)
+            for (i, _url), img_bin in zip(alt_urls, images) if img_bin
+        ]
+        return result
         
-    except requests.exceptions.Timeout:
-        _logger.warning(f"BestBuy API timeout para {mpn}")
-        return False
+    except http_client.FETCH_ERRORS as e:
+        # Fallo de red / del servicio: el registro de intentos lo anota como error, no "sin datos"
+        _logger.warning(f"BestBuy API error de servicio para {mpn}: {e}")
+        raise
     except Exception as e:
         _logger.error(f"BestBuy API Error for {mpn}: {str(e)}")
         return False
 
-def _download_image(url):
-    try:
-        # A veces BestBuy bloquea scrapers sin User-Agent
-        headers = {'User-Agent': 'Mozilla/5.0 Odoo/19.0'}
-        r = requests.get(url, headers=headers, timeout=10)
-        if r.status_code == 200:
-            return base64.b64encode(r.content)
-    except Exception:
-        pass
-    return False
+def apply(product, data):
+    """ Hilo principal: escribe los datos obtenidos en el producto. """
+    # Descripción (una sola vez por fuente) + especificaciones estructuradas (reemplazo idempotente)
+    if data['section_html']:
+        product._append_enriched_section('tec-bestbuy-enrichment', data['section_html'])
+    if data['specs']:
+        product._replace_specs('bestbuy', data['specs'])
+
+    # Guardado en Odoo
+    if data.get('cache_entry'):
+        product.env['tec.enrichment.cache']._store(*data['cache_key'], data['cache_entry'])
+        
+    # Imágenes: pipeline diferido (sólo galería Backend, como siempre para Best Buy)
+    existing_count = len(product.tec_product_image_ids)
+    entries = [{'target': 'main_or_gallery', 'name': 'BestBuy Main View', 'sequence': 60 + existing_count, 'data': data['main_image'], 'website_gallery': False}]
+    entries += [
+        {'target': 'gallery', 'name': name, 'sequence': 61 + existing_count + i, 'data': img_data, 'website_gallery': False}
+        for i, (name, img_data) in enumerate(data['gallery'])
+    ]
+    product.env['tec.image.job']._assign_images(product, entries)
+    
+    return True
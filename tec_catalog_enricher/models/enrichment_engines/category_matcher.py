@@ -0,0 +1,83 @@
+import re
+import unicodedata
+from collections import defaultdict
+
+# Local (offline) category matcher: supplier category names vs product.public.category.
+# Names are normalized (lowercase, no accents, singular-ish tokens) and compared with
+# pg_trgm-style trigram similarity plus token overlap. An inverted trigram index keeps
+# the comparison to the candidates sharing at least one trigram with the name.
+
+STOPWORDS = {'de', 'del', 'la', 'las', 'el', 'los', 'y', 'e', 'para', 'con', 'en', 'a', 'and', 'for', 'the', 'of'}
+TRIGRAM_WEIGHT = 0.6
+TOKEN_WEIGHT = 0.4
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    return re.sub(r'[^a-z0-9]+', ' ', text).strip()
+
+
+def _stem(token):
+    # Plural folding good enough for catalogs ("notebooks"/"notebook", "impresoras"/"impresora")
+    if len(token) > 4 and token.endswith('es') and token[-3] not in 'aeiou':
+        return token[:-2]
+    if len(token) > 3 and token.endswith('s'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    return {_stem(t) for t in normalize(text).split() if t not in STOPWORDS}
+
+
+def trigrams(tokens):
+    """ pg_trgm style: each word padded with two leading spaces and one trailing. """
+    grams = set()
+    for token in tokens:
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class CategoryMatcher:
+    """
+    Built once per mapping run from [(category id, name, full path)].
+    The leaf name carries the score; the path only breaks ties ("Accesorios" under
+    "Computación" vs under "Celulares") through the token overlap.
+    """
+
+    def __init__(self, candidates):
+        self._candidates = []
+        self._index = defaultdict(set)
+        for category_id, name, path in candidates:
+            tokens = tokenize(name)
+            grams = trigrams(tokens)
+            if not grams:
+                continue
+            position = len(self._candidates)
+            self._candidates.append((category_id, path or name, tokens, tokenize(path), grams))
+            for gram in grams:
+                self._index[gram].add(position)
+
+    def match(self, name, limit=5):
+        """ [(score 0..1, category id, path)] best first. """
+        tokens = tokenize(name)
+        grams = trigrams(tokens)
+        if not grams:
+            return []
+        positions = set()
+        for gram in grams:
+            positions |= self._index.get(gram, set())
+
+        scored = []
+        for position in positions:
+            category_id, path, cand_tokens, path_tokens, cand_grams = self._candidates[position]
+            trigram_sim = len(grams & cand_grams) / len(grams | cand_grams)
+            token_sim = (2 * len(tokens & cand_tokens) / (len(tokens) + len(cand_tokens))) if cand_tokens else 0.0
+            score = TRIGRAM_WEIGHT * trigram_sim + TOKEN_WEIGHT * token_sim
+            # Tie-breaker: supplier words present in the parent path
+            score += 0.01 * len(tokens & (path_tokens - cand_tokens))
+            scored.append((min(score, 1.0), category_id, path))
+        scored.sort(key=lambda s: (-s[0], len(s[2])))
+        return scored[:limit]
@@ -1,66 +1,85 @@
-import requests
 import logging
 import base64
 
+from . import http_client
+
 _logger = logging.getLogger(__name__)
+CSE_URL = "https://www.googleapis.com/customsearch/v1"
 
 def enrich_product(product, mpn):
     """
     Fallback: Google Custom Search for Images & PDFs.
     Odoo v19 natively supports WebP for optimal SEO and performance.
+    Sequential entry point: prepare (ORM) -> fetch (network) -> apply (ORM).
     """
-    api_key = product.env['ir.config_parameter'].sudo().get_param('tec_catalog_enricher.google_cse_key')
-    cx = product.env['ir.config_parameter'].sudo().get_param('tec_catalog_enricher.google_cse_cx')
+    job = prepare(product, mpn)
+    data = fetch(job) if job else False
+    return apply(product, data) if data else False
+
+def prepare(product, mpn, ICP=None):
+    """ Main thread: credentials + what the product is still missing. Returns a plain dict or False. """
+    ICP = ICP or product.env['ir.config_parameter'].sudo()
+    api_key = ICP.get_param('tec_catalog_enricher.google_cse_key')
+    cx = ICP.get_param('tec_catalog_enricher.google_cse_cx')
     
     if not api_key or not cx:
          _logger.warning("Google CSE credentials missing.")
          return False
 
+    use_google_text = ICP.get_param('tec_catalog_enricher.use_google', 'False') == 'True'
+    return {
+        'mpn': mpn,
+        'brand': product.product_brand_id.name,
+        'api_key': api_key,
+        'cx': cx,
+        'need_image': not product.image_1920,
+        'need_pdf': not product.product_document_ids.filtered(lambda d: d.mimetype == 'application/pdf'),
+        'need_text': use_google_text and not product.tec_enriched_description,
+    }
+
+def fetch(job):
+    """ Worker-safe: network only. Always returns a dict when credentials exist (same as before). """
+    mpn, brand, api_key, cx = job['mpn'], job['brand'], job['api_key'], job['cx']
+    result = {'mpn': mpn, 'image': False, 'pdf': False, 'text_html': ''}
+
     # 1. Image Search (WebP / PNG / JPG)
-    if not product.image_1920:
+    if job['need_image']:
         # Search without strict filetype extension to get highest quality original
-        query = f"{product.product_brand_id.name} {mpn} official product image"
-        url = f"https://www.googleapis.com/customsearch/v1?q={query}&cx={cx}&key={api_key}&searchType=image&num=1&imgSize=large"
+        query = f"{brand} {mpn} official product image"
+        params = {'q': query, 'cx': cx, 'key': api_key, 'searchType': 'image', 'num': 1, 'imgSize': 'large'}
         try:
-            res = requests.get(url).json()
+            res = http_client.get(CSE_URL, params=params).json()
             if 'items' in res:
                 img_url = res['items'][0]['link']
                 # Download
-                img_data = requests.get(img_url, timeout=10)
+                img_data = http_client.get(img_url, timeout=10)
                 if img_data.status_code == 200 and 'image' in img_data.headers.get('Content-Type', ''):
                     # Odoo 19 will automatically handle the storage and serve as WebP to clients
-                    product.image_1920 = base64.b64encode(img_data.content)
+                    result['image'] = base64.b64encode(img_data.content)
         except Exception as e:
             _logger.error(f"Google Image Search Failed: {e}")
 
     # 2. PDF Datasheet Search
-    if not product.product_document_ids.filtered(lambda d: d.mimetype == 'application/pdf'):
-        query_pdf = f"{product.product_brand_id.name} {mpn} specifications filetype:pdf"
-        url_pdf = f"https://www.googleapis.com/customsearch/v1?q={query_pdf}&cx={cx}&key={api_key}&num=1"
+    if job['need_pdf']:
+        query_pdf = f"{brand} {mpn} specifications filetype:pdf"
+        params_pdf = {'q': query_pdf, 'cx': cx, 'key': api_key, 'num': 1}
         try:
-            res = requests.get(url_pdf).json()
+            res = http_client.get(CSE_URL, params=params_pdf).json()
             if 'items' in res:
                 pdf_url = res['items'][0]['link']
                 _logger.info(f"Google: Found PDF datasheet at {pdf_url}")
-                pdf_res = requests.get(pdf_url, timeout=15)
+                pdf_res = http_client.get(pdf_url, timeout=15)
                 if pdf_res.status_code == 200:
-                    product.env['product.document'].create({
-                        'name': f"Ficha Técnica {mpn}.pdf",
-                        'raw': pdf_res.content,
-                        'res_model': 'product.template',
-                        'res_id': product.id,
-                        'shown_on_product_page': True,
-                    })
+                    result['pdf'] = pdf_res.content
         except Exception as e:
              _logger.error(f"Google PDF Search Failed: {e}")
              
     # 3. Web Text Fallback (Organic AI Snippets)
-    use_google_text = product.env['ir.config_parameter'].sudo().get_param('tec_catalog_enricher.use_google', 'False') == 'True'
-    if use_google_text and not product.tec_enriched_description:
-        query_text = f"{product.product_brand_id.name} {mpn} specifications features"
-        url_text = f"https://www.googleapis.com/customsearch/v1?q={query_text}&cx={cx}&key={api_key}&num=3"
+    if job['need_text']:
+        query_text = f"{brand} {mpn} specifications features"
+        params_text = {'q': query_text, 'cx': cx, 'key': api_key, 'num': 3}
         try:
-            res_text = requests.get(url_text, timeout=10).json()
+            res_text = http_client.get(CSE_URL, params=params_text, timeout=10).json()
             if 'items' in res_text:
                 snippets = []
                 for item in res_text['items']:
@@ -70,7 +89,7 @@ def enrich_product(product, mpn):
                         snippets.append(f"<li style='margin-bottom: 8px;'><b>{title}</b>: {snippet}</li>")
                 
                 if snippets:
-                    html_content = f"""
+                    result['text_html'] = f"""
                     <div class="tec-google-ai-fallback" style="margin-top: 30px; border-top: 2px dashed #4285F4; padding-top: 20px;">
                         <div style="color: #666; font-size: 0.9em; margin-bottom: 15px;">
                              <i>Fuente: AI Web Search Fallback (Google)</i>
@@ -80,9 +99,30 @@ def enrich_product(product, mpn):
                         </ul>
                     </div>
                     """
-                    product.tec_enriched_description = html_content
-                    _logger.info(f"Google: Added Web Text Fallback for {mpn}")
         except Exception as e:
             _logger.error(f"Google Text Search Failed: {e}")
 
+    return result
+
+def apply(product, data):
+    """ Main thread: writes fetched data, re-checking the product state at write time. """
+    mpn = data['mpn']
+    if data['image']:
+        product.env['tec.image.job']._assign_images(product, [
+            {'target': 'main_if_empty', 'name': 'Google Image', 'data': data['image']},
+        ])
+
+    if data['pdf']:
+        product.env['product.document'].create({
+            'name': f"Ficha Técnica {mpn}.pdf",
+            'raw': data['pdf'],
+            'res_model': 'product.template',
+            'res_id': product.id,
+            'shown_on_product_page': True,
+        })
+
+    if data['text_html'] and not product.tec_enriched_description:
+        product.tec_enriched_description = data['text_html']
+        _logger.info(f"Google: Added Web Text Fallback for {mpn}")
+
     return True
@@ -0,0 +1,192 @@
+import base64
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_logger = logging.getLogger(__name__)
+
+# Shared HTTP layer for every enrichment engine.
+# One Session = one urllib3 PoolManager, which keeps a keep-alive pool per host
+# (live.icecat.biz, psref.lenovo.com, api.bestbuy.com...), so the TLS handshake
+# is paid once per host and worker instead of once per request.
+DEFAULT_TIMEOUT = 15
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 10.0
+POOL_CONNECTIONS = 16  # Number of hosts kept in the pool manager
+POOL_MAXSIZE = 16      # Keep-alive sockets per host (>= concurrent workers)
+IMAGE_WORKERS = 4      # Parallel downloads per gallery
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+DEFAULT_HEADERS = {
+    'User-Agent': 'Odoo-TecEcommerceSuite/1.0',
+    'Accept-Encoding': 'gzip, deflate',
+}
+
+_settings = {
+    'timeout': DEFAULT_TIMEOUT,
+    'retries': DEFAULT_RETRIES,
+    'backoff': DEFAULT_BACKOFF,
+}
+_session = None
+_session_lock = threading.Lock()
+
+
+def configure(env):
+    """ Loads timeout / retry settings from System Parameters (call from the main thread). """
+    ICP = env['ir.config_parameter'].sudo()
+    _settings['timeout'] = _to_float(ICP.get_param('tec_catalog_enricher.http_timeout'), DEFAULT_TIMEOUT)
+    _settings['retries'] = int(_to_float(ICP.get_param('tec_catalog_enricher.http_max_retries'), DEFAULT_RETRIES))
+    _settings['backoff'] = _to_float(ICP.get_param('tec_catalog_enricher.http_backoff'), DEFAULT_BACKOFF)
+
+
+def get_session():
+    """ Lazily builds the process-wide pooled session. """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                # Retries are handled in request() to add jitter and honour Retry-After.
+                adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.headers.update(DEFAULT_HEADERS)
+                _session = session
+    return _session
+
+
+def request(method, url, timeout=None, retries=None, **kwargs):
+    """
+    Performs an HTTP request through the shared pool.
+    Retries connection errors, timeouts and 429/5xx answers with jittered exponential backoff.
+    The last response (or exception) is returned/raised exactly like requests would.
+    """
+    timeout = timeout or _settings['timeout']
+    retries = _settings['retries'] if retries is None else retries
+    session = get_session()
+
+    attempt = 0
+    while True:
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt >= retries:
+                raise
+            _logger.debug(f"HTTP {method} {url} failed ({e}), retry {attempt + 1}/{retries}")
+            _sleep_backoff(attempt)
+            attempt += 1
+            continue
+
+        if response.status_code in RETRY_STATUSES and attempt < retries:
+            _logger.debug(f"HTTP {method} {url} returned {response.status_code}, retry {attempt + 1}/{retries}")
+            _sleep_backoff(attempt, response)
+            response.close()
+            attempt += 1
+            continue
+        return response
+
+
+class FetchError(Exception):
+    """ The service failed (auth, rate limit, 5xx): the answer says nothing about the product. """
+
+
+# Raised (not swallowed) by the engines' fetch(): the miss ledger records them as 'error'
+FETCH_ERRORS = (requests.exceptions.RequestException, FetchError)
+
+
+def check_status(status, url=''):
+    """ Raises FetchError for answers that are failures of the service, not "product not found". """
+    if status >= 500 or status in (401, 403, 429):
+        raise FetchError(f"HTTP {status} {url}".strip())
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def cached_get(url, cache=None, headers=None, **kwargs):
+    """
+    GET backed by a tec.enrichment.cache snapshot (taken in prepare() on the main thread).
+    - Fresh snapshot: served from memory, no network at all.
+    - Stale snapshot with ETag: conditional request, a 304 re-uses the stored body.
+    Returns (status_code, content_bytes, cache_entry). cache_entry is what apply() must
+    persist, None when there is nothing new to store.
+    """
+    if cache and cache.get('fresh'):
+        return 200, cache['payload'], None
+
+    headers = dict(headers or {})
+    if cache and cache.get('etag'):
+        headers['If-None-Match'] = cache['etag']
+    response = get(url, headers=headers, **kwargs)
+
+    if response.status_code == 304 and cache:
+        return 200, cache['payload'], {'payload': cache['payload'], 'etag': cache['etag']}
+    if response.status_code != 200:
+        return response.status_code, response.content, None
+    return 200, response.content, {'payload': response.content, 'etag': response.headers.get('ETag')}
+
+
+def download_image(url, headers=None, timeout=10):
+    """ Downloads an image and returns it base64-encoded (Odoo Image field format), or False. """
+    try:
+        r = get(url, headers=headers, timeout=timeout)
+        if r.status_code == 200:
+            return base64.b64encode(r.content)
+    except Exception:
+        pass
+    return False
+
+
+def download_images(urls, headers=None, timeout=10):
+    """ Downloads a gallery in parallel. Returns base64 payloads (or False) in the same order as urls. """
+    urls = list(urls)
+    if len(urls) <= 1:
+        return [download_image(url, headers=headers, timeout=timeout) for url in urls]
+    with ThreadPoolExecutor(max_workers=min(IMAGE_WORKERS, len(urls))) as executor:
+        return list(executor.map(lambda url: download_image(url, headers=headers, timeout=timeout), urls))
+
+
+class RateLimiter:
+    """ Minimum interval between calls, shared by every worker thread of the process. """
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._last_call = 0.0
+
+    def wait(self):
+        # The lock is held while sleeping: workers queue up and leave one interval apart
+        with self._lock:
+            delay = self._last_call + self.min_interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._last_call = time.monotonic()
+
+
+def _sleep_backoff(attempt, response=None):
+    delay = None
+    if response is not None:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            delay = min(float(retry_after), MAX_BACKOFF)
+    if delay is None:
+        # "Full jitter": spreads retries of parallel workers over the whole window
+        delay = random.uniform(0, min(MAX_BACKOFF, _settings['backoff'] * (2 ** attempt)))
+    time.sleep(delay)
+
+
+def _to_float(value, default):
+    try:
+        return float(value) if value not in (None, False, '') else default
+    except (TypeError, ValueError):
+        return default
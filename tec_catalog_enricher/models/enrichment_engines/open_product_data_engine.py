@@ -1,15 +1,27 @@
-import requests
+import json
 import logging
 
+from . import http_client
+
 _logger = logging.getLogger(__name__)
 
+# User-Agent is recommended by OpenFacts Foundation
+HEADERS = {'User-Agent': 'Odoo-TecEcommerceSuite/1.0'}
+
 def enrich_product(product, mpn=None, ean=None):
     """
     Motor de Enriquecimiento: Product Open Data / Open Products Facts.
     Busca productos por EAN/UPC en bases de datos abiertas y comunitarias.
     Ideal para productos donde Icecat o BestBuy fallan.
+    Entrada secuencial: prepare (ORM) -> fetch (red) -> apply (ORM).
     """
-    ICP = product.env['ir.config_parameter'].sudo()
+    job = prepare(product, mpn, ean=ean)
+    data = fetch(job) if job else False
+    return apply(product, data) if data else False
+
+def prepare(product, mpn=None, ICP=None, ean=None):
+    """ Main thread: snapshot of config and barcode. Returns a plain dict (no records) or False. """
+    ICP = ICP or product.env['ir.config_parameter'].sudo()
     
     use_pod = ICP.get_param('tec_catalog_enricher.use_pod', 'False') == 'True'
     if not use_pod:
@@ -19,36 +31,39 @@ def enrich_product(product, mpn=None, ean=None):
     if not barcode:
         _logger.info("POD Engine: No EAN/Barcode provided, skipping.")
         return False
+    return {
+        'barcode': barcode,
+        'need_image': not product.image_1920,
+        'cache': product.env['tec.enrichment.cache']._lookup('pod', '', barcode),
+    }
 
+def fetch(job):
+    """ Worker-safe: network only, never touches the ORM. """
+    barcode = job['barcode']
     url = f"https://world.openproductsfacts.org/api/v0/product/{barcode}.json"
     
     try:
         _logger.info(f"Open Product Data Sync for EAN {barcode}...")
-        
-        # User-Agent is recommended by OpenFacts Foundation
-        headers = {'User-Agent': 'Odoo-TecEcommerceSuite/1.0'}
-        response = requests.get(url, headers=headers, timeout=10)
-        
-        if response.status_code != 200:
+        status, content, cache_entry = http_client.cached_get(url, cache=job.get('cache'), headers=HEADERS, timeout=10)
+        http_client.check_status(status, url)
+        if status != 200:
             return False
             
-        data = response.json()
+        data = json.loads(content)
         if data.get('status') != 1:
             _logger.info(f"POD: Product {barcode} not found.")
             return False
             
         p_data = data.get('product', {})
-        vals = {}
-        
-        name = p_data.get('product_name', '')
-        # Only overwrite if we have nothing better. Usually we have a name from Air
-        if name and product.name == 'New Product':
-            vals['name'] = name
+        result = {
+            'name': p_data.get('product_name', ''), 'section_html': '', 'image': False,
+            'cache_key': ('pod', '', barcode, ''), 'cache_entry': cache_entry,
+        }
             
         # Description
         desc = p_data.get('generic_name', '') or p_data.get('generic_name_en', '')
         if desc:
-             pod_section = f"""
+             result['section_html'] = f"""
                 <div class="tec-pod-enrichment" style="margin-top: 30px; border-top: 2px dashed #4CAF50; padding-top: 20px;">
                     <div style="color: #666; font-size: 0.9em; margin-bottom: 15px;">
                          <i>Fuente: Información proveída por Product Open Data / OpenProductsFacts</i>
@@ -56,25 +71,39 @@ def enrich_product(product, mpn=None, ean=None):
                     <p class="pod-desc">{desc}</p>
                 </div>
              """
-             current_desc = product.tec_enriched_description or ''
-             vals['tec_enriched_description'] = f"{current_desc}{pod_section}"
-
-        if vals:
-             product.write(vals)
 
         # Main Image (often crowd-sourced photos, good fallback)
         img_url = p_data.get('image_url')
-        if img_url and not product.image_1920:
-             img_res = requests.get(img_url, headers=headers, timeout=10)
-             if img_res.status_code == 200:
-                 import base64
-                 product.image_1920 = base64.b64encode(img_res.content)
+        if img_url and job['need_image']:
+             result['image'] = http_client.download_image(img_url, headers=HEADERS)
                  
-        return True
+        return result
 
-    except requests.exceptions.Timeout:
-        _logger.warning(f"POD Engine timeout para EAN {barcode}")
-        return False
+    except http_client.FETCH_ERRORS as e:
+        _logger.warning(f"POD Engine service error for EAN {barcode}: {e}")
+        raise
     except Exception as e:
         _logger.error(f"POD Engine Error for {barcode}: {str(e)}")
         return False
+
+def apply(product, data):
+    """ Main thread: writes fetched data on the product. """
+    vals = {}
+    # Only overwrite if we have nothing better. Usually we have a name from Air
+    if data['name'] and product.name == 'New Product':
+        vals['name'] = data['name']
+
+    if data['section_html']:
+        product._append_enriched_section('tec-pod-enrichment', data['section_html'])
+
+    if data['image']:
+        product.env['tec.image.job']._assign_images(product, [
+            {'target': 'main_if_empty', 'name': 'Open Product Data', 'data': data['image']},
+        ])
+
+    if data.get('cache_entry'):
+        product.env['tec.enrichment.cache']._store(*data['cache_key'], data['cache_entry'])
+
+    if vals:
+        product.write(vals)
+    return True
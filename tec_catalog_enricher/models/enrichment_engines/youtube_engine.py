@@ -1,6 +1,7 @@
-import requests
 import logging
 
+from . import http_client
+
 _logger = logging.getLogger(__name__)
 
 def enrich_video(product):
@@ -17,10 +18,11 @@ def enrich_video(product):
         return True # Already has video
 
     query = f"{product.product_brand_id.name} {product.name} review español"
-    url = f"https://www.googleapis.com/youtube/v3/search?part=snippet&q={query}&key={api_key}&type=video&maxResults=1"
+    url = "https://www.googleapis.com/youtube/v3/search"
+    params = {'part': 'snippet', 'q': query, 'key': api_key, 'type': 'video', 'maxResults': 1}
     
     try:
-        res = requests.get(url).json()
+        res = http_client.get(url, params=params).json()
         if 'items' in res and len(res['items']) > 0:
             video_id = res['items'][0]['id']['videoId']
             product.video_url = f"https://www.youtube.com/watch?v={video_id}"
@@ -0,0 +1,111 @@
+from odoo import api, fields, models
+from datetime import timedelta
+import hashlib
+import logging
+
+_logger = logging.getLogger(__name__)
+SUITE_LOG_PREFIX = "[Tec Suite] Brain Hub: "
+
+DEFAULT_BACKOFF_HOURS = 24
+ERROR_BACKOFF_HOURS = 1  # Network/API errors are usually transient
+MAX_BACKOFF_DAYS = 30
+
+
+class EnrichmentMiss(models.Model):
+    """
+    Negative-result ledger per (engine, MPN, fingerprint).
+    Every "not found" / error doubles the wait before that engine is asked again for the MPN.
+    The fingerprint (brand + barcode) is part of the key: templates sharing an MPN under
+    different brands keep their own backoff, and a brand / barcode change starts a new entry.
+    """
+    _name = 'tec.enrichment.miss'
+    _description = 'Enrichment Negative Result Ledger'
+    _order = 'next_retry_at desc'
+
+    engine = fields.Char(string="Motor", required=True, index=True)
+    ref = fields.Char(string="MPN", required=True, index=True)
+    product_tmpl_id = fields.Many2one('product.template', string="Producto", ondelete='cascade', index=True)
+    fingerprint = fields.Char(string="Huella (Marca/EAN)", required=True)
+    outcome = fields.Selection([
+        ('not_found', 'Sin Datos'),
+        ('error', 'Error'),
+    ], string="Último Resultado", default='not_found')
+    miss_count = fields.Integer(string="Intentos Fallidos", default=0)
+    last_attempt_at = fields.Datetime(string="Último Intento")
+    next_retry_at = fields.Datetime(string="Próximo Reintento", index=True)
+
+    _uniq_engine_ref_fingerprint = models.Constraint(
+        'unique(engine, ref, fingerprint)',
+        'Only one ledger entry per engine, MPN and brand / barcode!',
+    )
+
+    @api.model
+    def _normalize_ref(self, ref):
+        return (ref or '').strip().upper()
+
+    @api.model
+    def _fingerprint(self, product):
+        """ Brand + barcode of the product: when either changes, the backoff restarts. """
+        raw = f"{(product.product_brand_id.name or '').strip().lower()}|{(product.barcode or '').strip()}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    @api.model
+    def _get_blocked(self, refs):
+        """
+        One query for a whole batch. Returns {(engine, ref, fingerprint)} for the entries
+        that are still waiting (next_retry_at in the future).
+        """
+        refs = list({self._normalize_ref(r) for r in refs if r})
+        if not refs:
+            return set()
+        entries = self.sudo().search_read(
+            [('ref', 'in', refs), ('next_retry_at', '>', fields.Datetime.now())],
+            ['engine', 'ref', 'fingerprint'],
+        )
+        return {(e['engine'], e['ref'], e['fingerprint']) for e in entries}
+
+    @api.model
+    def _record_miss(self, engine, ref, product, outcome='not_found'):
+        """ Registers a miss and schedules the next retry with exponential backoff. """
+        ref = self._normalize_ref(ref)
+        if not ref:
+            return False
+        fingerprint = self._fingerprint(product)
+        entry = self.sudo().search([('engine', '=', engine), ('ref', '=', ref), ('fingerprint', '=', fingerprint)], limit=1)
+        miss_count = entry.miss_count + 1 if entry else 1
+
+        ICP = self.env['ir.config_parameter'].sudo()
+        try:
+            base_hours = float(ICP.get_param('tec_catalog_enricher.miss_backoff_hours', DEFAULT_BACKOFF_HOURS))
+        except (TypeError, ValueError):
+            base_hours = DEFAULT_BACKOFF_HOURS
+        if outcome == 'error':
+            base_hours = min(base_hours, ERROR_BACKOFF_HOURS)
+        delay = min(timedelta(hours=base_hours * (2 ** (miss_count - 1))), timedelta(days=MAX_BACKOFF_DAYS))
+
+        now = fields.Datetime.now()
+        vals = {
+            'product_tmpl_id': product.id,
+            'outcome': outcome,
+            'miss_count': miss_count,
+            'last_attempt_at': now,
+            'next_retry_at': now + delay,
+        }
+        if entry:
+            entry.write(vals)
+        else:
+            vals.update({'engine': engine, 'ref': ref, 'fingerprint': fingerprint})
+            entry = self.sudo().create(vals)
+        return entry
+
+    @api.model
+    def _clear(self, engine, ref, product):
+        """ The engine found data for this brand / barcode: forget its previous misses. """
+        ref = self._normalize_ref(ref)
+        self.sudo().search([
+            ('engine', '=', engine), ('ref', '=', ref), ('fingerprint', '=', self._fingerprint(product)),
+        ]).unlink()
+
+    def action_reset(self):
+        """ Retry now. """
+        self.write({'next_retry_at': fields.Datetime.now(), 'miss_count': 0})
@@ -0,0 +1,174 @@
+from odoo import api, fields, models
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+SUITE_LOG_PREFIX = "[Tec Suite] Brain Hub: "
+
+# Priority weights (log scale: 10 units of stock vs 1000 is not 100x more urgent)
+WEIGHT_STOCK = 10.0
+WEIGHT_PRICE = 5.0
+WEIGHT_PUBLISHED = 20.0
+WEIGHT_TRAFFIC = 8.0
+TRAFFIC_DAYS = 30
+MAX_ATTEMPTS = 5          # Products not found after this many runs are parked (no more quota)
+STALE_AFTER_HOURS = 6     # The mass-enrichment cron rescores the queue past this age
+
+
+class EnrichmentQueue(models.Model):
+    """
+    Persistent enrichment work queue.
+    Scores are recomputed in bulk (one SQL statement) from vendor stock, USD price,
+    publication state and website traffic. The cron pops the top N through the
+    (state, priority_score DESC) index, so API quota goes to the products that sell.
+    """
+    _name = 'tec.enrichment.queue'
+    _description = 'Enrichment Work Queue'
+    _order = 'priority_score desc, id'
+
+    product_tmpl_id = fields.Many2one('product.template', string="Producto", required=True, ondelete='cascade')
+    state = fields.Selection([
+        ('pending', 'Pendiente'),
+        ('done', 'Procesado'),
+        ('parked', 'Descartado'),
+    ], string="Estado", default='pending', required=True,
+        help="Descartado: sin resultados tras el máximo de intentos; vuelve a la cola al forzar el enriquecimiento.")
+    base_score = fields.Float(string="Puntaje Base", readonly=True)
+    priority_score = fields.Float(string="Prioridad", readonly=True, help="Puntaje base / (1 + intentos): los productos que no se encuentran ceden el lugar.")
+    attempts = fields.Integer(string="Intentos", readonly=True)
+    scored_at = fields.Datetime(string="Puntuado", readonly=True)
+    last_attempt_at = fields.Datetime(string="Último Intento", readonly=True)
+
+    # Backs the INSERT ... ON CONFLICT (product_tmpl_id) of _refresh_scores
+    _uniq_product = models.Constraint('unique(product_tmpl_id)', 'A product can only be queued once!')
+
+    def init(self):
+        create_index(
+            self.env.cr, 'tec_enrichment_queue_state_priority_idx', self._table,
+            ['state', 'priority_score DESC', 'id'],
+        )
+
+    @api.model
+    def _eligible_sql(self):
+        """ Products waiting for enrichment: active goods with an MPN or SKU still in 'draft'. """
+        return SQL("""
+            pt.active
+            AND pt.type = 'consu'
+            AND COALESCE(pt.enrichment_state, 'draft') = 'draft'
+            AND (pt.original_part_number IS NOT NULL OR pt.default_code IS NOT NULL)
+        """)
+
+    @api.model
+    def _score_sql(self):
+        """ Priority expression + the optional joins it needs (website modules may not be installed). """
+        Product = self.env['product.template']
+        published = SQL("0")
+        if 'is_published' in Product._fields:
+            published = SQL("CASE WHEN pt.is_published THEN %s ELSE 0 END", WEIGHT_PUBLISHED)
+
+        traffic_join = SQL("")
+        traffic = SQL("0")
+        if 'website.track' in self.env and 'product_id' in self.env['website.track']._fields:
+            traffic_join = SQL("""
+                LEFT JOIN (
+                    SELECT pp.product_tmpl_id, COUNT(*) AS views
+                      FROM website_track wt
+                      JOIN product_product pp ON pp.id = wt.product_id
+                     WHERE wt.visit_datetime >= (now() at time zone 'UTC') - make_interval(days => %s)
+                  GROUP BY pp.product_tmpl_id
+                ) tr ON tr.product_tmpl_id = pt.id
+            """, TRAFFIC_DAYS)
+            traffic = SQL("%s * LN(1 + COALESCE(tr.views, 0))", WEIGHT_TRAFFIC)
+
+        score = SQL("""
+            %s * LN(1 + GREATEST(COALESCE(st.stock, 0), 0))
+            + %s * LN(1 + GREATEST(COALESCE(pt.x_usd_price, 0), 0))
+            + %s + %s
+        """, WEIGHT_STOCK, WEIGHT_PRICE, published, traffic)
+        return score, traffic_join
+
+    @api.model
+    def _refresh_scores(self):
+        """ Bulk upsert of every eligible product + close entries that no longer need work. """
+        self.env.flush_all()
+        score, traffic_join = self._score_sql()
+        eligible = self._eligible_sql()
+        self.env.cr.execute(SQL("""
+            INSERT INTO tec_enrichment_queue
+                (product_tmpl_id, state, base_score, priority_score, attempts, scored_at,
+                 create_uid, create_date, write_uid, write_date)
+            SELECT pt.id, 'pending', sc.score, sc.score, 0, now() at time zone 'UTC',
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+              FROM product_template pt
+         LEFT JOIN (
+                    SELECT product_tmpl_id, SUM(x_vendor_stock) AS stock
+                      FROM product_supplierinfo
+                  GROUP BY product_tmpl_id
+                ) st ON st.product_tmpl_id = pt.id
+              %(traffic_join)s
+        CROSS JOIN LATERAL (SELECT %(score)s AS score) sc
+             WHERE %(eligible)s
+       ON CONFLICT (product_tmpl_id) DO UPDATE SET
+                base_score = EXCLUDED.base_score,
+                attempts = CASE WHEN tec_enrichment_queue.state = 'done' OR %(forced)s THEN 0 ELSE tec_enrichment_queue.attempts END,
+                priority_score = EXCLUDED.base_score / (1 + CASE WHEN tec_enrichment_queue.state = 'done' OR %(forced)s THEN 0 ELSE tec_enrichment_queue.attempts END),
+                state = CASE WHEN tec_enrichment_queue.state = 'parked' AND NOT %(forced)s THEN 'parked' ELSE 'pending' END,
+                scored_at = EXCLUDED.scored_at,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+        """, uid=self.env.uid, traffic_join=traffic_join, score=score, eligible=eligible,
+            forced=SQL("EXISTS (SELECT 1 FROM product_template f WHERE f.id = EXCLUDED.product_tmpl_id AND f.force_enrichment)")))
+        queued = self.env.cr.rowcount
+
+        self.env.cr.execute(SQL("""
+            UPDATE tec_enrichment_queue q
+               SET state = 'done', write_date = now() at time zone 'UTC'
+              FROM product_template pt
+             WHERE pt.id = q.product_tmpl_id
+               AND q.state IN ('pending', 'parked')
+               AND NOT (%s)
+        """, eligible))
+        closed = self.env.cr.rowcount
+        self.invalidate_model()
+        _logger.info(f"{SUITE_LOG_PREFIX}Enrichment queue refreshed: {queued} pending scored, {closed} closed.")
+        return queued
+
+    @api.model
+    def _pop(self, limit):
+        """
+        Top N pending entries (index scan). Attempts are bumped *before* processing so a
+        crash in the middle of a batch never pins the same products at the top.
+        """
+        entries = self.search([('state', '=', 'pending')], order='priority_score desc, id', limit=limit)
+        now = fields.Datetime.now()
+        for entry in entries:
+            entry.write({
+                'attempts': entry.attempts + 1,
+                'priority_score': entry.base_score / (2 + entry.attempts),
+                'last_attempt_at': now,
+            })
+        return entries
+
+    def _mark_processed(self):
+        """
+        Entries whose product left 'draft' are done; the rest stay queued with a lower priority
+        until MAX_ATTEMPTS, then they are parked so the queue drains.
+        """
+        done = self.filtered(lambda e: e.product_tmpl_id.enrichment_state not in ('draft', False))
+        done.write({'state': 'done'})
+        parked = (self - done).filtered(lambda e: e.attempts >= MAX_ATTEMPTS)
+        parked.write({'state': 'parked'})
+        if parked:
+            _logger.info(f"{SUITE_LOG_PREFIX}{len(parked)} products parked after {MAX_ATTEMPTS} attempts without results.")
+
+    @api.model
+    def _is_stale(self):
+        """ True when the last bulk scoring is older than STALE_AFTER_HOURS (new drafts not queued yet). """
+        [(last_scored,)] = self._read_group([], [], ['scored_at:max'])
+        return not last_scored or last_scored < fields.Datetime.now() - timedelta(hours=STALE_AFTER_HOURS)
+
+    @api.model
+    def _cron_refresh_scores(self):
+        self._refresh_scores()
@@ -0,0 +1,253 @@
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
+from .enrichment_engines import http_client
+from lxml import etree
+import csv
+import gzip
+import io
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+SUITE_LOG_PREFIX = "[Tec Suite] Brain Hub: "
+
+DEFAULT_INDEX_URL = 'https://data.icecat.biz/export/freexml/files.index.csv.gz'
+DEFAULT_SUPPLIER_MAPPING_URL = 'https://data.icecat.biz/export/freexml/supplier_mapping.xml'
+BATCH_SIZE = 2000
+MIN_IMPORT_RATIO = 0.5  # A run below half of the current index is treated as a broken file
+
+
+class IcecatIndex(models.Model):
+    """
+    Local mirror of the Icecat product index (files.index.csv / files.index.xml).
+    Lets the Icecat engine resolve MPN + brand (or EAN) to an Icecat ID offline, call the live
+    API by ID (no vendor-name mismatch) and skip the MPNs Icecat simply doesn't have.
+    Rows are bulk-upserted by the streaming importer, never through the ORM.
+    """
+    _name = 'tec.icecat.index'
+    _description = 'Icecat Product Index Mirror'
+    _order = 'icecat_id'
+
+    icecat_id = fields.Integer(string="Icecat ID", required=True, readonly=True)
+    part_code = fields.Char(string="Part Code (MPN)", required=True, readonly=True)
+    supplier_id = fields.Integer(string="Icecat Supplier ID", readonly=True)
+    brand = fields.Char(string="Marca", readonly=True)
+    ean = fields.Char(string="EAN/UPC", readonly=True, index=True)
+    model_name = fields.Char(string="Modelo", readonly=True)
+    import_run = fields.Integer(string="Importación", readonly=True)
+
+    # Backs the INSERT ... ON CONFLICT (icecat_id) of the index import
+    _uniq_icecat_id = models.Constraint('unique(icecat_id)', 'Icecat ID must be unique!')
+
+    def init(self):
+        create_index(self.env.cr, 'tec_icecat_index_part_code_idx', self._table, ['part_code', 'brand'])
+
+    # ---------------------------------------------------------------------------------
+    # Lookup (main thread, called from icecat_engine.prepare)
+    # ---------------------------------------------------------------------------------
+    @api.model
+    def _is_enabled(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+        return bool(ICP.get_param('tec_catalog_enricher.use_icecat_index')) and bool(ICP.get_param('tec_catalog_enricher.icecat_index_loaded_at'))
+
+    @api.model
+    def _resolve(self, mpn, brand=None, ean=None):
+        """ Returns the Icecat ID for MPN (+brand) or EAN, False if Icecat doesn't know the product. """
+        part_code = (mpn or '').strip().upper()
+        brand = (brand or '').strip().lower()
+        if part_code:
+            rows = self.sudo().search_read([('part_code', '=', part_code)], ['icecat_id', 'brand'], limit=20)
+            if len(rows) == 1:
+                return rows[0]['icecat_id']
+            for row in rows:
+                row_brand = row['brand'] or ''
+                if brand and row_brand and (row_brand == brand or row_brand.startswith(brand) or brand.startswith(row_brand)):
+                    return row['icecat_id']
+        if ean:
+            row = self.sudo().search_read([('ean', '=', ean.strip())], ['icecat_id'], limit=1)
+            if row:
+                return row[0]['icecat_id']
+        return False
+
+    # ---------------------------------------------------------------------------------
+    # Streaming importer
+    # ---------------------------------------------------------------------------------
+    @api.model
+    def _cron_import_index(self):
+        return self.action_import_index()
+
+    @api.model
+    def action_import_index(self):
+        """
+        Streams the Icecat index (URL or local path, .csv/.tsv/.xml, optionally .gz) into the
+        table in batches. Memory stays flat whatever the file size: CSV rows are read one by
+        one and XML <file> nodes are cleared as soon as they are parsed.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        source = ICP.get_param('tec_catalog_enricher.icecat_index_url') or DEFAULT_INDEX_URL
+        auth = None
+        username = ICP.get_param('tec_catalog_enricher.icecat_username')
+        password = ICP.get_param('tec_catalog_enricher.icecat_password')
+        if username and password:
+            auth = (username, password)
+
+        run = int(time.time())
+        self.env.cr.execute(SQL("SELECT COUNT(*) FROM tec_icecat_index"))
+        previous = self.env.cr.fetchone()[0]
+        suppliers = self._load_supplier_mapping(auth)
+        _logger.info(f"{SUITE_LOG_PREFIX}Icecat index import started from {source} ({len(suppliers)} suppliers mapped)")
+
+        stream, response = self._open_source(source, auth)
+        total = 0
+        try:
+            rows = self._iter_xml_rows(stream) if '.xml' in source.lower() else self._iter_csv_rows(stream)
+            batch = {}  # keyed by Icecat ID: an upsert can't touch the same row twice
+            for row in rows:
+                row['brand'] = row['brand'] or suppliers.get(row['supplier_id'], '')
+                batch[row['icecat_id']] = row
+                if len(batch) >= BATCH_SIZE:
+                    total += self._flush_batch(list(batch.values()), run)
+                    batch = {}
+            if batch:
+                total += self._flush_batch(list(batch.values()), run)
+        finally:
+            stream.close()
+            if response is not None:
+                response.close()
+
+        # Sanity check: an empty / truncated file or a wrong header must not wipe the index
+        # (the engine would then treat every product as an Icecat miss)
+        if not total or total < previous * MIN_IMPORT_RATIO:
+            _logger.error(f"{SUITE_LOG_PREFIX}Icecat index import aborted: {total} rows parsed, {previous} in the current index.")
+            raise UserError(_(
+                "La importación del índice de Icecat leyó %(total)s filas (el índice actual tiene %(previous)s). "
+                "Revise la URL / el archivo: no se eliminó ninguna fila del índice existente.",
+                total=total, previous=previous,
+            ))
+
+        # Products removed from Icecat since the last full import
+        self.env.cr.execute(SQL("DELETE FROM tec_icecat_index WHERE import_run != %s", run))
+        removed = self.env.cr.rowcount
+        ICP.set_param('tec_catalog_enricher.icecat_index_loaded_at', fields.Datetime.to_string(fields.Datetime.now()))
+        self.invalidate_model()
+        _logger.info(f"{SUITE_LOG_PREFIX}Icecat index import finished: {total} rows, {removed} stale removed.")
+        return total
+
+    @api.model
+    def _open_source(self, source, auth):
+        """ Returns (binary stream, response or None). Gzip is decompressed on the fly. """
+        response = None
+        if source.startswith('http'):
+            response = http_client.get(source, auth=auth, stream=True, timeout=60)
+            response.raise_for_status()
+            response.raw.decode_content = True
+            stream = response.raw
+        else:
+            stream = open(source, 'rb')
+        if source.lower().endswith('.gz'):
+            stream = gzip.GzipFile(fileobj=stream)
+        return stream, response
+
+    @api.model
+    def _load_supplier_mapping(self, auth):
+        """ {supplier_id: brand name} from supplier_mapping.xml (small file, a few MB). """
+        ICP = self.env['ir.config_parameter'].sudo()
+        url = ICP.get_param('tec_catalog_enricher.icecat_supplier_mapping_url') or DEFAULT_SUPPLIER_MAPPING_URL
+        suppliers = {}
+        try:
+            stream, response = self._open_source(url, auth)
+            try:
+                for _event, node in etree.iterparse(stream, events=('end',), tag='SupplierMapping'):
+                    supplier_id = _to_int(node.get('supplier_id'))
+                    if supplier_id and node.get('name'):
+                        suppliers[supplier_id] = node.get('name').strip().lower()
+                    node.clear()
+            finally:
+                stream.close()
+                if response is not None:
+                    response.close()
+        except Exception as e:
+            _logger.warning(f"{SUITE_LOG_PREFIX}Icecat supplier mapping unavailable ({e}), brands will be empty.")
+        return suppliers
+
+    @api.model
+    def _iter_csv_rows(self, stream):
+        """ files.index.csv is tab separated with a header row. """
+        text = io.TextIOWrapper(stream, encoding='utf-8', errors='replace', newline='')
+        reader = csv.reader(text, delimiter='\t')
+        header = [h.strip().lower() for h in next(reader, [])]
+        col = {name: i for i, name in enumerate(header)}
+
+        def value(cells, *names):
+            for name in names:
+                i = col.get(name)
+                if i is not None and i < len(cells) and cells[i]:
+                    return cells[i].strip()
+            return ''
+
+        for cells in reader:
+            icecat_id = _to_int(value(cells, 'product_id'))
+            part_code = value(cells, 'prod_id', 'm_prod_id')
+            if not icecat_id or not part_code:
+                continue
+            ean = value(cells, 'ean_upc', 'ean_upcs')
+            yield {
+                'icecat_id': icecat_id,
+                'part_code': part_code.upper(),
+                'supplier_id': _to_int(value(cells, 'supplier_id')),
+                'brand': value(cells, 'm_supplier_name', 'supplier_name').lower(),
+                'ean': ean.replace(',', ';').split(';')[0].strip(),
+                'model_name': value(cells, 'model_name')[:255],
+            }
+
+    @api.model
+    def _iter_xml_rows(self, stream):
+        """ files.index.xml: one <file Product_ID=".." Prod_ID=".." Supplier_id=".."> per product. """
+        for _event, node in etree.iterparse(stream, events=('end',), tag='file'):
+            icecat_id = _to_int(node.get('Product_ID'))
+            part_code = (node.get('Prod_ID') or '').strip()
+            if icecat_id and part_code:
+                ean_node = node.find('.//EAN_UPC')
+                yield {
+                    'icecat_id': icecat_id,
+                    'part_code': part_code.upper(),
+                    'supplier_id': _to_int(node.get('Supplier_id')),
+                    'brand': '',
+                    'ean': (ean_node.get('Value') or '').strip() if ean_node is not None else '',
+                    'model_name': (node.get('Model_Name') or '')[:255],
+                }
+            # Free the parsed subtree (and already processed siblings) to keep memory flat
+            node.clear()
+            while node.getprevious() is not None:
+                del node.getparent()[0]
+
+    @api.model
+    def _flush_batch(self, batch, run):
+        values = SQL(", ").join(
+            SQL("(%s, %s, %s, %s, %s, %s, %s)", r['icecat_id'], r['part_code'], r['supplier_id'] or None,
+                r['brand'] or None, r['ean'] or None, r['model_name'] or None, run)
+            for r in batch
+        )
+        self.env.cr.execute(SQL("""
+            INSERT INTO tec_icecat_index (icecat_id, part_code, supplier_id, brand, ean, model_name, import_run)
+            VALUES %s
+            ON CONFLICT (icecat_id) DO UPDATE SET
+                part_code = EXCLUDED.part_code,
+                supplier_id = EXCLUDED.supplier_id,
+                brand = EXCLUDED.brand,
+                ean = EXCLUDED.ean,
+                model_name = EXCLUDED.model_name,
+                import_run = EXCLUDED.import_run
+        """, values))
+        # Multi-GB imports: keep progress if the worker gets killed
+        self.env.cr.commit()
+        return len(batch)
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
@@ -1,8 +1,18 @@
 from odoo import fields, models, api, _
-import requests
+from odoo.exceptions import UserError
+from .enrichment_engines import http_client
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import defaultdict
+import gzip
+import json
 import logging
 
 _logger = logging.getLogger(__name__)
+SUITE_LOG_PREFIX = "[Tec Suite] Brain Hub: "
+
+MELI_SITE_ID = 'MLA'  # Argentina
+MELI_WORKERS = 8      # Concurrent /categories/{id} calls while walking the tree
+
 
 class ProductPublicCategory(models.Model):
     _inherit = 'product.public.category'
@@ -12,48 +22,166 @@ class ProductPublicCategory(models.Model):
     is_meli_category = fields.Boolean(string='Is MELI Category', default=False)
 
     def action_fetch_meli_categories(self):
-        """ Fetch MELI Categories from API (Recursive or Dump) """
-        # Only fetch root categories and children to build the tree
-        # API: https://api.mercadolibre.com/sites/MLA/categories
-        
-        base_url = self.env['ir.config_parameter'].sudo().get_param('tec_catalog_meli.api_url', 'https://api.mercadolibre.com')
-        site_id = 'MLA' # Argentina
-        
+        """
+        Imports the full MELI category tree.
+        Source: the dump configured in 'tec_catalog_enricher.meli_categories_dump' (local path
+        or URL of /sites/MLA/categories/all, optionally gzipped), otherwise the public API
+        walked level by level with bounded concurrency.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        base_url = (ICP.get_param('tec_catalog_enricher.meli_api_url')
+                    or ICP.get_param('tec_catalog_meli.api_url')
+                    or 'https://api.mercadolibre.com').rstrip('/')
+        dump = ICP.get_param('tec_catalog_enricher.meli_categories_dump')
+        http_client.configure(self.env)
+
         try:
-            url = f"{base_url}/sites/{site_id}/categories"
-            res = requests.get(url, timeout=10)
-            if res.status_code == 200:
-                categories = res.json()
-                self._process_categories(categories, parent=False)
-                return {
-                    'type': 'ir.actions.client',
-                    'tag': 'display_notification',
-                    'params': {
-                        'title': _("Success"),
-                        'message': _("Fetched %s root categories. Background job started for details.") % len(categories),
-                        'sticky': False,
-                    }
-                }
+            if dump:
+                nodes = self._read_meli_dump(dump)
+            else:
+                nodes = self._walk_meli_tree(base_url)
         except Exception as e:
             _logger.error(f"Failed to fetch MELI categories: {e}")
-            raise
-
-    def _process_categories(self, categories, parent=False):
-        for cat_data in categories:
-            meli_id = cat_data.get('id')
-            name = cat_data.get('name')
-            
-            existing = self.search([('meli_id', '=', meli_id)], limit=1)
-            if not existing:
-                vals = {
-                    'name': name,
-                    'meli_id': meli_id,
-                    'is_meli_category': True,
-                    'parent_id': parent.id if parent else False,
-                }
-                existing = self.create(vals)
-            
-            # Recursive fetch? MELI tree is huge. Maybe just 1-2 levels for now?
-            # Or use a background job.
-            # For MVP, let's just create roots. User asked for dump.
-            pass
+            raise UserError(_("No se pudo obtener el árbol de categorías de MELI: %s") % e)
+
+        created, updated = self._import_meli_nodes(nodes)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _("Success"),
+                'message': _("MELI tree imported: %(total)s categories (%(created)s new, %(updated)s updated).",
+                             total=len(nodes), created=created, updated=updated),
+                'sticky': False,
+            }
+        }
+
+    # ---------------------------------------------------------------------------------
+    # Sources: both return {meli_id: {'name', 'parent', 'depth'}}
+    # ---------------------------------------------------------------------------------
+    @api.model
+    def _walk_meli_tree(self, base_url):
+        """ BFS over /categories/{id}: one level at a time, MELI_WORKERS requests in flight. """
+        res = http_client.get(f"{base_url}/sites/{MELI_SITE_ID}/categories", timeout=30)
+        res.raise_for_status()
+        nodes = {}
+        level = []
+        for cat in res.json():
+            nodes[cat['id']] = {'name': cat['name'], 'parent': False, 'depth': 0}
+            level.append(cat['id'])
+
+        def fetch(meli_id):
+            r = http_client.get(f"{base_url}/categories/{meli_id}", timeout=30)
+            r.raise_for_status()
+            return meli_id, r.json().get('children_categories') or []
+
+        depth = 0
+        failed = 0
+        with ThreadPoolExecutor(max_workers=MELI_WORKERS) as executor:
+            while level:
+                depth += 1
+                futures = {executor.submit(fetch, meli_id): meli_id for meli_id in level}
+                children_by_parent = {}
+                for future in as_completed(futures):
+                    try:
+                        parent_id, children = future.result()
+                    except Exception as e:
+                        # One broken node must not abort the import: its subtree is just left out
+                        failed += 1
+                        _logger.warning(f"{SUITE_LOG_PREFIX}MELI category {futures[future]} skipped: {e}")
+                        continue
+                    children_by_parent[parent_id] = children
+                next_level = []
+                # Level order, not completion order: the result stays deterministic
+                for parent_id in level:
+                    for child in children_by_parent.get(parent_id, []):
+                        if child['id'] not in nodes:
+                            nodes[child['id']] = {'name': child['name'], 'parent': parent_id, 'depth': depth}
+                            next_level.append(child['id'])
+                _logger.info(f"{SUITE_LOG_PREFIX}MELI tree level {depth}: {len(next_level)} categories.")
+                level = next_level
+        if failed:
+            _logger.warning(f"{SUITE_LOG_PREFIX}MELI tree walked with {failed} categories skipped (their subtrees are missing).")
+        return nodes
+
+    @api.model
+    def _read_meli_dump(self, source):
+        """ /sites/MLA/categories/all format: {id: {id, name, path_from_root: [{id, name}]}}. """
+        if source.startswith('http'):
+            res = http_client.get(source, timeout=300)
+            res.raise_for_status()
+            content = res.content
+        else:
+            with open(source, 'rb') as f:
+                content = f.read()
+        if content[:2] == b'\x1f\x8b':
+            content = gzip.decompress(content)
+
+        nodes = {}
+        for meli_id, cat in json.loads(content).items():
+            path = cat.get('path_from_root') or [{'id': meli_id}]
+            nodes[meli_id] = {
+                'name': cat.get('name') or meli_id,
+                'parent': path[-2]['id'] if len(path) > 1 else False,
+                'depth': len(path) - 1,
+            }
+        return nodes
+
+    # ---------------------------------------------------------------------------------
+    # Bulk import
+    # ---------------------------------------------------------------------------------
+    @api.model
+    def _import_meli_nodes(self, nodes):
+        """
+        Existing meli_ids are preloaded in one query. New categories are created level by
+        level in batches: parents always exist (with their parent_path) before their
+        children, so the ORM sets parent_path with one UPDATE per batch.
+        Returns (created, updated).
+        """
+        existing = {
+            row['meli_id']: row
+            for row in self.with_context(active_test=False).search_read(
+                [('meli_id', '!=', False)], ['meli_id', 'name', 'parent_id'])
+        }
+        ids = {meli_id: row['id'] for meli_id, row in existing.items()}
+
+        by_depth = defaultdict(list)
+        for meli_id, node in nodes.items():
+            by_depth[node['depth']].append(meli_id)
+
+        created = updated = 0
+        for depth in sorted(by_depth):
+            to_create = []
+            moves = defaultdict(list)
+            for meli_id in by_depth[depth]:
+                node = nodes[meli_id]
+                parent_id = ids.get(node['parent']) or False
+                row = existing.get(meli_id)
+                if not row:
+                    to_create.append({
+                        'name': node['name'],
+                        'meli_id': meli_id,
+                        'meli_parent_id': node['parent'] or False,
+                        'is_meli_category': True,
+                        'parent_id': parent_id,
+                    })
+                    continue
+                if (row['parent_id'] and row['parent_id'][0] or False) != parent_id:
+                    moves[parent_id].append(row['id'])
+                if row['name'] != node['name']:
+                    self.browse(row['id']).name = node['name']
+                    updated += 1
+
+            for parent_id, category_ids in moves.items():
+                self.browse(category_ids).write({'parent_id': parent_id})
+                updated += len(category_ids)
+
+            if to_create:
+                records = self.create(to_create)
+                ids.update(zip(records.mapped('meli_id'), records.ids))
+                created += len(records)
+
+            # Keep each finished level if the worker gets killed
+            self.env.cr.commit()
+            _logger.info(f"{SUITE_LOG_PREFIX}MELI categories depth {depth}: {len(to_create)} created.")
+        return created, updated
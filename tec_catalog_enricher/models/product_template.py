@@ -1,10 +1,86 @@
 from odoo import api, fields, models
-from .enrichment_engines import lenovo_engine, icecat_engine, bestbuy_engine, open_product_data_engine, google_engine, youtube_engine, ai_engine
+from odoo.fields import Domain
+from .enrichment_engines import lenovo_engine, icecat_engine, bestbuy_engine, open_product_data_engine, google_engine, youtube_engine, ai_engine, http_client
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from odoo.tools import split_every
+from lxml import html as lxml_html
+import itertools
 import logging
 
 _logger = logging.getLogger(__name__)
 SUITE_LOG_PREFIX = "[Tec Suite] Brain Hub: "
 
+# Technical cascade, in order. Engines flagged as fallback only run when nothing before them found data.
+# (key = enrichment_source, label, engine module, fallback_only, log source, log message)
+TECH_ENGINES = [
+    ('lenovo', 'Lenovo PSREF', lenovo_engine, False, 'Lenovo PSREF', 'Datos técnicos e imágenes actualizados.'),
+    ('icecat', 'Icecat', icecat_engine, False, 'Icecat', 'Datos técnicos e imágenes actualizados.'),
+    ('bestbuy', 'Best Buy', bestbuy_engine, True, 'Best Buy', 'Datos técnicos e imágenes actualizados.'),
+    ('pod', 'Product Open Data', open_product_data_engine, True, 'Open Product Data', 'Información encontrada en base abierta.'),
+    ('google', 'Google AI Search', google_engine, True, 'Google', 'Datos básicos (y texto AI) obtenidos.'),
+]
+
+# Root classes of the spec tables engines used to append to tec_enriched_description
+LEGACY_SPEC_CLASSES = ('tec-lenovo-specs', 'tec-icecat-specs', 'tec-bestbuy-specs')
+
+
+def _rewrite_html_blocks(html, classes, replacement=''):
+    """
+    Drops the elements carrying one of the CSS classes; `replacement` (one root element)
+    takes the place of the first one, or is appended when none is found.
+    """
+    root = lxml_html.fragment_fromstring(html or '', create_parent='div')
+    blocks = root.xpath(' | '.join(
+        f"//*[contains(concat(' ', normalize-space(@class), ' '), ' {css_class} ')]" for css_class in classes
+    ))
+    new_block = lxml_html.fragment_fromstring(replacement.strip()) if replacement else None
+    for i, block in enumerate(blocks):
+        if block.getparent() is None:
+            continue
+        if i == 0 and new_block is not None:
+            new_block.tail = block.tail
+            block.getparent().replace(block, new_block)
+            continue
+        # PSREF tables were appended as '<br/>' + table
+        previous = block.getprevious()
+        if previous is not None and previous.tag == 'br' and not (previous.tail or '').strip():
+            previous.drop_tree()
+        block.drop_tree()
+    if new_block is not None and not blocks:
+        root.append(new_block)
+    return (root.text or '') + ''.join(lxml_html.tostring(child, encoding='unicode') for child in root)
+
+
+def _fetch_tech_step(step):
+    """ Network call of one engine step. Worker-safe: plain dict in, plain dict out. """
+    data, error = False, step['error']
+    if step['job'] and not error:
+        try:
+            data = step['engine'].fetch(step['job'])
+        except Exception as e:
+            error = str(e)
+    return dict(step, data=data, error=error, fetched=True)
+
+
+def _fetch_tech_sources(steps):
+    """
+    Network half of the cascade for ONE product. Runs in worker threads:
+    only plain dicts in, plain dicts out, never touches the ORM/cursor.
+    Fallbacks are not fetched once a source returned data; they stay in the results
+    (fetched=False) so the main thread can still fetch them if that data fails to apply.
+    """
+    results = []
+    found = False
+    for step in steps:
+        if step['fallback_only'] and found:
+            results.append(dict(step, data=False, fetched=False))
+            continue
+        result = _fetch_tech_step(step)
+        results.append(result)
+        found = found or bool(result['data'])
+    return results
+
+
 class ProductTemplate(models.Model):
     _inherit = 'product.template'
 
@@ -23,111 +99,19 @@ class ProductTemplate(models.Model):
         ICP = self.env['ir.config_parameter'].sudo()
         total = len(self)
         success_count = 0
+        http_client.configure(self.env)
+        workers = max(1, int(ICP.get_param('tec_catalog_enricher.enrichment_workers', 4) or 1))
         
-        # Performance: If it's a mass action, we should be careful with timeouts
-        # For very large sets, Odoo usually times out after 60-120s.
-        _logger.info(f"{SUITE_LOG_PREFIX}Starting enrichment for {total} products")
+        # Performance: network calls (APIs + image downloads) run in a thread pool when
+        # workers > 1. Only the ORM writes below are serialized on the main cursor.
+        _logger.info(f"{SUITE_LOG_PREFIX}Starting enrichment for {total} products ({workers} workers)")
 
-        for product in self:
+        for product, mpn, results in self._iter_tech_fetch_results(ICP, workers):
             try:
-                # 1. Protection: Skip if already enriched, unless "Force" is checked
-                if product.enrichment_state in ['tech_done', 'full_enriched'] and not product.force_enrichment:
-                    _logger.info(f"{SUITE_LOG_PREFIX}Skipping {product.name} (Already Enriched)")
-                    continue
-
-                mpn = product.original_part_number or product.default_code
-                if not mpn:
-                    continue
-
-                success_sources = []
-                failed_sources = []
-                error_sources = []
-
                 # Use a specific savepoint per product so one failure doesn't roll back the whole batch
                 with self.env.cr.savepoint():
-                    # 1. Lenovo PSREF
-                    if ICP.get_param('tec_catalog_enricher.use_lenovo_psref', 'True') == 'True' and product.product_brand_id.name and 'lenovo' in product.product_brand_id.name.lower():
-                        try:
-                            if lenovo_engine.enrich_product(product, mpn):
-                                success_sources.append('Lenovo PSREF')
-                                self._log_enrichment(product, 'success', 'Lenovo PSREF', 'Datos técnicos e imágenes actualizados.')
-                            else:
-                                failed_sources.append('Lenovo PSREF')
-                        except Exception as e:
-                            _logger.error(f"Lenovo Engine Failed: {e}")
-                            error_sources.append(f'Lenovo PSREF ({str(e)[:30]})')
-                    
-                    # 2. Icecat
-                    if ICP.get_param('tec_catalog_enricher.use_icecat'):
-                        try:
-                            if icecat_engine.enrich_product(product, mpn):
-                                success_sources.append('Icecat')
-                                self._log_enrichment(product, 'success', 'Icecat', 'Datos técnicos e imágenes actualizados.')
-                            else:
-                                failed_sources.append('Icecat')
-                        except Exception as e:
-                            _logger.error(f"Icecat Engine Failed: {e}")
-                            error_sources.append(f'Icecat ({str(e)[:30]})')
-
-                    # 3. Best Buy API
-                    if not success_sources and ICP.get_param('tec_catalog_enricher.use_bestbuy'):
-                        try:
-                            if bestbuy_engine.enrich_product(product, mpn):
-                                success_sources.append('Best Buy')
-                                self._log_enrichment(product, 'success', 'Best Buy', 'Datos técnicos e imágenes actualizados.')
-                            else:
-                                failed_sources.append('Best Buy')
-                        except Exception as e:
-                            _logger.error(f"BestBuy Engine Failed: {e}")
-                            error_sources.append(f'Best Buy ({str(e)[:30]})')
-
-                    # 4. Product Open Data (POD)
-                    if not success_sources and ICP.get_param('tec_catalog_enricher.use_pod'):
-                        try:
-                            if open_product_data_engine.enrich_product(product, mpn, ean=product.barcode):
-                                success_sources.append('Product Open Data')
-                                self._log_enrichment(product, 'success', 'Open Product Data', 'Información encontrada en base abierta.')
-                            else:
-                                failed_sources.append('Product Open Data')
-                        except Exception as e:
-                            _logger.error(f"POD Engine Failed: {e}")
-                            error_sources.append(f'Product Open Data ({str(e)[:30]})')
-
-                    # 5. Google Fallback (AI Web Search)
-                    if not success_sources and ICP.get_param('tec_catalog_enricher.use_google'):
-                        try:
-                            if google_engine.enrich_product(product, mpn):
-                                success_sources.append('Google AI Search')
-                                self._log_enrichment(product, 'success', 'Google', 'Datos básicos (y texto AI) obtenidos.')
-                            else:
-                                failed_sources.append('Google AI Search')
-                        except Exception as e:
-                            _logger.error(f"Google Engine Failed: {e}")
-                            error_sources.append(f'Google AI Search ({str(e)[:30]})')
-
-                    # Update final state & Logs
-                    if success_sources:
+                    if self._apply_tech_results(product, mpn, results):
                         success_count += 1
-                        product.enrichment_state = 'tech_done'
-                        product.enrichment_source = 'mixed' if len(success_sources) > 1 else success_sources[0].lower()
-                        product.force_enrichment = False
-                        
-                        sources_label = ", ".join(success_sources)
-                        failed_label = ", ".join(failed_sources) if failed_sources else 'Ninguna'
-                        
-                        body = f"📥 Ficha Técnica Obtenida<br/>✅ Fuentes Exitosas: {sources_label}<br/>ℹ️ Omitidas / Sin datos: {failed_label}"
-                        if error_sources:
-                            body += f'<br/>❌ Errores técnicos: {", ".join(error_sources)}'
-                        product.message_post(body=body)
-                    else:
-                        msg = "No se encontró información técnica en ninguna de las fuentes consultadas."
-                        self._log_enrichment(product, 'warning', 'Sincronizador', msg)
-                        
-                        failed_label = ", ".join(failed_sources) if failed_sources else "ninguna (deshabilitadas)"
-                        body = f"⚠️ Sin Resultados Técnicos<br/>Se buscaron datos en {failed_label} pero no se obtuvieron resultados para el PN {mpn}."
-                        if error_sources:
-                            body += f'<br/>❌ Errores técnicos: {", ".join(error_sources)}'
-                        product.message_post(body=body)
 
                 # IMPORTANT: In mass actions, commit after each product so:
                 # 1. We don't lose work if the whole request times out.
@@ -151,65 +135,191 @@ class ProductTemplate(models.Model):
                 'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'},
             }
         }
+
+    def _prepare_tech_jobs(self, ICP):
+        """ Main thread: yields (product, mpn, steps) with the engine jobs snapshotted from the ORM. """
+        Miss = self.env['tec.enrichment.miss']
+        # Engines that recently found nothing for an MPN are on backoff (one query for the batch)
+        blocked = Miss._get_blocked(self.mapped('original_part_number') + self.mapped('default_code'))
+        for product in self:
+            # 1. Protection: Skip if already enriched, unless "Force" is checked
+            if product.enrichment_state in ['tech_done', 'full_enriched'] and not product.force_enrichment:
+                _logger.info(f"{SUITE_LOG_PREFIX}Skipping {product.name} (Already Enriched)")
+                continue
+
+            mpn = product.original_part_number or product.default_code
+            if not mpn:
+                continue
+
+            fingerprint = Miss._fingerprint(product)
+            steps = []
+            for key, label, engine, fallback_only, log_source, log_message in TECH_ENGINES:
+                if not self._is_tech_engine_enabled(key, product, ICP):
+                    continue
+                job, error = False, False
+                skipped = (
+                    not product.force_enrichment
+                    and (key, Miss._normalize_ref(mpn), fingerprint) in blocked
+                )
+                if not skipped:
+                    try:
+                        job = engine.prepare(product, mpn, ICP)
+                    except Exception as e:
+                        error = str(e)
+                steps.append({
+                    'key': key, 'label': label, 'engine': engine, 'fallback_only': fallback_only,
+                    'log_source': log_source, 'log_message': log_message, 'job': job, 'error': error,
+                    'skipped': skipped,
+                })
+            yield product, mpn, steps
+
+    def _is_tech_engine_enabled(self, key, product, ICP):
+        if key == 'lenovo':
+            brand_name = product.product_brand_id.name
+            return ICP.get_param('tec_catalog_enricher.use_lenovo_psref', 'True') == 'True' and bool(brand_name) and 'lenovo' in brand_name.lower()
+        return bool(ICP.get_param(f'tec_catalog_enricher.use_{key}'))
+
+    def _iter_tech_fetch_results(self, ICP, workers):
+        """
+        Yields (product, mpn, results). Sequential when workers == 1, otherwise a bounded
+        window of products is fetched concurrently and yielded as each one completes.
+        """
+        jobs = self._prepare_tech_jobs(ICP)
+        if workers <= 1 or len(self) <= 1:
+            for product, mpn, steps in jobs:
+                yield product, mpn, _fetch_tech_sources(steps)
+            return
+
+        # Bounded window: keeps memory (downloaded images) flat on large selections
+        window = workers * 2
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tec_enrich') as executor:
+            pending = {}
+            for product, mpn, steps in itertools.islice(jobs, window):
+                pending[executor.submit(_fetch_tech_sources, steps)] = (product, mpn)
+            while pending:
+                done, _not_done = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    product, mpn = pending.pop(future)
+                    yield product, mpn, future.result()
+                for product, mpn, steps in itertools.islice(jobs, len(done)):
+                    pending[executor.submit(_fetch_tech_sources, steps)] = (product, mpn)
+
+    def _apply_tech_results(self, product, mpn, results):
+        """ Main thread: applies fetched data keeping the additive + fallback semantics. """
+        Miss = self.env['tec.enrichment.miss']
+        success_sources = []
+        success_keys = []
+        failed_sources = []
+        error_sources = []
+        skipped_sources = []
+
+        for res in results:
+            label = res['label']
+            if res['fallback_only'] and success_sources:
+                continue
+            if res['skipped']:
+                skipped_sources.append(label)
+                continue
+            if not res['fetched']:
+                # Skipped by the worker because an earlier source returned data that then failed to apply
+                res = _fetch_tech_step(res)
+            error = res['error']
+            if not error:
+                try:
+                    if res['data'] and res['engine'].apply(product, res['data']):
+                        success_sources.append(label)
+                        success_keys.append(res['key'])
+                        self._log_enrichment(product, 'success', res['log_source'], res['log_message'])
+                        Miss._clear(res['key'], mpn, product)
+                    else:
+                        failed_sources.append(label)
+                        # Only real lookups count as a miss (not missing config / brand / barcode)
+                        if res['job']:
+                            Miss._record_miss(res['key'], mpn, product, 'not_found')
+                    continue
+                except Exception as e:
+                    error = str(e)
+            _logger.error(f"{label} Engine Failed: {error}")
+            error_sources.append(f'{label} ({error[:30]})')
+            Miss._record_miss(res['key'], mpn, product, 'error')
+
+        # Update final state & Logs
+        if success_sources:
+            product.enrichment_state = 'tech_done'
+            product.enrichment_source = 'mixed' if len(success_keys) > 1 else success_keys[0]
+            product.force_enrichment = False
+            
+            sources_label = ", ".join(success_sources)
+            failed_label = ", ".join(failed_sources) if failed_sources else 'Ninguna'
+            
+            body = f"📥 Ficha Técnica Obtenida<br/>✅ Fuentes Exitosas: {sources_label}<br/>ℹ️ Omitidas / Sin datos: {failed_label}"
+            if error_sources:
+                body += f'<br/>❌ Errores técnicos: {", ".join(error_sources)}'
+            if skipped_sources:
+                body += f'<br/>⏸️ En espera (sin datos en intentos recientes): {", ".join(skipped_sources)}'
+            product.message_post(body=body)
+            return True
+
+        msg = "No se encontró información técnica en ninguna de las fuentes consultadas."
+        self._log_enrichment(product, 'warning', 'Sincronizador', msg)
+        
+        failed_label = ", ".join(failed_sources) if failed_sources else "ninguna (deshabilitadas)"
+        body = f"⚠️ Sin Resultados Técnicos<br/>Se buscaron datos en {failed_label} pero no se obtuvieron resultados para el PN {mpn}."
+        if error_sources:
+            body += f'<br/>❌ Errores técnicos: {", ".join(error_sources)}'
+        if skipped_sources:
+            body += f'<br/>⏸️ En espera (sin datos en intentos recientes): {", ".join(skipped_sources)}'
+        product.message_post(body=body)
+        return False
     
     def action_generate_marketing_content(self):
         """ Soft Data + Social Proof: YouTube -> Gemini AI """
         ICP = self.env['ir.config_parameter'].sudo()
         total = len(self)
         success_count = 0
+        http_client.configure(self.env)
+        use_ai = ICP.get_param('tec_catalog_enricher.use_gemini')
+        batch_size = max(1, int(ICP.get_param('tec_catalog_enricher.ai_batch_size', 1) or 1))
 
-        for product in self:
-            try:
-                with self.env.cr.savepoint():
-                    state = 'tech_done'
-                    logs = []
-                    
-                    # 1. YouTube Social Proof
-                    if ICP.get_param('tec_catalog_enricher.use_youtube'):
-                        if youtube_engine.enrich_video(product):
-                            state = 'marketing_done'
-                            logs.append("🎬 YouTube: Video y tags obtenidos exitosamente.")
-
-                    # 2. Gemini AI Marketing
-                    if ICP.get_param('tec_catalog_enricher.use_gemini'):
-                        if ai_engine.enrich_marketing(product):
-                             state = 'marketing_done'
-                             provider = ICP.get_param('tec_catalog_enricher.ai_provider', 'gemini')
-                             if provider == 'openai':
-                                 model = ICP.get_param('tec_catalog_enricher.openai_model') or 'gpt-4.1-nano'
-                                 provider_name = 'OpenAI'
-                             else:
-                                 model = ICP.get_param('tec_catalog_enricher.gemini_model') or 'gemini-2.0-flash'
-                                 provider_name = 'Google Gemini'
-                             logs.append(f"✨ IA Marketing: Descripción generada exitosamente usando {provider_name} ({model}).")
-                    
-                    if state == 'marketing_done':
-                        success_count += 1
-                        # Check complete status
-                        if product.enrichment_state == 'tech_done':
-                            product.enrichment_state = 'full_enriched'
-                        else:
-                            product.enrichment_state = 'marketing_done'
-                        product.enrichment_source = 'mixed'
-                        # Reset force
-                        product.force_enrichment = False
-
-                        # Log everything to chatter
-                        logs_html = "<br/>".join([f"✔️ {log}" for log in logs])
-                        body = f"✨ Marketing Generado Exitosamente<br/>{logs_html}"
-                        product.message_post(body=body)
-                    else:
-                        body = "⚠️ Generación de Marketing<br/>No se obtuvieron resultados o las integraciones están deshabilitadas."
-                        product.message_post(body=body)
+        # Deferred mode: the whole selection goes to the provider Batch API in one JSONL file,
+        # the results are applied later by the polling cron (tec.ai.batch.job).
+        BatchJob = self.env['tec.ai.batch.job']
+        if use_ai and total > 1 and BatchJob._is_enabled():
+            # Inputs already answered are replayed right away, only the rest costs tokens
+            memoized = ai_engine.get_memoized(self)
+            attr_index = ai_engine.AttributeIndex(self.env)
+            for product in self.filtered(lambda p: p.id in memoized):
+                self._generate_marketing_for(product, ICP, memoized[product.id], attr_index)
+                self.env.cr.commit()
+            jobs = BatchJob._submit(self.filtered(lambda p: p.id not in memoized))
+            queued = sum(jobs.mapped('request_count'))
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'title': 'Lote de IA Enviado',
+                    'message': f'{queued} productos enviados al procesamiento diferido, {len(memoized)} aplicados desde memoria ({total - queued - len(memoized)} ya estaban en un lote abierto). Los resultados se aplicarán automáticamente.',
+                    'type': 'info',
+                    'sticky': True,
+                }
+            }
+
+        # Attributes / values resolved once for the whole selection
+        attr_index = ai_engine.AttributeIndex(self.env)
+
+        for chunk in split_every(batch_size, self.ids, self.browse):
+            # Batched mode: one LLM request for the whole chunk, results matched back by product ID.
+            # Products missing from the answer fall back to the single-product call below.
+            ai_batch = ai_engine.generate_marketing_batch(chunk) if use_ai and batch_size > 1 else {}
+
+            for product in chunk:
+                if self._generate_marketing_for(product, ICP, ai_batch.get(product.id), attr_index):
+                    success_count += 1
 
                 # Individual commit for mass actions
                 if total > 1:
                     self.env.cr.commit()
 
-            except Exception as e:
-                _logger.error(f"Failed to generate marketing for product {product.id}: {e}")
-                continue
-
         return {
             'type': 'ir.actions.client',
             'tag': 'display_notification',
@@ -222,45 +332,91 @@ class ProductTemplate(models.Model):
             }
         }
 
+    def _generate_marketing_for(self, product, ICP, ai_data=None, attr_index=None):
+        """
+        YouTube + AI for one product (own savepoint). ai_data: answer already obtained in batch.
+        attr_index: ai_engine.AttributeIndex shared by the caller's batch.
+        """
+        success = False
+        try:
+            with self.env.cr.savepoint():
+                state = 'tech_done'
+                logs = []
+                
+                # 1. YouTube Social Proof
+                if ICP.get_param('tec_catalog_enricher.use_youtube'):
+                    if youtube_engine.enrich_video(product):
+                        state = 'marketing_done'
+                        logs.append("🎬 YouTube: Video y tags obtenidos exitosamente.")
+
+                # 2. Gemini AI Marketing
+                if ICP.get_param('tec_catalog_enricher.use_gemini'):
+                    ai_ok = ai_engine._apply_ai_response(product, ai_data, attr_index) if ai_data else ai_engine.enrich_marketing(product, attr_index)
+                    if ai_ok:
+                         state = 'marketing_done'
+                         provider = ICP.get_param('tec_catalog_enricher.ai_provider', 'gemini')
+                         if provider == 'openai':
+                             model = ICP.get_param('tec_catalog_enricher.openai_model') or 'gpt-4.1-nano'
+                             provider_name = 'OpenAI'
+                         else:
+                             model = ICP.get_param('tec_catalog_enricher.gemini_model') or 'gemini-2.0-flash'
+                             provider_name = 'Google Gemini'
+                         logs.append(f"✨ IA Marketing: Descripción generada exitosamente usando {provider_name} ({model}).")
+                
+                if state == 'marketing_done':
+                    success = True
+                    # Check complete status
+                    if product.enrichment_state == 'tech_done':
+                        product.enrichment_state = 'full_enriched'
+                    else:
+                        product.enrichment_state = 'marketing_done'
+                    product.enrichment_source = 'mixed'
+                    # Reset force
+                    product.force_enrichment = False
+
+                    # Log everything to chatter
+                    logs_html = "<br/>".join([f"✔️ {log}" for log in logs])
+                    body = f"✨ Marketing Generado Exitosamente<br/>{logs_html}"
+                    product.message_post(body=body)
+                else:
+                    body = "⚠️ Generación de Marketing<br/>No se obtuvieron resultados o las integraciones están deshabilitadas."
+                    product.message_post(body=body)
+
+        except Exception as e:
+            _logger.error(f"Failed to generate marketing for product {product.id}: {e}")
+            if attr_index:
+                attr_index.reset()
+            return False
+        return success
+
     @api.model
     def _cron_mass_enrich_catalog(self, limit=50):
-        """ Task for automated background mass enrichment of High-Ticket categories """
+        """ Task for automated background mass enrichment: pops the top-priority products of the queue """
         _logger.info(f"{SUITE_LOG_PREFIX}Running Mass Catalog Enrichment Cron (limit: {limit})...")
         
-        # We only want to auto-process products that:
-        # 1. Are active
-        # 2. Have actual MPN or Supplier SKU to search for
-        # 3. Are pending enrichment
-        # 4. Have some stock (priority) or as configured. 
-        # (Keeping it simple: just need MPN and 'pending' enrichment state)
-        domain = [
-            ('enrichment_state', 'in', ['pending', False]),
-            ('type', '=', 'product'),
-            '|', ('original_part_number', '!=', False), ('default_code', '!=', False)
-        ]
-        
-        # Priority High-Ticket categories names
-        high_ticket_names = [
-            'Notebooks', 'PCs', 'Computadoras', 'Mini PCs', 'Servidores', 
-            'Monitores', 'Impresoras', 'Periféricos Gamers', 'Videovigilancia'
-        ]
-        
-        # Try to find these categories first
-        categories = self.env['product.category'].search([('name', 'in', high_ticket_names)])
-        if categories:
-             domain.append(('categ_id', 'child_of', categories.ids))
-             
-        products = self.search(domain, limit=limit)
-        
-        if not products:
+        # Priority comes from tec.enrichment.queue (vendor stock, price, published, web traffic),
+        # scored in bulk by its own cron. A stale scoring is refreshed here too, so new drafts get in.
+        Queue = self.env['tec.enrichment.queue']
+        if Queue._is_stale():
+            Queue._refresh_scores()
+        entries = Queue._pop(limit)
+        if not entries:
+            Queue._refresh_scores()
+            entries = Queue._pop(limit)
+
+        if not entries:
              _logger.info(f"{SUITE_LOG_PREFIX}No pending priority products found for auto-enrichment.")
              return
+        # Persist the attempt bump before the (committing) enrichment loop
+        self.env.cr.commit()
 
+        products = entries.product_tmpl_id
         _logger.info(f"{SUITE_LOG_PREFIX}Found {len(products)} pending products. Starting process...")
         
         # Chain both actions. The methods already have robust savepoints to prevent complete rollback.
         products.action_fetch_technical_data()
         products.action_generate_marketing_content()
+        entries._mark_processed()
         
         _logger.info(f"{SUITE_LOG_PREFIX}Mass Catalog Enrichment Cron completed.")
 
@@ -269,6 +425,41 @@ class ProductTemplate(models.Model):
         _logger.info(f"{SUITE_LOG_PREFIX}Running Price Drop Notification Cron")
         pass
 
+    def _append_enriched_section(self, marker, section_html):
+        """
+        Writes an engine's description block once: a forced re-enrichment replaces the block
+        of the previous run instead of keeping (or duplicating) it.
+        marker = CSS class of the block's root div.
+        """
+        self.ensure_one()
+        current_desc = self.tec_enriched_description or ''
+        if marker not in current_desc:
+            self.tec_enriched_description = f"{current_desc}{section_html}"
+            return True
+        new_desc = _rewrite_html_blocks(current_desc, [marker], section_html)
+        if new_desc == current_desc:
+            return False
+        self.tec_enriched_description = new_desc
+        return True
+
+    @api.model
+    def _cleanup_legacy_spec_html(self, batch_size=1000):
+        """
+        Specs used to be appended to tec_enriched_description as HTML tables; they now live in
+        tec.product.spec and are rendered at display time, so the stored tables showed twice.
+        """
+        domain = Domain.OR([
+            [('tec_enriched_description', 'ilike', spec_class)] for spec_class in LEGACY_SPEC_CLASSES
+        ])
+        products = self.with_context(active_test=False).search(domain)
+        for batch in split_every(batch_size, products.ids, self.browse):
+            for product in batch:
+                product.tec_enriched_description = _rewrite_html_blocks(product.tec_enriched_description, LEGACY_SPEC_CLASSES)
+            self.env.flush_all()
+            self.env.invalidate_all()
+        _logger.info(f"{SUITE_LOG_PREFIX}Legacy spec HTML removed from {len(products)} enriched descriptions.")
+        return len(products)
+
     def _log_enrichment(self, product, level, source, message):
         """ Helper to log enrichment actions """
         try:
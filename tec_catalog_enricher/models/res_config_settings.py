@@ -16,6 +16,8 @@ class ResConfigSettings(models.TransientModel):
     )
     icecat_api_token = fields.Char(string="API Access Token", config_parameter='tec_catalog_enricher.icecat_api_token')
     icecat_content_token = fields.Char(string="Content Access Token", config_parameter='tec_catalog_enricher.icecat_content_token')
+    use_icecat_index = fields.Boolean(string="Usar Índice Local Icecat", config_parameter='tec_catalog_enricher.use_icecat_index', default=False, help="Resuelve MPN/Marca/EAN contra el índice descargado y sólo llama a la API en vivo para productos que Icecat tiene.")
+    icecat_index_url = fields.Char(string="Archivo Índice Icecat", config_parameter='tec_catalog_enricher.icecat_index_url', help="URL o ruta local de files.index (.csv/.xml, opcionalmente .gz).")
     
     use_google = fields.Boolean(string="Habilitar Google Fallback", config_parameter='tec_catalog_enricher.use_google', default=False)
     google_cse_key = fields.Char(string="API Key Google CSE", config_parameter='tec_catalog_enricher.google_cse_key')
@@ -40,6 +42,11 @@ class ResConfigSettings(models.TransientModel):
     )
 
     # --- Soft Data / Gemini ---
+    ai_batch_size = fields.Integer(string="Productos por Llamada IA", config_parameter='tec_catalog_enricher.ai_batch_size', default=1, help="Agrupa N productos en una sola solicitud al modelo (respuesta JSON por product_id). 1 = una llamada por producto.")
+    ai_memo_ttl_days = fields.Integer(string="Vigencia Memo IA (días)", config_parameter='tec_catalog_enricher.ai_memo_ttl_days', default=90, help="Días en que una respuesta de la IA se reutiliza para el mismo producto, modelo y datos de proveedor.")
+    ai_memo_disabled = fields.Boolean(string="Desactivar Memo IA", config_parameter='tec_catalog_enricher.ai_memo_disabled', help="Cada generación llama al modelo aunque los datos de entrada no hayan cambiado.")
+    ai_deferred_mode = fields.Boolean(string="Modo Diferido (Batch API)", config_parameter='tec_catalog_enricher.ai_deferred_mode', default=False, help="Las acciones masivas envían los prompts en un archivo JSONL a la Batch API (tarifa batch, sin límites por solicitud). Los resultados se aplican por cron. Solo OpenAI o servidores compatibles.")
+    openai_base_url = fields.Char(string="Endpoint OpenAI", config_parameter='tec_catalog_enricher.openai_base_url', help="URL base compatible con OpenAI (por defecto https://api.openai.com/v1). Permite usar un servidor local de pruebas.")
     use_gemini = fields.Boolean(string="Habilitar Gemini AI", config_parameter='tec_catalog_enricher.use_gemini', default=False)
     gemini_api_key = fields.Char(string="API Key Gemini", config_parameter='tec_catalog_enricher.gemini_api_key')
     gemini_model = fields.Selection(
@@ -111,16 +118,35 @@ Insumos: {inputs}"""
         default='https://api.mercadolibre.com'
     )
 
+    tec_meli_categories_dump = fields.Char(
+        string="MELI Categories Dump",
+        config_parameter='tec_catalog_enricher.meli_categories_dump',
+        help="Ruta local o URL del volcado /sites/MLA/categories/all (JSON, opcionalmente .gz). Vacío = recorrer la API nivel por nivel."
+    )
+
     tec_meli_enable_ai_mapping = fields.Boolean(
         string="Enable AI Category Mapping",
         config_parameter='tec_catalog_enricher.meli_enable_ai',
         default=True
     )
+    category_match_threshold = fields.Float(
+        string="Local Match Threshold",
+        config_parameter='tec_catalog_enricher.category_match_threshold',
+        default=0.7,
+        help="Similitud mínima (0-1) para aceptar un mapeo local por trigramas sin consultar a la IA."
+    )
     use_youtube = fields.Boolean(string="Habilitar YouTube Reviews", config_parameter='tec_catalog_enricher.use_youtube', default=False)
     youtube_api_key = fields.Char(string="API Key YouTube", config_parameter='tec_catalog_enricher.youtube_api_key', help="Puede ser la misma que Google CSE.")
 
     # --- Governance ---
     max_images_limit = fields.Integer(string="Límite Máximo de Imágenes", config_parameter='tec_catalog_enricher.max_images_limit', default=3)
+    http_timeout = fields.Integer(string="Timeout HTTP (seg)", config_parameter='tec_catalog_enricher.http_timeout', default=15, help="Timeout por defecto de las llamadas a APIs externas.")
+    http_max_retries = fields.Integer(string="Reintentos HTTP", config_parameter='tec_catalog_enricher.http_max_retries', default=2, help="Reintentos ante errores de red, 429 o 5xx (backoff exponencial con jitter).")
+    enrichment_workers = fields.Integer(string="Descargas Paralelas", config_parameter='tec_catalog_enricher.enrichment_workers', default=4, help="Productos consultados en paralelo al enriquecer en masa. 1 = secuencial.")
+    cache_ttl_days = fields.Integer(string="Vigencia Caché (días)", config_parameter='tec_catalog_enricher.cache_ttl_days', default=30, help="Días en que una respuesta cruda de Icecat/PSREF/Best Buy/POD se reutiliza sin llamar a la API.")
+    # Stored inverted: an unchecked Boolean deletes its parameter, so "off" must be the absent value
+    cache_disabled = fields.Boolean(string="Desactivar Caché", config_parameter='tec_catalog_enricher.cache_disabled', help="Consulta siempre las APIs sin guardar ni reutilizar respuestas crudas.")
+    miss_backoff_hours = fields.Integer(string="Espera tras 'Sin Datos' (horas)", config_parameter='tec_catalog_enricher.miss_backoff_hours', default=24, help="Espera antes de volver a consultar un motor que no encontró el MPN. Se duplica en cada intento fallido (máx. 30 días).")
 
     # --- API Test Actions ---
     def action_test_gemini(self):
@@ -180,6 +206,19 @@ Insumos: {inputs}"""
         except Exception as e:
             return self._notify_error(f"Google Search Error: {str(e)}")
 
+    def action_import_icecat_index(self):
+        """ Descarga e importa el índice de productos de Icecat (streaming, puede tardar). """
+        total = self.env['tec.icecat.index'].action_import_index()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Índice Icecat',
+                'message': f'Importación finalizada: {total} productos indexados.',
+                'type': 'success',
+            }
+        }
+
     def action_test_icecat(self):
         self.ensure_one()
         method = self.icecat_auth_method or self.env['ir.config_parameter'].sudo().get_param('tec_catalog_enricher.icecat_auth_method')
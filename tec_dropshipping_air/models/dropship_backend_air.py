@@ -12,6 +12,7 @@ from odoo.exceptions import UserError
 
 _logger = logging.getLogger(__name__)
 SUITE_LOG_PREFIX = "[Tec Suite] Air Connector: "
+DUPLICATE_CHECK_BATCH = 1000  # Created templates checked per query in the after-sync report
 
 class DropshipBackendAir(models.Model):
     _inherit = 'dropship.backend'
@@ -280,39 +281,31 @@ class DropshipBackendAir(models.Model):
             _logger.info(f"Skipping generic images for {product.default_code}: Product is enriched.")
             return
 
-        first = True
         # 1. Clear existing extra images (Backend)
         product.tec_product_image_ids.unlink()
         
         # 2. Clear existing extra images (Website) if module installed
         if hasattr(product, 'product_template_image_ids'):
             product.product_template_image_ids.unlink()
+        # ...and images of a previous sync still waiting in the queue (full replace)
+        self.env['tec.image.job'].search([('product_tmpl_id', '=', product.id), ('state', '=', 'pending')]).unlink()
 
+        # 3. Only the raw download happens here: resize / WebP / variants run in the core image queue
+        entries = []
         for url in urls:
             try:
                 res = requests.get(url, timeout=15)
                 if res.status_code == 200:
-                    image_data = base64.b64encode(res.content)
-                    if first:
-                        product.image_1920 = image_data
-                        first = False
-                    else:
-                        # Save to Backend Model (Always)
-                        self.env['tec.product.image'].create({
-                            'name': f"Air Image {product.default_code}",
-                            'image_1920': image_data,
-                            'product_tmpl_id': product.id
-                        })
-                        
-                        # Save to Website Model (If available)
-                        if hasattr(product, 'product_template_image_ids'):
-                            self.env['product.image'].create({
-                                'name': f"Air Image {product.default_code}",
-                                'image_1920': image_data,
-                                'product_tmpl_id': product.id
-                            })
+                    entries.append({
+                        # First image is the main one, the rest go to Backend + Website galleries
+                        'target': 'gallery' if entries else 'main',
+                        'name': f"Air Image {product.default_code}",
+                        'sequence': 10 + len(entries),
+                        'data': base64.b64encode(res.content),
+                    })
             except Exception as e:
                 _logger.warning(f"Failed to download image from {url}: {e}")
+        self.env['tec.image.job']._assign_images(product, entries)
 
     def _fetch_any_url_content(self, url):
         """ Robust downloader for both HTTP/S and Local Paths """
@@ -820,6 +813,7 @@ class DropshipBackendAir(models.Model):
                 'name': 'Air Computers Córdoba',
                 'backend_id': self.id,
                 'import_column': 'CBA',
+                'node_code': 'CBA',
                 'partner_id': air_partner.id, 
             })
         else:
@@ -835,6 +829,7 @@ class DropshipBackendAir(models.Model):
                 'name': 'Air Computers Buenos Aires',
                 'backend_id': self.id,
                 'import_column': 'BS AS', # Default to BS AS column name
+                'node_code': 'BSAS',
                 'partner_id': air_partner.id,
             })
         else:
@@ -910,6 +905,7 @@ class DropshipBackendAir(models.Model):
 
         created_count = 0
         updated_count = 0
+        created_tmpl_ids = []
         
         cat_cache = {}
         brand_cache = {}
@@ -927,6 +923,7 @@ class DropshipBackendAir(models.Model):
                         created_count += 1
                         product = self._create_product_from_row(row, cod_prov, tax_map, col_map, cat_cache, brand_cache)
                         existing_products_map[cod_prov] = product
+                        created_tmpl_ids.append(product.product_tmpl_id.id)
                     else:
                         updated_count += 1
                         self._update_product_info(product, row, col_map, tax_map, cat_cache, brand_cache)
@@ -972,9 +969,25 @@ class DropshipBackendAir(models.Model):
                 self.env.cr.commit()
                 self.env.invalidate_all()
 
+        self._report_duplicate_products(created_tmpl_ids)
         _logger.info(f"Sync Complete. Created: {created_count}, Updated: {updated_count}")
         return {'created': created_count, 'updated': updated_count, 'deleted': item_count}
 
+    def _report_duplicate_products(self, tmpl_ids):
+        """
+        After-sync report of new products whose MPN already exists under another supplier code
+        ("20XW-003AR" vs "20XW003AR"): one batched query per DUPLICATE_CHECK_BATCH templates.
+        """
+        Template = self.env['product.template']
+        for i in range(0, len(tmpl_ids), DUPLICATE_CHECK_BATCH):
+            templates = Template.browse(tmpl_ids[i:i + DUPLICATE_CHECK_BATCH]).exists()
+            duplicates = templates._tec_find_mpn_duplicates()
+            for template in templates.filtered(lambda t: t.id in duplicates):
+                _logger.warning(
+                    f"{SUITE_LOG_PREFIX}Posible duplicado para {template.default_code} (PN {template.original_part_number}): "
+                    + ", ".join(f"template {other_id} PN {other_mpn}" for other_id, other_mpn in duplicates[template.id])
+                )
+
     def _parse_float(self, value):
         try:
             return float(str(value).replace(',', '.'))
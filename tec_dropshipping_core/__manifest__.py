@@ -15,12 +15,14 @@
     'data': [
         'security/tec_dropshipping_security.xml',
         'security/ir.model.access.csv',
+        'data/ir_cron.xml',
         'views/tec_catalog_brand_views.xml',
         'views/dropship_backend_views.xml',
         'views/dropship_location_views.xml',
         'views/dropship_log_views.xml',
         'views/dropship_tax_map_views.xml',
         'views/product_views.xml',
+        'views/tec_image_job_views.xml',
         'views/res_config_settings_view.xml',
         'views/dropship_menus.xml',
     ],
@@ -1,5 +1,7 @@
 from . import tec_catalog_brand
 from . import tec_product_image
+from . import tec_image_job
+from . import tec_product_spec
 from . import dropship_location
 from . import dropship_tax_map
 from . import product_template
@@ -20,8 +20,13 @@ class DropshipBackend(models.Model):
     sync_log_count = fields.Integer(string='Logs Count', compute='_compute_sync_log_count')
 
     def _compute_sync_log_count(self):
+        # One grouped COUNT (backend_id index) instead of loading every log line
+        data = self.env['tec.dropshipping.log']._read_group(
+            [('backend_id', 'in', self.ids)], ['backend_id'], ['__count'],
+        )
+        count_map = {backend.id: count for backend, count in data}
         for backend in self:
-            backend.sync_log_count = len(backend.sync_log_ids)
+            backend.sync_log_count = count_map.get(backend.id, 0)
 
     def action_view_sync_logs(self):
         self.ensure_one()
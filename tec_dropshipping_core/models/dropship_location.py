@@ -1,4 +1,13 @@
-from odoo import models, fields
+from odoo import api, models, fields
+
+NODE_CBA = 'CBA'
+NODE_BSAS = 'BSAS'
+
+# Legacy name rules, only used to pre-fill the code of existing / new locations
+NODE_NAME_RULES = (
+    (NODE_CBA, ('CBA', 'CÓRDOBA', 'CORDOBA')),
+    (NODE_BSAS, ('LUG', 'LUGANO', 'BSAS', 'BS AS', 'BS.AS', 'BUENOS AIRES', 'BAIRES')),
+)
 
 class DropshipLocation(models.Model):
     _name = 'dropship.location'
@@ -10,3 +19,19 @@ class DropshipLocation(models.Model):
     partner_id = fields.Many2one('res.partner', string='Supplier Entity', required=True, help='Partner used for Purchase Orders')
     import_column = fields.Char(string='CSV Column Name', help='Column name in the supplier file that contains stock for this location (e.g., CBA, BS AS)')
     sequence = fields.Integer(string='Priority', default=10, help='Lower number means higher priority for routing.')
+    node_code = fields.Char(
+        string='Node Code',
+        compute='_compute_node_code', store=True, readonly=False, index=True,
+        help='Logistic node used to aggregate stock per node (e.g. CBA, BSAS). Several locations can share a node.'
+    )
+
+    @api.depends('name', 'import_column')
+    def _compute_node_code(self):
+        for location in self:
+            if location.node_code:
+                continue
+            label = f"{location.name or ''} {location.import_column or ''}".upper()
+            location.node_code = next(
+                (code for code, keywords in NODE_NAME_RULES if any(k in label for k in keywords)),
+                False,
+            )
@@ -1,4 +1,14 @@
 from odoo import models, fields, api, _
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+SUITE_LOG_PREFIX = "[Tec Suite] Core: "
+
+DEFAULT_LOG_RETENTION_DAYS = 30
+
 
 class DropshipSyncLog(models.Model):
     _name = 'tec.dropshipping.log'
@@ -26,6 +36,56 @@ class DropshipSyncLog(models.Model):
     
     log_summary = fields.Text(string='Summary', readonly=True)
     error_details = fields.Text(string='Error Details', readonly=True)
+    is_rollup = fields.Boolean(string='Daily Summary', readonly=True, help='Per-product enrichment logs of one day rolled up into a single row.')
+    entry_count = fields.Integer(string='Entries', default=1, readonly=True)
+
+    def init(self):
+        # Backend form / log list: (backend, type) filters ordered by date. Enrichment logs
+        # have no backend, so the retention pass uses the same index with backend_id IS NULL.
+        create_index(
+            self.env.cr, 'tec_dropshipping_log_backend_type_date_idx', self._table,
+            ['backend_id', 'sync_type', 'sync_date DESC'],
+        )
+
+    @api.model
+    def _cron_rollup_logs(self):
+        """
+        Retention: per-product enrichment logs older than 'tec_dropshipping_core.log_retention_days'
+        become one summary row per (day, status), in one INSERT ... SELECT + one DELETE.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        if ICP.get_param('tec_dropshipping_core.log_rollup_disabled'):
+            return
+        days = int(ICP.get_param('tec_dropshipping_core.log_retention_days') or DEFAULT_LOG_RETENTION_DAYS)
+        cutoff = fields.Datetime.now() - timedelta(days=days)
+        self.flush_model()
+        old_logs = SQL(
+            """
+            backend_id IS NULL AND sync_type = 'enrichment' AND sync_date < %s
+            AND NOT COALESCE(is_rollup, FALSE)
+            """,
+            cutoff,
+        )
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO %(table)s (sync_type, sync_date, status, is_rollup, entry_count, log_summary,
+                                   products_created, products_updated, items_deleted,
+                                   create_uid, create_date, write_uid, write_date)
+            SELECT 'enrichment', date_trunc('day', sync_date), status, TRUE, SUM(COALESCE(entry_count, 1)),
+                   'Resumen diario de enriquecimiento: ' || SUM(COALESCE(entry_count, 1)) || ' registros.',
+                   0, 0, 0, %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM %(table)s
+             WHERE %(old_logs)s
+          GROUP BY date_trunc('day', sync_date), status
+            """,
+            table=SQL.identifier(self._table), uid=self.env.uid, old_logs=old_logs,
+        ))
+        summaries = self.env.cr.rowcount
+        self.env.cr.execute(SQL("DELETE FROM %s WHERE %s", SQL.identifier(self._table), old_logs))
+        rolled_up = self.env.cr.rowcount
+        self.invalidate_model()
+        if rolled_up:
+            _logger.info(f"{SUITE_LOG_PREFIX}Log retention: {rolled_up} enrichment logs rolled up into {summaries} daily summaries.")
 
     def name_get(self):
         result = []
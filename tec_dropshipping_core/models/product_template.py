@@ -1,4 +1,33 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
+from odoo.fields import Domain
+from odoo.tools import SQL
+from odoo.tools.sql import create_index, escape_psql
+from markupsafe import Markup, escape
+from collections import defaultdict
+import hashlib
+import re
+import unicodedata
+
+from .dropship_location import NODE_BSAS, NODE_CBA
+
+# Code lookup (MPN / SKU / barcode / name): pg_trgm GIN indexes, ranked
+# exact > same code without separators > prefix > contains > similar
+LOOKUP_MIN_CHARS = 3
+LOOKUP_FIELDS = ('mpn', 'default_code', 'barcode', 'name')
+
+
+def normalize_search_text(text):
+    """ Lowercase, no accents, single spaces: 'Impresora Multifunción  HP' -> 'impresora multifuncion hp'. """
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    return re.sub(r'[^a-z0-9]+', ' ', text).strip()
+
+
+SPEC_SOURCE_LABELS = {
+    'lenovo': 'Lenovo PSREF',
+    'icecat': 'Icecat',
+    'bestbuy': 'Best Buy',
+}
 
 class ProductTemplate(models.Model):
     _inherit = 'product.template'
@@ -9,15 +38,26 @@ class ProductTemplate(models.Model):
     tec_marketing_description = fields.Html(string='Descripción Comercial (SEO)', translate=True, help='Redacción persuasiva y storytelling.')
     tec_technical_description = fields.Html(string='Ficha Técnica Estructurada', translate=True, help='Especificaciones técnicas en formato tabla.')
 
-    original_part_number = fields.Char(string='PN Fabricante (MPN)', index=True, help='Part Number Original del Fabricante (Backup inmutable).')
+    original_part_number = fields.Char(string='PN Fabricante (MPN)', index='trigram', help='Part Number Original del Fabricante (Backup inmutable).')
+    x_search_name = fields.Char(
+        string='Nombre Normalizado',
+        compute='_compute_search_name',
+        store=True,
+        index='trigram',
+        help='Nombre sin acentos ni signos, para la búsqueda tolerante a errores.'
+    )
     x_original_name = fields.Char(string='Nombre Original (Proveedor)', help='Respaldo del nombre original antes del enriquecimiento SEO.')
+    # Stored: recomputed by the ORM only when a supplierinfo line of the product changes (sync),
+    # so lists and the storefront can filter / sort / paginate by stock in SQL.
     virtual_available_web = fields.Float(
         string='Stock Disponible Web',
         compute='_compute_virtual_available_web',
+        store=True,
+        index=True,
         help='Stock total disponible sumando todos los proveedores para mostrar en la web'
     )
-    stock_cba = fields.Float(string='Stock CBA', compute='_compute_stock_by_node', store=False)
-    stock_bsas = fields.Float(string='Stock BSAS', compute='_compute_stock_by_node', store=False)
+    stock_cba = fields.Float(string='Stock CBA', compute='_compute_stock_by_node', store=True)
+    stock_bsas = fields.Float(string='Stock BSAS', compute='_compute_stock_by_node', store=True)
 
     # --- Enrichment Control ---
     enrichment_state = fields.Selection([
@@ -31,12 +71,16 @@ class ProductTemplate(models.Model):
         ('manual', 'Manual'),
         ('lenovo', 'Lenovo PSREF'),
         ('icecat', 'Open Icecat'),
+        ('bestbuy', 'Best Buy'),
+        ('pod', 'Product Open Data'),
         ('google', 'Google Fallback'),
         ('ai', 'IA Generada'),
         ('mixed', 'Fuentes Mixtas')
     ], string="Fuente de Datos", readonly=True, copy=False)
 
     force_enrichment = fields.Boolean(string="Forzar Actualización", help="Si se marca, permite sobrescribir datos existentes.")
+    tec_spec_ids = fields.One2many('tec.product.spec', 'product_tmpl_id', string='Especificaciones')
+    tec_spec_checksum = fields.Char(string='Checksum Especificaciones', copy=False, readonly=True)
 
     # --- Air Computers Data (Supplier-Native) ---
     air_description_raw = fields.Text(string='Descripción Air (Raw)', help='Características técnicas crudas desde Air Computers')
@@ -61,42 +105,283 @@ class ProductTemplate(models.Model):
                 product.list_price = product.x_usd_price
                 product.standard_price = product.x_usd_cost
 
+    def _replace_specs(self, source, rows):
+        """
+        Idempotent bulk replace of the specs of one source.
+        rows: [(group, name, value), ...]. Returns False when nothing changed (no write at all).
+        """
+        self.ensure_one()
+        rows = [
+            ((group or '').strip(), str(name).strip(), str(value).strip())
+            for group, name, value in rows
+            if name and value and str(name).strip() and str(value).strip()
+        ]
+        Spec = self.env['tec.product.spec'].sudo()
+        current = Spec.search_read(
+            [('product_tmpl_id', '=', self.id), ('source', '=', source)],
+            ['group_name', 'name', 'value'], order='sequence, id',
+        )
+        if [((c['group_name'] or ''), c['name'], c['value']) for c in current] == rows:
+            return False
+
+        Spec.browse([c['id'] for c in current]).unlink()
+        Spec.create([{
+            'product_tmpl_id': self.id,
+            'source': source,
+            'sequence': i,
+            'group_name': group or False,
+            'name': name,
+            'value': value,
+        } for i, (group, name, value) in enumerate(rows)])
+        self._update_spec_checksum()
+        return True
+
+    def _update_spec_checksum(self):
+        """ Fingerprint of all the spec rows: key of the rendered HTML cache. """
+        for product in self:
+            rows = self.env['tec.product.spec'].sudo().search_read(
+                [('product_tmpl_id', '=', product.id)], ['source', 'group_name', 'name', 'value'],
+            )
+            digest = False
+            if rows:
+                raw = "\n".join(f"{r['source']}|{r['group_name'] or ''}|{r['name']}|{r['value']}" for r in rows)
+                digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+            product.tec_spec_checksum = digest
+
+    def _get_spec_html(self):
+        """ Styled spec tables, rendered once per checksum (ormcache) instead of stored in HTML fields. """
+        self.ensure_one()
+        if not self.tec_spec_checksum:
+            return ''
+        return self._render_spec_html(self.id, self.tec_spec_checksum)
+
+    @api.model
+    @tools.ormcache('product_id', 'checksum')
+    def _render_spec_html(self, product_id, checksum):
+        specs = self.env['tec.product.spec'].sudo().search([('product_tmpl_id', '=', product_id)])
+        blocks = []
+        for source in dict.fromkeys(specs.mapped('source')):
+            rows = []
+            current_group = None
+            for spec in specs.filtered(lambda s: s.source == source):
+                if spec.group_name and spec.group_name != current_group:
+                    current_group = spec.group_name
+                    rows.append(Markup(
+                        '<tr style="background-color: #f2f2f2;"><td colspan="2" style="padding: 8px 10px; font-weight: bold; color: #333; text-transform: uppercase;">%s</td></tr>'
+                    ) % spec.group_name)
+                rows.append(Markup(
+                    '<tr style="border-bottom: 1px solid #eee;">'
+                    '<td style="padding: 6px 10px; font-weight: bold; width: 40%%; color: #333; background-color: #fcfcfc;">%s</td>'
+                    '<td style="padding: 6px 10px; color: #666;">%s</td></tr>'
+                ) % (spec.name, Markup('<br/>').join(escape(spec.value).split('\n'))))
+            blocks.append(Markup(
+                '<div class="tec-specs tec-%s-specs" style="margin-top: 15px; font-family: sans-serif; border: 1px solid #e0e0e0; border-radius: 4px; overflow: hidden;">'
+                '<div style="background-color: #f5f5f5; color: #333; padding: 8px 12px; font-weight: bold; border-bottom: 1px solid #ddd;">🎯 Especificaciones (%s)</div>'
+                '<table style="width: 100%%; border-collapse: collapse; font-size: 12px;"><tbody>%s</tbody></table></div>'
+            ) % (source, SPEC_SOURCE_LABELS.get(source, source), Markup('').join(rows)))
+        return Markup('').join(blocks)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        templates = super().create(vals_list)
+        deltas = defaultdict(int)
+        for template in templates.filtered('active'):
+            deltas[template.product_brand_id.id] += 1
+        self.env['tec.catalog.brand']._apply_product_count_deltas(deltas)
+        return templates
+
+    def write(self, vals):
+        if 'product_brand_id' not in vals and 'active' not in vals:
+            return super().write(vals)
+        # Brand counters: only real (brand, active) transitions move them
+        before = {template.id: (template.product_brand_id.id, template.active) for template in self}
+        res = super().write(vals)
+        deltas = defaultdict(int)
+        for template in self:
+            old_brand, old_active = before[template.id]
+            new_brand, new_active = template.product_brand_id.id, template.active
+            if (old_brand, old_active) != (new_brand, new_active):
+                if old_active:
+                    deltas[old_brand] -= 1
+                if new_active:
+                    deltas[new_brand] += 1
+        self.env['tec.catalog.brand']._apply_product_count_deltas(deltas)
+        return res
+
+    def unlink(self):
+        deltas = defaultdict(int)
+        for template in self.filtered('active'):
+            deltas[template.product_brand_id.id] -= 1
+        res = super().unlink()
+        self.env['tec.catalog.brand']._apply_product_count_deltas(deltas)
+        return res
+
+    @api.depends('name')
+    def _compute_search_name(self):
+        for product in self:
+            product.x_search_name = normalize_search_text(product.name) or False
+
+    @api.model
+    def _tec_lookup(self, term, limit=10, lookup_fields=LOOKUP_FIELDS):
+        """
+        Ranked template matches for a (partial, possibly mistyped) code or name.
+        One UNION ALL over the trigram-indexed columns; each branch is an index scan
+        (ILIKE '%term%' and the pg_trgm similarity operator share the GIN index).
+        Returns [{'id', 'score', 'field', 'value'}], best first, one entry per template.
+        """
+        term = (term or '').strip()
+        if len(term) < LOOKUP_MIN_CHARS:
+            return []
+        name_term = normalize_search_text(term)
+        has_trigram = self.env.registry.has_trigram
+        sources = {
+            'mpn': (SQL('product_template'), SQL('id'), SQL('original_part_number'), term),
+            'default_code': (SQL('product_product'), SQL('product_tmpl_id'), SQL('default_code'), term),
+            'barcode': (SQL('product_product'), SQL('product_tmpl_id'), SQL('barcode'), term),
+            'name': (SQL('product_template'), SQL('id'), SQL('x_search_name'), name_term),
+        }
+        branches = []
+        for key in lookup_fields:
+            table, tmpl_col, col, value = sources[key]
+            if not value:
+                continue
+            like = f"%{escape_psql(value)}%"
+            condition = SQL("%s ILIKE %s", col, like)
+            similarity = SQL("0.0")
+            if has_trigram:
+                condition = SQL("(%s OR %s %% %s)", condition, col, value)
+                similarity = SQL("similarity(%s, %s)", col, value)
+            branches.append(SQL(
+                """
+                SELECT %(tmpl_col)s AS tmpl_id, %(key)s AS field, %(col)s AS value,
+                       CASE WHEN upper(%(col)s) = upper(%(value)s) THEN 1.0
+                            WHEN regexp_replace(upper(%(col)s), '[^A-Z0-9]', '', 'g') = %(compact)s THEN 0.95
+                            WHEN %(col)s ILIKE %(prefix)s THEN 0.9
+                            WHEN %(col)s ILIKE %(like)s THEN 0.6 + 0.3 * %(similarity)s
+                            ELSE %(similarity)s END AS score
+                  FROM %(table)s
+                 WHERE %(col)s IS NOT NULL AND active AND %(condition)s
+                """,
+                tmpl_col=tmpl_col, key=key, col=col, value=value, table=table, like=like,
+                prefix=f"{escape_psql(value)}%", compact=re.sub(r'[^A-Z0-9]', '', value.upper()),
+                similarity=similarity, condition=condition,
+            ))
+        if not branches:
+            return []
+
+        self.flush_model(['original_part_number', 'x_search_name', 'active'])
+        self.env['product.product'].flush_model(['default_code', 'barcode', 'active'])
+        self.env.cr.execute(SQL(
+            """
+            SELECT best.tmpl_id, best.score, best.field, best.value
+              FROM (
+                    SELECT DISTINCT ON (hit.tmpl_id) hit.tmpl_id, hit.score, hit.field, hit.value
+                      FROM (%s) hit
+                  ORDER BY hit.tmpl_id, hit.score DESC
+                   ) best
+          ORDER BY best.score DESC, best.tmpl_id
+             LIMIT %s
+            """,
+            SQL(" UNION ALL ").join(branches), limit,
+        ))
+        return [
+            {'id': tmpl_id, 'score': float(score), 'field': field, 'value': value}
+            for tmpl_id, score, field, value in self.env.cr.fetchall()
+        ]
+
+    def _tec_find_mpn_duplicates(self):
+        """
+        Batched duplicate check for importers: {template id: [(other id, other MPN), ...]} for the
+        templates of self whose MPN is already used by another template, ignoring case and
+        separators ("20XW-003AR" vs "20XW003AR"). One query for the whole recordset.
+        """
+        templates = self.filtered('original_part_number')
+        if not templates:
+            return {}
+        self.flush_model(['original_part_number', 'active'])
+        self.env.cr.execute(SQL(
+            """
+            WITH new AS (
+                SELECT id, regexp_replace(upper(original_part_number), '[^A-Z0-9]', '', 'g') AS compact
+                  FROM product_template
+                 WHERE id IN %s
+            )
+            SELECT new.id, pt.id, pt.original_part_number
+              FROM product_template pt
+              JOIN new ON new.compact = regexp_replace(upper(pt.original_part_number), '[^A-Z0-9]', '', 'g')
+             WHERE pt.original_part_number IS NOT NULL AND pt.active AND pt.id != new.id AND new.compact != ''
+          ORDER BY new.id, pt.id
+            """,
+            tuple(templates.ids),
+        ))
+        duplicates = defaultdict(list)
+        for tmpl_id, other_id, other_mpn in self.env.cr.fetchall():
+            duplicates[tmpl_id].append((other_id, other_mpn))
+        return dict(duplicates)
+
+    @api.model
+    def _search_display_name(self, operator, value):
+        # Back-office quick search (many2one, list search): typo-tolerant part numbers
+        domain = super()._search_display_name(operator, value)
+        if operator == 'ilike' and isinstance(value, str) and len(value.strip()) >= LOOKUP_MIN_CHARS:
+            matches = self._tec_lookup(value, limit=50, lookup_fields=('mpn', 'default_code', 'barcode'))
+            if matches:
+                domain = Domain.OR([domain, [('id', 'in', [m['id'] for m in matches])]])
+        return domain
+
     @api.depends('air_description_raw')
     def _compute_air_flags(self):
         for product in self:
             product.air_has_description = bool(product.air_description_raw)
 
-    @api.depends('seller_ids.x_vendor_stock', 'seller_ids.dropship_location_id.name')
+    @api.depends('seller_ids.x_vendor_stock', 'seller_ids.dropship_location_id.node_code')
     def _compute_stock_by_node(self):
+        stock_by_node = self._get_stock_by_node()
         for product in self:
-            stock_cba = 0.0
-            stock_bsas = 0.0
-            for seller in product.seller_ids:
-                if not seller.dropship_location_id:
-                    continue
-                loc_name = (seller.dropship_location_id.name or '').upper()
-                # Rules for Córdoba
-                if any(x in loc_name for x in ['CBA', 'CÓRDOBA', 'CORDOBA']):
-                    stock_cba += seller.x_vendor_stock
-                # Rules for Buenos Aires / Lugano
-                # Updated to match "Buenos Aires", "BS AS", "BSAS", "LUGANO"
-                if any(x in loc_name for x in ['LUG', 'LUGANO', 'BSAS', 'BS AS', 'BS.AS', 'BUENOS AIRES', 'BAIRES']):
-                    stock_bsas += seller.x_vendor_stock
-            product.stock_cba = stock_cba
-            product.stock_bsas = stock_bsas
+            nodes = stock_by_node.get(product.id, {})
+            product.stock_cba = nodes.get(NODE_CBA, 0.0)
+            product.stock_bsas = nodes.get(NODE_BSAS, 0.0)
+
+    def _get_stock_by_node(self):
+        """
+        {template id: {node code: stock}} for the whole recordset in one grouped query,
+        for any number of nodes. Records not saved yet (onchange) are summed in Python.
+        """
+        result = {}
+        saved = self.filtered(lambda p: isinstance(p.id, int))
+        if saved:
+            groups = self.env['product.supplierinfo'].sudo()._read_group(
+                [('product_tmpl_id', 'in', saved.ids), ('dropship_location_id.node_code', '!=', False)],
+                ['product_tmpl_id', 'dropship_location_id'],
+                ['x_vendor_stock:sum'],
+            )
+            for template, location, stock in groups:
+                nodes = result.setdefault(template.id, {})
+                nodes[location.node_code] = nodes.get(location.node_code, 0.0) + stock
+        for product in self - saved:
+            nodes = result.setdefault(product.id, {})
+            for seller in product.seller_ids.filtered(lambda s: s.dropship_location_id.node_code):
+                code = seller.dropship_location_id.node_code
+                nodes[code] = nodes.get(code, 0.0) + seller.x_vendor_stock
+        return result
 
 
     @api.depends('seller_ids.x_vendor_stock')
     def _compute_virtual_available_web(self):
         for product in self:
-            # Sum stock from all supplier info lines that have x_vendor_stock set
-            # We assume x_vendor_stock is added to product.supplierinfo by the provider module or core
-            # Note: We need to ensure x_vendor_stock exists on supplierinfo first.
-            total = 0.0
-            for seller in product.seller_ids:
-                if hasattr(seller, 'x_vendor_stock'):
-                    total += seller.x_vendor_stock
-            product.virtual_available_web = total
+            # Sum stock from all supplier info lines (x_vendor_stock is defined below on product.supplierinfo)
+            product.virtual_available_web = sum(product.seller_ids.mapped('x_vendor_stock'))
+
+class ProductProduct(models.Model):
+    _inherit = 'product.product'
+
+    def init(self):
+        # default_code / barcode keep their standard btree indexes (exact lookups of the syncs);
+        # the GIN trigram ones serve partial and fuzzy matches (_tec_lookup, ILIKE searches)
+        if self.env.registry.has_trigram:
+            create_index(self.env.cr, 'product_product_default_code_trgm_idx', self._table, ['default_code gin_trgm_ops'], method='gin')
+            create_index(self.env.cr, 'product_product_barcode_trgm_idx', self._table, ['barcode gin_trgm_ops'], method='gin')
+
 
 class SupplierInfo(models.Model):
     _inherit = 'product.supplierinfo'
@@ -1,4 +1,4 @@
-from odoo import fields, models
+from odoo import api, fields, models
 
 class ResConfigSettings(models.TransientModel):
     _inherit = 'res.config.settings'
@@ -10,3 +10,39 @@ class ResConfigSettings(models.TransientModel):
         config_parameter='tec_dropshipping_core.module_active',
         help="Master switch to enable the Tec eCommerce Suite features."
     )
+
+    # Not a config_parameter field: an unchecked Boolean would delete the parameter and the
+    # 'True' default would come back. get/set_values store 'True' / 'False' explicitly.
+    defer_image_processing = fields.Boolean(
+        string="Procesar Imágenes en Segundo Plano",
+        help="Las sincronizaciones sólo guardan la descarga; el redimensionado/WebP y las variantes se generan en un cron."
+    )
+    image_format = fields.Selection(
+        [('webp', 'WebP'), ('jpeg', 'JPEG')],
+        string="Formato de Imágenes",
+        config_parameter='tec_dropshipping_core.image_format',
+        default='webp'
+    )
+    log_retention_days = fields.Integer(
+        string="Retención de Logs (días)",
+        config_parameter='tec_dropshipping_core.log_retention_days',
+        default=30,
+        help="Los logs de enriquecimiento por producto más antiguos se resumen en una fila por día."
+    )
+    log_rollup_disabled = fields.Boolean(
+        string="Conservar Logs Detallados",
+        config_parameter='tec_dropshipping_core.log_rollup_disabled',
+        help="Desactiva el resumen diario: los logs de enriquecimiento por producto se conservan indefinidamente."
+    )
+
+    @api.model
+    def get_values(self):
+        res = super().get_values()
+        res['defer_image_processing'] = self.env['tec.image.job']._is_deferred()
+        return res
+
+    def set_values(self):
+        super().set_values()
+        self.env['ir.config_parameter'].sudo().set_param(
+            'tec_dropshipping_core.defer_image_processing', str(bool(self.defer_image_processing)),
+        )
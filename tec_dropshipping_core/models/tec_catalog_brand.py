@@ -2,12 +2,16 @@ import logging
 import csv
 import io
 import base64
+from collections import defaultdict
 
 from odoo import fields, models, api, _
 from odoo.exceptions import UserError
+from odoo.tools import SQL
 
 _logger = logging.getLogger(__name__)
 
+IMPORT_BATCH_SIZE = 5000
+
 # ─── Known aliases: Air brand name → Icecat canonical brand name ───
 # This dictionary maps supplier-specific brand variations to their
 # official Icecat name. Keep it simple, no fuzzy matching needed.
@@ -55,20 +59,49 @@ class TecCatalogBrand(models.Model):
     alias_ids = fields.One2many('tec.catalog.brand.alias', 'brand_id', string='Alias')
     product_template_ids = fields.One2many('product.template', 'product_brand_id', string='Productos')
 
-    product_count = fields.Integer(string='Productos', compute='_compute_product_count', store=True)
+    # Maintained incrementally by product.template create / write / unlink (see _apply_product_count_deltas):
+    # a sync assigning the same brand again costs nothing, a real change one UPDATE per brand.
+    product_count = fields.Integer(string='Productos', readonly=True, copy=False, help='Productos activos de la marca.')
 
-    @api.depends('product_template_ids')
-    def _compute_product_count(self):
-        data = self.env['product.template'].sudo()._read_group(
-            [('product_brand_id', 'in', self.ids)],
-            ['product_brand_id'],
-            ['__count'],
-        )
-        count_map = {brand.id: count for brand, count in data}
-        for brand in self:
-            brand.product_count = count_map.get(brand.id, 0)
+    @api.model
+    def _apply_product_count_deltas(self, deltas):
+        """ deltas: {brand id: +n / -n}. One UPDATE per distinct delta, no aggregation query. """
+        by_delta = defaultdict(list)
+        for brand_id, delta in deltas.items():
+            if brand_id and delta:
+                by_delta[delta].append(brand_id)
+        for delta, brand_ids in by_delta.items():
+            self.env.cr.execute(SQL(
+                "UPDATE %s SET product_count = GREATEST(COALESCE(product_count, 0) + %s, 0) WHERE id IN %s",
+                SQL.identifier(self._table), delta, tuple(brand_ids),
+            ))
+        if by_delta:
+            self.browse([bid for ids in by_delta.values() for bid in ids]).invalidate_recordset(['product_count'])
 
+    def _recompute_product_count(self):
+        """ Full resync in a single grouped query (every brand when called on an empty recordset). """
+        brands = self or self.search([])
+        if not brands:
+            return
+        self.env['product.template'].flush_model(['product_brand_id', 'active'])
+        self.env.cr.execute(SQL(
+            """
+            UPDATE %(table)s brand
+               SET product_count = counts.product_count
+              FROM (SELECT b.id, COUNT(pt.id) AS product_count
+                      FROM %(table)s b
+                 LEFT JOIN product_template pt ON pt.product_brand_id = b.id AND pt.active
+                     WHERE b.id IN %(ids)s
+                  GROUP BY b.id) counts
+             WHERE counts.id = brand.id
+               AND brand.product_count IS DISTINCT FROM counts.product_count
+            """,
+            table=SQL.identifier(self._table), ids=tuple(brands.ids),
+        ))
+        brands.invalidate_recordset(['product_count'])
 
+    def action_recompute_product_count(self):
+        self._recompute_product_count()
 
     @api.model
     def get_normalized_brand(self, raw_name, auto_create=True):
@@ -116,92 +149,130 @@ class TecCatalogBrand(models.Model):
 
         return False
 
+    @api.model
+    def _get_brand_name_index(self):
+        """ ({lower brand name: brand id}, {lower alias: brand id}) in two plain queries. """
+        self.flush_model(['name'])
+        self.env['tec.catalog.brand.alias'].flush_model(['name', 'brand_id'])
+        self.env.cr.execute(SQL("SELECT lower(name), id FROM %s ORDER BY id DESC", SQL.identifier(self._table)))
+        brands = dict(self.env.cr.fetchall())
+        self.env.cr.execute(SQL(
+            "SELECT lower(name), brand_id FROM %s ORDER BY id DESC",
+            SQL.identifier(self.env['tec.catalog.brand.alias']._table),
+        ))
+        aliases = dict(self.env.cr.fetchall())
+        return brands, aliases
+
+    @api.model
+    def _create_in_batches(self, model_name, vals_list, label):
+        Model = self.env[model_name]
+        records = Model.browse()
+        for i in range(0, len(vals_list), IMPORT_BATCH_SIZE):
+            batch = vals_list[i:i + IMPORT_BATCH_SIZE]
+            records |= Model.create(batch)
+            self.env.cr.commit()
+            _logger.info(f"Imported {label} batch {i} to {i + len(batch)}")
+        return records
+
+    @api.model
+    def _import_notification(self, message):
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _("Importación de Marcas"),
+                'message': message,
+                'sticky': False,
+            }
+        }
+
     @api.model
     def action_import_icecat_brands_from_local_file(self, file_path='/mnt/extra-addons/tec_ecommerce_suite/icecat_brands.csv'):
-        """ Imports canonical brands from the static Icecat CSV """
+        """ Imports canonical brands from the static Icecat CSV: streamed against the preloaded names. """
         try:
+            existing_names, _aliases = self._get_brand_name_index()
+            to_create = []
+            skipped = 0
             with open(file_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                to_create = []
-                existing_names = set(self.search([]).mapped(lambda b: b.name.lower()))
-
-                for row in reader:
-                    brand_name = row.get('Brand', '').strip()
-                    if brand_name and brand_name.lower() not in existing_names:
-                        to_create.append({
-                            'name': brand_name,
-                            'is_icecat_brand': True,
-                        })
-                        existing_names.add(brand_name.lower())
-
-                if to_create:
-                    batch_size = 1000
-                    for i in range(0, len(to_create), batch_size):
-                        batch = to_create[i:i+batch_size]
-                        self.create(batch)
-                        self.env.cr.commit()
-                        _logger.info(f"Imported Icecat brands batch {i} to {i+len(batch)}")
-            return True
+                for row in csv.DictReader(f):
+                    brand_name = (row.get('Brand') or '').strip()
+                    if not brand_name:
+                        continue
+                    key = brand_name.lower()
+                    if key in existing_names:
+                        skipped += 1
+                        continue
+                    to_create.append({'name': brand_name, 'is_icecat_brand': True})
+                    existing_names[key] = True
+
+            self._create_in_batches('tec.catalog.brand', to_create, 'Icecat brands')
         except Exception as e:
             _logger.error(f"Failed to import Icecat Brands: {e}")
             raise UserError(_("Error importando marcas oficiales: %s") % str(e))
 
+        _logger.info(f"Icecat Brand Import: created={len(to_create)}, skipped={skipped}")
+        return self._import_notification(
+            _("Marcas Icecat: %(created)s creadas, %(skipped)s ya existentes.", created=len(to_create), skipped=skipped)
+        )
+
     @api.model
     def action_import_air_brand_mapping_from_local_file(self, file_path='/mnt/extra-addons/tec_ecommerce_suite/Marcas Air - Marcas.csv'):
         """
         Imports Air brands. For each:
           - If it matches an Icecat brand → skip (already exists)
-          - If it's in KNOWN_ALIASES → create alias linking to the canonical Icecat brand
+          - If it's in KNOWN_ALIASES → create alias linking to the canonical brand
+            (an existing one or one created by this same import)
           - Otherwise → create as a new non-Icecat brand
+        Names are compared against preloaded lowercase sets; brands and aliases are created in batches.
         """
-        Alias = self.env['tec.catalog.brand.alias']
-        created = 0
-        aliased = 0
-        skipped = 0
-
         try:
+            brands, aliases = self._get_brand_name_index()
+            new_brands = {}
+            alias_rows = {}
+            skipped = 0
             with open(file_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    air_brand_name = row.get('MARCA', '').strip()
-                    if not air_brand_name or air_brand_name.lower() in ['nan', 'none', '']:
-                        continue
-
-                    # Already exists as a brand?
-                    brand = self.search([('name', '=ilike', air_brand_name)], limit=1)
-                    if brand:
-                        skipped += 1
+                for row in csv.DictReader(f):
+                    air_brand_name = (row.get('MARCA') or '').strip()
+                    key = air_brand_name.lower()
+                    if not air_brand_name or key in ['nan', 'none']:
                         continue
 
-                    # Already exists as an alias?
-                    alias = Alias.search([('name', '=ilike', air_brand_name)], limit=1)
-                    if alias:
+                    # Already exists as a brand / alias (or earlier in this file)?
+                    if key in brands or key in aliases or key in new_brands or key in alias_rows:
                         skipped += 1
                         continue
 
-                    # Check KNOWN_ALIASES dictionary
+                    # Check KNOWN_ALIASES dictionary; the canonical may come later in the file
                     canonical = KNOWN_ALIASES.get(air_brand_name.upper())
                     if canonical:
-                        canonical_brand = self.search([('name', '=ilike', canonical)], limit=1)
-                        if canonical_brand:
-                            Alias.create({
-                                'name': air_brand_name,
-                                'brand_id': canonical_brand.id,
-                            })
-                            aliased += 1
-                            _logger.info(f"Created alias '{air_brand_name}' → '{canonical_brand.name}'")
-                            continue
+                        alias_rows[key] = (air_brand_name, canonical)
+                        continue
 
                     # Not in Icecat, not aliased → create as new brand
-                    self.create({
-                        'name': air_brand_name,
-                        'is_icecat_brand': False,
-                    })
-                    created += 1
+                    new_brands[key] = {'name': air_brand_name, 'is_icecat_brand': False}
 
-            self.env.cr.commit()
-            _logger.info(f"Air Brand Import: created={created}, aliased={aliased}, skipped={skipped}")
-            return True
+            # Aliases whose canonical brand exists nowhere are imported as plain brands
+            for key, (air_brand_name, canonical) in list(alias_rows.items()):
+                if canonical.lower() not in brands and canonical.lower() not in new_brands:
+                    new_brands[key] = {'name': air_brand_name, 'is_icecat_brand': False}
+                    del alias_rows[key]
+
+            created_brands = self._create_in_batches('tec.catalog.brand', list(new_brands.values()), 'Air brands')
+            brands.update(zip(new_brands, created_brands.ids))
+            new_aliases = [
+                {'name': air_brand_name, 'brand_id': brands[canonical.lower()]}
+                for air_brand_name, canonical in alias_rows.values()
+            ]
+            self._create_in_batches('tec.catalog.brand.alias', new_aliases, 'Air brand aliases')
+            for air_brand_name, canonical in alias_rows.values():
+                _logger.info(f"Created alias '{air_brand_name}' → '{canonical}'")
         except Exception as e:
             _logger.error(f"Failed to import Air Brands: {e}")
             raise UserError(_("Error importando marcas de Air: %s") % str(e))
+
+        created, aliased = len(new_brands), len(new_aliases)
+        _logger.info(f"Air Brand Import: created={created}, aliased={aliased}, skipped={skipped}")
+        return self._import_notification(
+            _("Marcas Air: %(created)s creadas, %(aliased)s alias, %(skipped)s ya existentes.",
+              created=created, aliased=aliased, skipped=skipped)
+        )
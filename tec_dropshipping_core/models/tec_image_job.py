@@ -0,0 +1,164 @@
+from odoo import api, fields, models
+import base64
+import io
+import logging
+
+from PIL import Image, ImageOps
+
+_logger = logging.getLogger(__name__)
+SUITE_LOG_PREFIX = "[Tec Suite] Core: "
+
+MAX_SIZE = 1920
+WEBP_QUALITY = 85
+
+
+class TecImageJob(models.Model):
+    """
+    Deferred image pipeline.
+    Sync / enrichment only store the raw download here (one attachment, no PIL work).
+    The cron then resizes, re-encodes (WebP) and assigns the pictures in batches, so the
+    variant generation of Image fields (1920/1024/512/256/128) runs outside the sync
+    transaction and never holds product locks while encoding.
+
+    Targets:
+    - main: always replaces the main picture.
+    - main_or_gallery: main picture if the product has none, gallery otherwise.
+    - main_if_empty: main picture if the product has none, dropped otherwise.
+    - gallery: backend gallery (+ website gallery when website_gallery is set).
+    """
+    _name = 'tec.image.job'
+    _description = 'Cola de Procesamiento de Imágenes'
+    _order = 'id'
+
+    product_tmpl_id = fields.Many2one('product.template', string='Producto', required=True, ondelete='cascade', index=True)
+    name = fields.Char(string='Nombre')
+    sequence = fields.Integer(default=10)
+    target = fields.Selection([
+        ('main', 'Imagen Principal'),
+        ('main_or_gallery', 'Principal o Galería'),
+        ('main_if_empty', 'Principal si no tiene'),
+        ('gallery', 'Galería'),
+    ], string='Destino', required=True, default='gallery')
+    website_gallery = fields.Boolean(string='Publicar en Galería Web', default=True)
+    raw = fields.Binary(string='Imagen Original', attachment=True)
+    state = fields.Selection([
+        ('pending', 'Pendiente'),
+        ('failed', 'Error'),
+    ], string='Estado', default='pending', index=True)
+    error = fields.Char(string='Error')
+
+    @api.model
+    def _is_deferred(self):
+        """ On unless explicitly turned off: the settings store 'False', never an absent parameter. """
+        ICP = self.env['ir.config_parameter'].sudo()
+        return ICP.get_param('tec_dropshipping_core.defer_image_processing', 'True') == 'True'
+
+    @api.model
+    def _assign_images(self, product, entries):
+        """
+        Single entry point for every connector / engine.
+        entries: [{'target', 'name', 'sequence', 'data' (base64), 'website_gallery'}]
+        Deferred mode queues them (fast write path), otherwise they are applied right away.
+        """
+        entries = [e for e in entries if e.get('data')]
+        if not entries:
+            return
+        if not self._is_deferred():
+            self._apply_entries(product, entries)
+            return
+
+        self.create([{
+            'product_tmpl_id': product.id,
+            'name': entry.get('name') or product.name,
+            'sequence': entry.get('sequence', 10),
+            'target': entry.get('target', 'gallery'),
+            'website_gallery': entry.get('website_gallery', True),
+            'raw': entry['data'],
+        } for entry in entries])
+        cron = self.env.ref('tec_dropshipping_core.ir_cron_process_image_jobs', raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+
+    @api.model
+    def _apply_entries(self, product, entries):
+        """ Writes the pictures on the product (main picture, backend and website galleries). """
+        for entry in entries:
+            target = entry.get('target', 'gallery')
+            if target == 'main' or (target in ('main_or_gallery', 'main_if_empty') and not product.image_1920):
+                product.image_1920 = entry['data']
+                continue
+            if target == 'main_if_empty':
+                continue
+            vals = {
+                'product_tmpl_id': product.id,
+                'name': entry.get('name') or product.name,
+                'sequence': entry.get('sequence', 10),
+                'image_1920': entry['data'],
+            }
+            self.env['tec.product.image'].create(vals)
+            if entry.get('website_gallery', True) and hasattr(product, 'product_template_image_ids'):
+                self.env['product.image'].create(vals)
+
+    @api.model
+    def _optimize(self, data):
+        """ Downscale to 1920px and re-encode as WebP (configurable). Returns base64. """
+        ICP = self.env['ir.config_parameter'].sudo()
+        image = Image.open(io.BytesIO(base64.b64decode(data)))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((MAX_SIZE, MAX_SIZE))
+        output = io.BytesIO()
+        if ICP.get_param('tec_dropshipping_core.image_format', 'webp') == 'webp':
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'A' in image.getbands() or image.mode == 'P' else 'RGB')
+            image.save(output, format='WEBP', quality=WEBP_QUALITY, method=4)
+        else:
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            image.save(output, format='JPEG', quality=WEBP_QUALITY, optimize=True)
+        return base64.b64encode(output.getvalue())
+
+    @api.model
+    def _cron_process_image_jobs(self, limit=200):
+        """ Processes pending pictures product by product (one savepoint + commit each). """
+        jobs = self.search([('state', '=', 'pending')], limit=limit)
+        if not jobs:
+            return
+        _logger.info(f"{SUITE_LOG_PREFIX}Processing {len(jobs)} queued images...")
+
+        processed = 0
+        for product in jobs.product_tmpl_id:
+            product_jobs = jobs.filtered(lambda j: j.product_tmpl_id == product).sorted(lambda j: (j.sequence, j.id))
+            entries = []
+            failed = self.browse()
+            for job in product_jobs:
+                try:
+                    data = self._optimize(job.raw)
+                except Exception as e:
+                    _logger.warning(f"{SUITE_LOG_PREFIX}Invalid image '{job.name}' for product {product.id}: {e}")
+                    job.write({'state': 'failed', 'error': str(e)[:250]})
+                    failed |= job
+                    continue
+                entries.append({
+                    'target': job.target,
+                    'name': job.name,
+                    'sequence': job.sequence,
+                    'website_gallery': job.website_gallery,
+                    'data': data,
+                })
+            try:
+                with self.env.cr.savepoint():
+                    self._apply_entries(product, entries)
+                    (product_jobs - failed).unlink()
+                processed += len(entries)
+            except Exception as e:
+                _logger.error(f"{SUITE_LOG_PREFIX}Failed to assign images for product {product.id}: {e}")
+                (product_jobs - failed).write({'state': 'failed', 'error': str(e)[:250]})
+            self.env.cr.commit()
+
+        _logger.info(f"{SUITE_LOG_PREFIX}Image queue: {processed} images processed.")
+        # Still work left: run again right away instead of waiting for the next interval
+        if self.search_count([('state', '=', 'pending')], limit=1):
+            self.env.ref('tec_dropshipping_core.ir_cron_process_image_jobs')._trigger()
+
+    def action_retry(self):
+        self.write({'state': 'pending', 'error': False})
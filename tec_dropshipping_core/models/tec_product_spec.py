@@ -0,0 +1,19 @@
+from odoo import fields, models
+
+
+class TecProductSpec(models.Model):
+    """
+    Normalized technical specs (one row per attribute) written by the enrichment engines.
+    Replaced per (product, source) in bulk; the HTML table is only rendered (and cached)
+    at display time by product.template._get_spec_html().
+    """
+    _name = 'tec.product.spec'
+    _description = 'Especificación Técnica de Producto'
+    _order = 'product_tmpl_id, source, sequence, id'
+
+    product_tmpl_id = fields.Many2one('product.template', string='Producto', required=True, ondelete='cascade', index=True)
+    source = fields.Char(string='Fuente', required=True)
+    sequence = fields.Integer(default=10)
+    group_name = fields.Char(string='Grupo')
+    name = fields.Char(string='Atributo', required=True, index=True)
+    value = fields.Char(string='Valor', required=True)
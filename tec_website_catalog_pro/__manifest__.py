@@ -13,11 +13,14 @@
     'website': 'https://github.com/francuello10',
     'depends': ['website_sale', 'tec_dropshipping_core'],
     'data': [
+        'security/ir.model.access.csv',
+        'data/ir_cron.xml',
         'views/tec_catalog_brand_views.xml',
         'views/product_template_views.xml',
         'views/product_category_view.xml',
         'views/website_sale_templates.xml',
         'views/res_config_settings_view.xml',
+        'views/facet_index_view.xml',
     ],
     'assets': {
         'web.assets_frontend': [
@@ -0,0 +1,36 @@
+from odoo.fields import Domain
+from odoo.http import request
+from odoo.addons.website_sale.controllers.main import WebsiteSale
+
+# /shop?tec_filter=new|low_stock|deals: the smart labels are stored, so they filter in SQL
+SMART_LABEL_FILTERS = {
+    'new': [('is_new_arrival', '=', True)],
+    'low_stock': [('is_low_stock', '=', True)],
+    'deals': [('discount_percent', '>', 0)],
+}
+
+
+class WebsiteSaleCatalogPro(WebsiteSale):
+
+    def _get_shop_domain(self, search, category, attribute_value_dict, *args, **kwargs):
+        # Attribute filters inside a clean category: the facet index resolves the matching
+        # templates and replaces website_sale's attribute-line subqueries with one id list.
+        # A category flagged dirty waits for the cron rebuild and keeps the plain attribute domain.
+        template_ids = None
+        if category and attribute_value_dict and isinstance(attribute_value_dict, dict):
+            category_id = category.id if hasattr(category, 'id') else int(category)
+            facet_category = request.env['product.public.category'].sudo().browse(category_id).exists()
+            if facet_category and not facet_category.x_facet_dirty:
+                FacetIndex = request.env['tec.facet.index'].sudo()
+                template_ids = FacetIndex._get_filtered_template_ids(
+                    FacetIndex._get_category_facets(category_id), attribute_value_dict,
+                )
+        if template_ids is None:
+            domain = super()._get_shop_domain(search, category, attribute_value_dict, *args, **kwargs)
+        else:
+            domain = super()._get_shop_domain(search, category, {}, *args, **kwargs)
+            domain = Domain.AND([domain, [('id', 'in', list(template_ids))]])
+        label_domain = SMART_LABEL_FILTERS.get(request.params.get('tec_filter'))
+        if label_domain:
+            domain = Domain.AND([domain, label_domain])
+        return domain
@@ -2,4 +2,4 @@ from . import product_template
 from . import res_config_settings
 from . import website
 from . import product_category
-
+from . import facet_index
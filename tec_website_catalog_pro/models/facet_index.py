@@ -0,0 +1,155 @@
+from odoo import api, fields, models
+from odoo.tools import SQL
+import logging
+
+_logger = logging.getLogger(__name__)
+SUITE_LOG_PREFIX = "[Tec Suite] Website Pro: "
+
+# Product fields whose change moves a template in / out of a facet
+FACET_FIELDS = {'attribute_line_ids', 'public_categ_ids', 'is_published', 'active', 'sale_ok'}
+
+
+class TecFacetIndex(models.Model):
+    """
+    Materialized facets of the shop: one row per (public category, attribute value) with the
+    published templates of the category subtree carrying that value.
+    Attribute filtering on a category page reads all its rows in one indexed lookup and
+    intersects the stored id arrays instead of joining over attribute lines (the sidebar
+    itself is still rendered by website_sale).
+    Categories are refreshed incrementally: product writes flag them (x_facet_dirty) and
+    the cron rebuilds only the flagged ones.
+    """
+    _name = 'tec.facet.index'
+    _description = 'Shop Facet Index'
+    _log_access = False
+
+    category_id = fields.Many2one('product.public.category', string='Categoría', required=True, ondelete='cascade', index=True)
+    attribute_id = fields.Many2one('product.attribute', string='Atributo', required=True, ondelete='cascade')
+    value_id = fields.Many2one('product.attribute.value', string='Valor', required=True, ondelete='cascade')
+    product_count = fields.Integer(string='Productos')
+
+    def init(self):
+        # Not an ORM field: the array is only read / written through SQL
+        self.env.cr.execute(SQL(
+            "ALTER TABLE %s ADD COLUMN IF NOT EXISTS product_tmpl_ids integer[] NOT NULL DEFAULT '{}'",
+            SQL.identifier(self._table),
+        ))
+
+    # ---------------------------------------------------------------------------------
+    # Refresh
+    # ---------------------------------------------------------------------------------
+    @api.model
+    def _mark_dirty(self, templates):
+        """ Flags the categories of the templates and their ancestors (the rows cover subtrees). """
+        self._mark_categories_dirty(templates.sudo().public_categ_ids)
+
+    @api.model
+    def _mark_categories_dirty(self, categories):
+        """ Flags the categories and all their ancestors (parent_path), with or without products. """
+        if not categories:
+            return
+        ancestor_ids = {int(cid) for path in categories.sudo().mapped('parent_path') if path for cid in path.split('/') if cid}
+        dirty = self.env['product.public.category'].sudo().browse(ancestor_ids).filtered(lambda c: not c.x_facet_dirty)
+        if dirty:
+            dirty.x_facet_dirty = True
+            cron = self.env.ref('tec_website_catalog_pro.ir_cron_refresh_facet_index', raise_if_not_found=False)
+            if cron:
+                cron.sudo()._trigger()
+
+    @api.model
+    def _refresh(self, categories):
+        """ Rebuilds the rows of the given categories with one DELETE + one INSERT ... SELECT. """
+        if not categories:
+            return
+        self.env.flush_all()
+        Template = self.env['product.template']
+        categ_field = Template._fields['public_categ_ids']
+        value_field = self.env['product.template.attribute.line']._fields['value_ids']
+        cr = self.env.cr
+        cr.execute(SQL("DELETE FROM %s WHERE category_id IN %s", SQL.identifier(self._table), tuple(categories.ids)))
+        cr.execute(SQL(
+            """
+            INSERT INTO %(table)s (category_id, attribute_id, value_id, product_count, product_tmpl_ids)
+            SELECT cat.id, ptal.attribute_id, vrel.%(value_col)s,
+                   COUNT(DISTINCT pt.id), array_agg(DISTINCT pt.id ORDER BY pt.id)
+              FROM product_public_category cat
+              JOIN product_public_category sub ON sub.parent_path LIKE cat.parent_path || '%%'
+              JOIN %(categ_rel)s crel ON crel.%(categ_col)s = sub.id
+              JOIN product_template pt ON pt.id = crel.%(tmpl_col)s
+                                      AND pt.active AND pt.sale_ok AND pt.is_published
+              JOIN product_template_attribute_line ptal ON ptal.product_tmpl_id = pt.id AND ptal.active
+              JOIN %(value_rel)s vrel ON vrel.%(line_col)s = ptal.id
+             WHERE cat.id IN %(category_ids)s
+          GROUP BY cat.id, ptal.attribute_id, vrel.%(value_col)s
+            """,
+            table=SQL.identifier(self._table),
+            categ_rel=SQL.identifier(categ_field.relation),
+            tmpl_col=SQL.identifier(categ_field.column1),
+            categ_col=SQL.identifier(categ_field.column2),
+            value_rel=SQL.identifier(value_field.relation),
+            line_col=SQL.identifier(value_field.column1),
+            value_col=SQL.identifier(value_field.column2),
+            category_ids=tuple(categories.ids),
+        ))
+        self.invalidate_model()
+        categories.sudo().write({'x_facet_dirty': False})
+
+    @api.model
+    def _cron_refresh_facet_index(self, limit=500):
+        Category = self.env['product.public.category'].sudo()
+        dirty = Category.search([('x_facet_dirty', '=', True)], limit=limit)
+        if not dirty:
+            return
+        self._refresh(dirty)
+        _logger.info(f"{SUITE_LOG_PREFIX}Facet index refreshed for {len(dirty)} categories.")
+        if Category.search_count([('x_facet_dirty', '=', True)], limit=1):
+            self.env.ref('tec_website_catalog_pro.ir_cron_refresh_facet_index')._trigger()
+
+    @api.model
+    def action_rebuild_all(self):
+        Category = self.env['product.public.category'].sudo()
+        Category.search([]).write({'x_facet_dirty': True})
+        self._cron_refresh_facet_index(limit=None)
+
+    # ---------------------------------------------------------------------------------
+    # Lookups (shop)
+    # ---------------------------------------------------------------------------------
+    @api.model
+    def _get_category_facets(self, category_id):
+        """ {value_id: (attribute_id, frozenset(template ids))} for a category page: one query. """
+        self.env.cr.execute(SQL(
+            "SELECT value_id, attribute_id, product_tmpl_ids FROM %s WHERE category_id = %s",
+            SQL.identifier(self._table), category_id,
+        ))
+        return {value_id: (attribute_id, frozenset(tmpl_ids)) for value_id, attribute_id, tmpl_ids in self.env.cr.fetchall()}
+
+    @api.model
+    def _get_filtered_template_ids(self, facets, attribute_value_dict):
+        """
+        Templates matching the shop selection {attribute id: [value ids]}: OR inside an attribute,
+        AND across attributes (website_sale semantics). A value without rows has no published
+        template in the category. None when nothing is selected.
+        """
+        matches = [
+            set().union(*(facets[value_id][1] for value_id in value_ids if value_id in facets))
+            for value_ids in attribute_value_dict.values()
+        ]
+        return set.intersection(*matches) if matches else None
+
+
+class ProductPublicCategory(models.Model):
+    _inherit = 'product.public.category'
+
+    x_facet_dirty = fields.Boolean(string='Facetas Pendientes', default=True, index=True, copy=False)
+
+    def write(self, vals):
+        if 'parent_id' not in vals:
+            return super().write(vals)
+        # Moving a branch changes the subtree of every ancestor, old and new, even when the
+        # moved category only holds products through its subcategories
+        FacetIndex = self.env['tec.facet.index']
+        FacetIndex._mark_categories_dirty(self)
+        res = super().write(vals)
+        self.flush_recordset(['parent_path'])
+        FacetIndex._mark_categories_dirty(self)
+        return res
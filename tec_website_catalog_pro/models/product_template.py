@@ -1,26 +1,62 @@
 from odoo import fields, models, api
+from odoo.http import request
+from odoo.tools import float_compare
+from collections import defaultdict
 from datetime import timedelta
+from .facet_index import FACET_FIELDS
+import logging
+
+_logger = logging.getLogger(__name__)
+SUITE_LOG_PREFIX = "[Tec Suite] Website Pro: "
+
+NEW_ARRIVAL_DAYS = 30
+PRICE_DROP_DAYS = 15
+LOW_STOCK_THRESHOLD = 5
+
 
 class ProductTemplate(models.Model):
     _inherit = 'product.template'
 
     # product_brand_id is defined in tec_dropshipping_core
 
+    # Smart labels: stored + indexed so the shop can filter / sort on them in SQL.
+    # Stock and price changes (syncs) recompute them through the ORM dependencies; the
+    # time windows (new arrival, recent price drop) are closed by _cron_refresh_smart_labels.
     is_new_arrival = fields.Boolean(
         string='Es Novedad',
         compute='_compute_is_new_arrival',
-        store=False
+        store=True,
+        index=True,
+    )
+    # "Últimas Unidades" follows the stock the shop shows: one stored label per display mode
+    # (like x_website_stock_max / _sum), is_low_stock picks the one of the current website.
+    is_low_stock_max = fields.Boolean(
+        string='Stock Bajo (Máximo)',
+        compute='_compute_is_low_stock_modes',
+        store=True,
+        index=True,
+    )
+    is_low_stock_sum = fields.Boolean(
+        string='Stock Bajo (Suma)',
+        compute='_compute_is_low_stock_modes',
+        store=True,
+        index=True,
     )
     is_low_stock = fields.Boolean(
         string='Stock Bajo',
         compute='_compute_is_low_stock',
-        store=False
+        search='_search_is_low_stock',
+        help='Menos de 5 unidades según el modo de stock del sitio web (máximo por sucursal o suma).',
     )
     discount_percent = fields.Integer(
         string='Porcentaje de Descuento',
         compute='_compute_discount_percent',
-        store=False
+        store=True,
+        index=True,
+        help='Baja del precio USD respecto del precio anterior (últimos días).'
     )
+    x_previous_usd_price = fields.Float(string='Precio USD Anterior', digits=(16, 2), readonly=True, copy=False)
+    x_price_changed_at = fields.Datetime(string='Último Cambio de Precio', readonly=True, copy=False)
 
     # Marketplace Metadata
     video_url = fields.Char(string='URL de Video', help='URL de YouTube o Vimeo.')
@@ -49,10 +85,12 @@ class ProductTemplate(models.Model):
         ('custom', '🛡️ Reserva Fija (Personalizada)')
     ], string='Modo de Seguridad Web', compute='_compute_safety_stock_type_desc', readonly=True)
 
+    # Stored: the ORM recomputes it when the product / category rule changes; company and
+    # global switch changes go through _recompute_safety_stock() (no field dependency there).
     computed_safety_stock = fields.Float(
         string='Reserva Aplicada Real (Final)',
         compute='_compute_safety_stock_qty',
-        store=False,
+        store=True,
         help='Cantidad real que se está restando de la disponibilidad web.'
     )
 
@@ -66,7 +104,7 @@ class ProductTemplate(models.Model):
             else:
                 template.safety_stock_type_desc = 'custom'
 
-    @api.depends('safety_stock_qty', 'categ_id.safety_stock_qty')
+    @api.depends('safety_stock_qty', 'categ_id.safety_stock_qty', 'company_id')
     def _compute_safety_stock_qty(self):
         active = self.env['ir.config_parameter'].sudo().get_param('tec_website_catalog_pro.safety_stock_active', 'True') == 'True'
         for template in self:
@@ -85,71 +123,244 @@ class ProductTemplate(models.Model):
                 continue
 
             # 3. Global Fallback
-            template.computed_safety_stock = self.env.company.safety_stock_qty
+            template.computed_safety_stock = (template.company_id or self.env.company).safety_stock_qty
+
+    @api.model
+    def _recompute_safety_stock(self, domain=None):
+        """
+        Company safety stock or the global switch changed: flags the affected templates
+        (and, through the dependency chain, their stored website stock) for recomputation.
+        """
+        templates = self.with_context(active_test=False).search(domain or [])
+        templates.modified(['safety_stock_qty'])
+        self.env.flush_all()
+    # ------------------------------------------------------------- 
+
+    def _get_page_cache_key(self, block):
+        """
+        t-cache key of the static product page fragments (tabs, brand header, highlights).
+        Any write on the template (sync, enrichment, spec checksum, AI copy) changes write_date;
+        documents and brand are separate records, so their own write_date is part of the key.
+        """
+        self.ensure_one()
+        website = self.env['website'].get_current_website()
+        documents = self.sudo().product_document_ids
+        return (
+            block,
+            self.id,
+            self.write_date,
+            self.env.lang,
+            website.id,
+            self.product_brand_id.write_date,
+            len(documents),
+            max(documents.mapped('write_date'), default=False),
+            self._get_page_cache_params(),
+        )
+
     # ------------------------------------------------------------- 
+    # Request-scoped pricing memo (badges + price block + grid cell)
+    # -------------------------------------------------------------
+    def _tec_request_memo(self):
+        """ Dict living as long as the HTTP request (None outside a request). """
+        if not request:
+            return None
+        memo = getattr(request, '_tec_pricing_memo', None)
+        if memo is None:
+            memo = request._tec_pricing_memo = {}
+        return memo
+
+    def _get_tec_tax_rate(self):
+        """ Sum of the sale taxes (21% when none): (rate, display string). """
+        self.ensure_one()
+        memo = self._tec_request_memo()
+        key = ('tax', self.id, self.env.company.id)
+        if memo is not None and key in memo:
+            return memo[key]
+        taxes = self.sudo().taxes_id
+        tax_rate = sum(taxes.mapped('amount')) if taxes else 21.0
+        result = (tax_rate, '%g' % tax_rate)
+        if memo is not None:
+            memo[key] = result
+        return result
+
+    def _get_tec_combination_info(self, combination=False, product_id=False, add_qty=1.0, pricelist=False):
+        """
+        _get_combination_info() computed once per request and product/combination, plus the
+        display values derived from it (tax rate, tax-included price, discount percent).
+        """
+        self.ensure_one()
+        memo = self._tec_request_memo()
+        key = (
+            'combination', self.id, tuple(combination.ids) if combination else (), product_id or False,
+            add_qty, pricelist.id if pricelist else False, self.env.uid, self.env.company.id,
+        )
+        if memo is not None and key in memo:
+            return memo[key]
+
+        info = dict(self._get_combination_info(combination, product_id, add_qty, pricelist))
+        tax_rate, tax_display = self._get_tec_tax_rate()
+        info['tec_tax_rate'] = tax_rate
+        info['tec_tax_display'] = tax_display
+        info['tec_tax_included_price'] = info['total_included_price'] if 'total_included_price' in info \
+            else info['price'] * (1 + tax_rate / 100.0)
+        percent = 0
+        if info.get('has_discounted_price') and info.get('list_price'):
+            percent = round(((info['list_price'] - info['price']) / info['list_price']) * 100)
+        info['tec_discount_percent'] = percent
+        if memo is not None:
+            memo[key] = info
+        return info
+
+    @api.model
+    def _search_get_detail(self, website, order, options):
+        # Part numbers are searchable on the website too; the columns carry pg_trgm GIN
+        # indexes (core), which also back the website fuzzy ("did you mean") matching
+        detail = super()._search_get_detail(website, order, options)
+        detail['search_fields'] = detail['search_fields'] + ['original_part_number']
+        return detail
+
+    @api.model
+    def _get_page_cache_params(self):
+        # Settings snapshot (flags + USD rate) as a hashable key part
+        settings = self.env['website'].get_current_website()._get_catalog_pro_settings()
+        return tuple(sorted(settings.items()))
 
 
     @api.depends('create_date')
     def _compute_is_new_arrival(self):
-        ICP = self.env['ir.config_parameter'].sudo()
-        show_labels = ICP.get_param('tec_website_catalog_pro.show_smart_labels')
+        cutoff = fields.Datetime.now() - timedelta(days=NEW_ARRIVAL_DAYS)
         for template in self:
-            if not show_labels or not template.create_date:
-                template.is_new_arrival = False
-                continue
-            template.is_new_arrival = template.create_date > fields.Datetime.now() - timedelta(days=30)
+            template.is_new_arrival = bool(template.create_date and template.create_date > cutoff)
 
+    @api.depends('x_website_stock_max', 'x_website_stock_sum')
+    def _compute_is_low_stock_modes(self):
+        # Vendor (dropship) stock net of safety stock; warehouse quants mean nothing here
+        for template in self:
+            template.is_low_stock_max = 0 < template.x_website_stock_max < LOW_STOCK_THRESHOLD
+            template.is_low_stock_sum = 0 < template.x_website_stock_sum < LOW_STOCK_THRESHOLD
+
+    @api.depends('is_low_stock_max', 'is_low_stock_sum')
+    @api.depends_context('website_id')
     def _compute_is_low_stock(self):
-        ICP = self.env['ir.config_parameter'].sudo()
-        show_labels = ICP.get_param('tec_website_catalog_pro.show_smart_labels')
+        field_name = self._get_low_stock_field()
         for template in self:
-            if not show_labels:
-                template.is_low_stock = False
-                continue
-            
-            # Use sudo to prevent mrp.bom access errors on public users, or use website_stock
-            qty = template.sudo().qty_available
-            safety_stock = getattr(template, 'computed_safety_stock', 0.0)
-            template.is_low_stock = (qty - safety_stock) < 5
+            template.is_low_stock = template[field_name]
 
+    def _search_is_low_stock(self, operator, value):
+        return [(self._get_low_stock_field(), operator, value)]
+
+    @api.model
+    def _get_low_stock_field(self):
+        return 'is_low_stock_sum' if self._get_website_stock_field() == 'x_website_stock_sum' else 'is_low_stock_max'
+
+    @api.depends('x_usd_price', 'x_previous_usd_price', 'x_price_changed_at')
     def _compute_discount_percent(self):
-        ICP = self.env['ir.config_parameter'].sudo()
-        show_labels = ICP.get_param('tec_website_catalog_pro.show_smart_labels')
+        cutoff = fields.Datetime.now() - timedelta(days=PRICE_DROP_DAYS)
         for template in self:
-            if not show_labels:
+            previous, current = template.x_previous_usd_price, template.x_usd_price
+            recent = template.x_price_changed_at and template.x_price_changed_at > cutoff
+            if recent and previous > 0 and 0 < current < previous:
+                template.discount_percent = round((previous - current) / previous * 100)
+            else:
                 template.discount_percent = 0
-                continue
-            # Placeholder: True discount calculation normally happens in QWeb with combination_info.
-            template.discount_percent = 0
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        templates = super().create(vals_list)
+        self.env['tec.facet.index']._mark_dirty(templates)
+        return templates
+
+    def write(self, vals):
+        facet_change = bool(FACET_FIELDS & vals.keys())
+        if facet_change:
+            # Before the write too: the categories a template leaves lose its facets
+            self.env['tec.facet.index']._mark_dirty(self)
+        previous = {}
+        if 'x_usd_price' in vals:
+            # Price history for the "% OFF" label: keep the previous USD price on every real change
+            new_price = vals['x_usd_price'] or 0.0
+            previous = {
+                template.id: template.x_usd_price for template in self
+                if float_compare(template.x_usd_price, new_price, precision_digits=2) != 0
+            }
+        res = super().write(vals)
+        if facet_change:
+            self.env['tec.facet.index']._mark_dirty(self)
+        if previous:
+            now = fields.Datetime.now()
+            by_price = defaultdict(list)
+            for template_id, price in previous.items():
+                by_price[price].append(template_id)
+            for price, template_ids in by_price.items():
+                self.browse(template_ids).write({'x_previous_usd_price': price, 'x_price_changed_at': now})
+        return res
+
+    def unlink(self):
+        self.env['tec.facet.index']._mark_dirty(self)
+        return super().unlink()
+
+    @api.model
+    def _cron_refresh_smart_labels(self):
+        """ Daily: closes the time windows (new arrival, price drop) that expired since the last run. """
+        now = fields.Datetime.now()
+        expired_new = self.with_context(active_test=False).search([
+            ('is_new_arrival', '=', True), ('create_date', '<=', now - timedelta(days=NEW_ARRIVAL_DAYS)),
+        ])
+        expired_drops = self.with_context(active_test=False).search([
+            ('discount_percent', '>', 0), ('x_price_changed_at', '<=', now - timedelta(days=PRICE_DROP_DAYS)),
+        ])
+        expired_new.modified(['create_date'])
+        expired_drops.modified(['x_price_changed_at'])
+        self.env.flush_all()
+        _logger.info(f"{SUITE_LOG_PREFIX}Smart labels refreshed: {len(expired_new)} new arrivals and {len(expired_drops)} price drops expired.")
+
+    # Both display modes are stored (and indexed) so the storefront can sort / filter by stock
+    # in SQL whatever the mode of the website; x_website_stock picks the one of the current website.
+    x_website_stock_max = fields.Float(
+        string='Stock Web (Máximo)',
+        compute='_compute_website_stock_modes',
+        store=True,
+        index=True,
+    )
+    x_website_stock_sum = fields.Float(
+        string='Stock Web (Suma)',
+        compute='_compute_website_stock_modes',
+        store=True,
+        index=True,
+    )
     x_website_stock = fields.Float(
         string='Stock Web (Calculado)',
         compute='_compute_website_stock',
+        search='_search_website_stock',
         store=False,
         help="Stock calculado para mostrar en la web (Max/Suma - Seguridad)."
     )
 
-    def _compute_website_stock(self):
-        website = self.env['website'].get_current_website()
-        mode = website.sudo().stock_display_mode if website and hasattr(website, 'stock_display_mode') else 'max'
-        
+    @api.depends('seller_ids.x_vendor_stock', 'seller_ids.dropship_location_id', 'computed_safety_stock')
+    def _compute_website_stock_modes(self):
         for template in self:
             # 1. Get raw dropship stock (Use sudo to bypass supplierinfo restrictions for public users)
-            sellers = template.sudo().seller_ids.filtered(lambda s: s.dropship_location_id)
-            raw_stock = 0.0
-            if not sellers:
-                # Fallback to standard qty_available if no dropship sellers? 
-                # Let's assume 0 if no dropship info.
-                raw_stock = 0.0
-            else:
-                if mode == 'sum':
-                    raw_stock = sum(s.x_vendor_stock for s in sellers)
-                else: # max
-                    raw_stock = max([s.x_vendor_stock for s in sellers] or [0])
-            
+            # No dropship sellers = 0 (standard qty_available is not used as fallback).
+            stocks = template.sudo().seller_ids.filtered(lambda s: s.dropship_location_id).mapped('x_vendor_stock')
+
             # 2. Subtract Safety Stock
-            safety_stock = getattr(template, 'computed_safety_stock', 0.0)
-            
-            final_stock = raw_stock - safety_stock
-            template.x_website_stock = max(0.0, final_stock)
+            safety_stock = template.computed_safety_stock
+            template.x_website_stock_max = max(0.0, max(stocks, default=0.0) - safety_stock)
+            template.x_website_stock_sum = max(0.0, sum(stocks) - safety_stock)
+
+    @api.model
+    def _get_website_stock_field(self):
+        website = self.env['website'].get_current_website()
+        mode = website.sudo().stock_display_mode if website else 'max'
+        return 'x_website_stock_sum' if mode == 'sum' else 'x_website_stock_max'
+
+    @api.depends('x_website_stock_max', 'x_website_stock_sum')
+    @api.depends_context('website_id')
+    def _compute_website_stock(self):
+        field_name = self._get_website_stock_field()
+        for template in self:
+            template.x_website_stock = template[field_name]
+
+    def _search_website_stock(self, operator, value):
+        return [(self._get_website_stock_field(), operator, value)]
 
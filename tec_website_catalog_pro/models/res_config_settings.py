@@ -1,4 +1,5 @@
 from odoo import fields, models, api
+from .website import USD_RATE_STAMP_KEY
 
 class ResCompany(models.Model):
     _inherit = 'res.company'
@@ -9,6 +10,13 @@ class ResCompany(models.Model):
         help='Cantidad global de stock de seguridad que se resta de la disponibilidad web. Se aplica si no hay reglas por categoría o producto.'
     )
 
+    def write(self, vals):
+        res = super().write(vals)
+        if 'safety_stock_qty' in vals:
+            # Only templates falling back to the company rule (own rule = -1)
+            self.env['product.template']._recompute_safety_stock([('safety_stock_qty', '<', 0)])
+        return res
+
 class ResConfigSettings(models.TransientModel):
     _inherit = 'res.config.settings'
 
@@ -79,3 +87,35 @@ class ResConfigSettings(models.TransientModel):
         string="Modo de Visualización de Stock",
     )
 
+    def set_values(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+        was_active = ICP.get_param('tec_website_catalog_pro.safety_stock_active', 'True')
+        super().set_values()
+        if ICP.get_param('tec_website_catalog_pro.safety_stock_active', 'True') != was_active:
+            self.env['product.template']._recompute_safety_stock()
+
+
+class ResCurrencyRate(models.Model):
+    _inherit = 'res.currency.rate'
+
+    # The USD rates stamp keys the cached settings snapshot (website); only the
+    # per-transaction memo of that stamp has to be dropped, and only for USD rates
+    def _drop_usd_rate_stamp(self):
+        if 'USD' in self.currency_id.mapped('name'):
+            self.env.cr.cache.pop(USD_RATE_STAMP_KEY, None)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._drop_usd_rate_stamp()
+        return records
+
+    def write(self, vals):
+        self._drop_usd_rate_stamp()
+        res = super().write(vals)
+        self._drop_usd_rate_stamp()
+        return res
+
+    def unlink(self):
+        self._drop_usd_rate_stamp()
+        return super().unlink()
@@ -1,4 +1,19 @@
-from odoo import fields, models
+from odoo import _, api, fields, models, tools
+from odoo.tools import frozendict
+
+# Flags read by the storefront templates (missing parameter = enabled, as in the settings)
+CATALOG_PRO_FLAGS = {
+    'show_smart_labels': 'tec_website_catalog_pro.show_smart_labels',
+    'show_usd_exchange': 'tec_website_catalog_pro.show_usd_exchange',
+    'show_highlights': 'tec_website_catalog_pro.show_highlights',
+    'show_videos': 'tec_website_catalog_pro.show_videos',
+    'show_air_description': 'tec_website_catalog_pro.show_air_description',
+    'show_spec_links': 'tec_website_catalog_pro.show_spec_links',
+    'show_support_buttons': 'tec_website_catalog_pro.show_support_buttons',
+    'safety_stock_active': 'tec_website_catalog_pro.safety_stock_active',
+}
+# Cursor cache slot of the USD rates stamp (part of the settings cache key)
+USD_RATE_STAMP_KEY = 'tec_website_catalog_pro.usd_rate_stamp'
 
 class Website(models.Model):
     _inherit = 'website'
@@ -20,3 +35,46 @@ class Website(models.Model):
         
         # If the result is negative, return 0.0 to indicate out of stock.
         return max(0.0, qty - safety_stock)
+
+    def _get_product_sort_mapping(self):
+        """ Stock and price drops are stored: "most available" / "biggest drop" sort in SQL. """
+        mapping = super()._get_product_sort_mapping()
+        field_name = 'x_website_stock_sum' if self.stock_display_mode == 'sum' else 'x_website_stock_max'
+        return mapping + [
+            (f'{field_name} desc', _('Disponibilidad')),
+            ('discount_percent desc', _('Mayor Descuento')),
+        ]
+
+    def _get_catalog_pro_settings(self):
+        """
+        Settings snapshot for the templates: every Catalog Pro flag + the USD sell rate.
+        Cached per registry (company, day, USD rates stamp); ir.config_parameter writes clear
+        the cache by themselves and a new / edited / deleted USD rate changes the key.
+        """
+        company = self.company_id or self.env.company
+        return self._get_catalog_pro_settings_cached(company.id, fields.Date.context_today(self), self._get_usd_rate_stamp())
+
+    @api.model
+    def _get_usd_rate_stamp(self):
+        """ (count, last write) of the USD rates; one query per transaction (cursor cache). """
+        stamp = self.env.cr.cache.get(USD_RATE_STAMP_KEY)
+        if stamp is None:
+            [stamp] = self.env['res.currency.rate'].sudo()._read_group(
+                [('currency_id.name', '=', 'USD')], [], ['__count', 'write_date:max'],
+            )
+            self.env.cr.cache[USD_RATE_STAMP_KEY] = stamp
+        return stamp
+
+    @api.model
+    @tools.ormcache('company_id', 'today', 'usd_rate_stamp')
+    def _get_catalog_pro_settings_cached(self, company_id, today, usd_rate_stamp):
+        ICP = self.env['ir.config_parameter'].sudo()
+        values = {key: ICP.get_param(param, 'True') == 'True' for key, param in CATALOG_PRO_FLAGS.items()}
+
+        usd_rate = False
+        usd = self.env['res.currency'].sudo().with_context(active_test=False).search([('name', '=', 'USD')], limit=1)
+        if usd:
+            rate = usd.with_company(company_id).with_context(date=today).rate
+            usd_rate = round(1.0 / rate, 2) if rate else False
+        values['usd_rate'] = usd_rate
+        return frozendict(values)